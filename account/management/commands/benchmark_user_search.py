@@ -0,0 +1,100 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from account.models import User
+from account.v1.services.search import user_search_backend
+
+
+# Seeds synthetic users (emails ending in @bench.example) up to --users, then times keyword searches, e.g.
+# python manage.py benchmark_user_search --users=1000000 --queries=200
+# python manage.py benchmark_user_search --cleanup
+
+
+class Command(BaseCommand):
+    help = 'Compare the user search backend with the icontains OR search'
+
+    email_domain = "bench.example"
+    first_names = ["ada", "chinedu", "ngozi", "tunde", "amaka", "emeka", "funke", "ibrahim", "zainab", "kelechi"]
+    last_names = ["okafor", "adeyemi", "bello", "eze", "nwosu", "balogun", "okoro", "mohammed", "obi", "afolabi"]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--cleanup', action='store_true', help='Delete the synthetic users and exit')
+
+    def handle(self, *args, **options):
+        synthetic_users = User.objects.filter(email__endswith=f"@{self.email_domain}")
+
+        if options.get("cleanup"):
+            deleted, _ = synthetic_users.delete()
+            self.stdout.write(self.style.SUCCESS(f"{deleted} rows deleted."))
+            return
+
+        rng = random.Random(options.get("seed"))
+        self.seed_users(synthetic_users.count(), options.get("users"), rng)
+
+        keywords = [self.make_keyword(rng) for _ in range(options.get("queries"))]
+        page_size = options.get("page_size")
+
+        def legacy_search(keyword):
+            return list(User.available_objects.filter(
+                Q(first_name__icontains=keyword) | Q(last_name__icontains=keyword) | Q(email__icontains=keyword) |
+                Q(phone_number__icontains=keyword) | Q(user_id__icontains=keyword)
+            ).order_by("-created_at")[:page_size])
+
+        def backend_search(keyword):
+            return list(user_search_backend.search(User.available_objects.all(), keyword)[:page_size])
+
+        self.stdout.write(f"{User.objects.count()} users, {len(keywords)} keywords")
+
+        for name, search in [("icontains OR", legacy_search), ("search backend", backend_search)]:
+            timings = []
+
+            for keyword in keywords:
+                started_at = time.perf_counter()
+                search(keyword)
+                timings.append((time.perf_counter() - started_at) * 1000)
+
+            timings.sort()
+            self.stdout.write(
+                f"{name:>15}: avg {statistics.mean(timings):.2f}ms, p50 {timings[len(timings) // 2]:.2f}ms, "
+                f"p95 {timings[min(len(timings) - 1, int(len(timings) * 0.95))]:.2f}ms"
+            )
+
+    def make_keyword(self, rng):
+        choice = rng.randint(0, 3)
+
+        if choice == 0:
+            return rng.choice(self.first_names)
+        if choice == 1:
+            return rng.choice(self.last_names)[:4]
+        if choice == 2:
+            return f"user{rng.randint(0, 999999)}@"
+
+        return f"80{rng.randint(100, 999)}"
+
+    def seed_users(self, existing, target, rng, batch_size=10000):
+        for start in range(existing, target, batch_size):
+            users = []
+
+            for number in range(start, min(start + batch_size, target)):
+                user = User(
+                    user_id=f"BENCH{number:09d}",
+                    email=f"user{number}@{self.email_domain}",
+                    first_name=rng.choice(self.first_names).title(),
+                    last_name=rng.choice(self.last_names).title(),
+                    phone_number=f"+23480{rng.randint(10000000, 99999999)}",
+                    password="!"
+                )
+                # bulk_create skips save(), which is where search_text is normally kept up to date
+                user.search_text = user.build_search_text()
+                users.append(user)
+
+            User.objects.bulk_create(users, batch_size=batch_size)
+            self.stdout.write(f"{start + len(users)} / {target} users seeded")
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from account.models import User
+
+
+# Fills User.search_text for rows written without save() (bulk_create, queryset.update, older rows)
+# python manage.py rebuild_user_search_text --batch-size=5000
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search text of users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-b', '--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options.get("batch_size")
+        last_id = 0
+        updated = 0
+
+        while True:
+            users = list(
+                User.objects.filter(id__gt=last_id).order_by("id").only("id", "search_text", *User.SEARCH_FIELDS)
+                [:batch_size]
+            )
+
+            if not users:
+                break
+
+            changed = []
+
+            for user in users:
+                search_text = user.build_search_text()
+
+                if user.search_text != search_text:
+                    user.search_text = search_text
+                    changed.append(user)
+
+            User.objects.bulk_update(changed, ["search_text"], batch_size=batch_size)
+
+            updated += len(changed)
+            last_id = users[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f"Search text rebuilt for {updated} users."))
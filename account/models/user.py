@@ -1,9 +1,11 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
-from django.db.models import Q
 from rest_framework_simplejwt.tokens import RefreshToken
 from base.models import AppDbModel, BaseModel
-from roles_permissions.constants import RoleEnum
+from utils.constants.others import MetricName
+from utils.metrics import AppMetrics
 
 
 class LanguageOptions(models.TextChoices):
@@ -75,10 +77,37 @@ class User(AbstractUser, BaseModel):
     kyc_verified_at = models.DateTimeField(null=True, blank=True)
     language = models.CharField(max_length=10, default=LanguageOptions.english, choices=LanguageOptions.choices)
     country = models.ForeignKey("location.Country", on_delete=models.SET_NULL, null=True)
+    # Only changed through TransactionService.fund_balance, which records every change in payment.LedgerEntry
+    balance = models.DecimalField(decimal_places=2, max_digits=14, default=0)
+    # Lowercased names, email, phone number and user id, searched through a trigram index (see UserSearchBackend)
+    search_text = models.TextField(blank=True, default="", editable=False)
+
+    SEARCH_FIELDS = ["first_name", "last_name", "email", "phone_number", "user_id"]
+
+    class Meta(AbstractUser.Meta):
+        # Trigram indexes need Postgres and its pg_trgm extension (created on pre_migrate, see account.signals)
+        indexes = [
+            # Keyset pages of the user list (CustomApiRequest.cursor_ordering)
+            models.Index(fields=["-created_at", "-id"], name="user_created_id_idx"),
+        ] + ([] if settings.USE_TEST_DB else [
+            GinIndex(fields=["search_text"], opclasses=["gin_trgm_ops"], name="user_search_text_trgm_idx"),
+        ])
 
     def __str__(self):
         return str(f"{self.first_name}::{self.user_id}")
 
+    def build_search_text(self):
+        return " ".join(str(getattr(self, field)) for field in self.SEARCH_FIELDS if getattr(self, field)).lower()
+
+    def save(self, *args, **kwargs):
+        self.search_text = self.build_search_text()
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and set(update_fields) & set(self.SEARCH_FIELDS):
+            kwargs["update_fields"] = set(update_fields) | {"search_text"}
+
+        super().save(*args, **kwargs)
+
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
@@ -95,23 +124,48 @@ class User(AbstractUser, BaseModel):
             'token_type': "Bearer"
         }
 
+    def __getstate__(self):
+        # The permission snapshot belongs to the request that built it, never to a pickled (cached) user.
+        state = super().__getstate__()
+        state.pop("_permission_snapshot", None)
+        return state
+
+    def get_permission_snapshot(self):
+        """
+        Resolved roles and permissions of the user. It is built (or read from the cache) once and kept on the
+        instance, so every permission/role check made against request.user is answered from memory.
+        """
+        snapshot = self.__dict__.get("_permission_snapshot")
+
+        if snapshot is None:
+            from account.v1.services.user import UserService
+
+            snapshot = UserService(None).get_permission_snapshot(self)
+            self._permission_snapshot = snapshot
+
+        return snapshot
+
+    def clear_permission_snapshot(self):
+        self.__dict__.pop("_permission_snapshot", None)
+
     def has_permission(self, perm_name):
         if self.is_superuser:
             return True
 
-        q = Q(permissions__name=perm_name)
+        # Used to be a sys_admin role lookup plus a permissions join
+        AppMetrics.increment(MetricName.permission_queries_avoided, 2)
 
-        return self.roles.filter(Q(name__exact=RoleEnum.sysadmin)).exists() or self.permissions.filter(q).exists()
+        return self.get_permission_snapshot().has_permission(perm_name)
 
     def has_role(self, role_name):
-        q = Q(name=role_name)
+        AppMetrics.increment(MetricName.permission_queries_avoided)
 
-        return self.roles.filter(q).exists()
+        return self.get_permission_snapshot().has_role(role_name)
 
     def has_any_of_roles(self, role_names):
-        q = Q(name__in=role_names)
+        AppMetrics.increment(MetricName.permission_queries_avoided)
 
-        return self.roles.filter(q).exists()
+        return self.get_permission_snapshot().has_any_of_roles(role_names)
 
 
 class ApiRequestLogger(AppDbModel):
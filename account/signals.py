@@ -1,5 +1,5 @@
 # users/signals.py
-from django.db.models.signals import m2m_changed
+from django.db.models.signals import m2m_changed, pre_migrate
 from django.dispatch import receiver
 
 from roles_permissions.models import Role
@@ -21,3 +21,41 @@ def assign_role_permissions(sender, instance: User, action, reverse, model, pk_s
         for role_id in pk_set:
             role = Role.objects.get(id=role_id)
             instance.permissions.remove(*role.permissions.all())
+
+
+@receiver(m2m_changed, sender=User.roles.through)
+@receiver(m2m_changed, sender=User.permissions.through)
+def invalidate_permission_snapshot(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """
+    Drop the cached permission snapshot of every user whose roles or permissions just changed.
+    """
+    from account.v1.services.user import UserService
+
+    if action not in ["post_add", "post_remove", "pre_clear"]:
+        return
+
+    if not reverse:
+        instance.clear_permission_snapshot()
+        user_pks = [instance.pk]
+    elif pk_set:
+        user_pks = list(pk_set)
+    else:
+        # Reverse clear (e.g. role.user_set.clear()), pk_set is not provided
+        user_pks = list(sender.objects.filter(**{f"{instance._meta.model_name}_id": instance.pk})
+                        .values_list("user_id", flat=True))
+
+    UserService(None).invalidate_permission_snapshots(user_pks)
+
+
+@receiver(pre_migrate)
+def create_trigram_extension(sender, app_config, using="default", **kwargs):
+    """The user search index (gin_trgm_ops) needs pg_trgm, which is not part of a fresh Postgres database"""
+    from django.db import connections
+
+    connection = connections[using]
+
+    if app_config.label != "account" or connection.vendor != "postgresql":
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
@@ -15,7 +15,7 @@ class VerySimpleProfileSerializer(serializers.ModelSerializer):
 
 
 base_profile_serializer_fields = ['user_id', 'first_name', 'last_name', 'phone_number', 'email', "profile_photo",
-                                  "roles", "created_at", "created_by", "is_active"]
+                                  "profile_photo_srcset", "roles", "created_at", "created_by", "is_active"]
 
 
 class BaseProfileSerializer(serializers.ModelSerializer):
@@ -23,6 +23,7 @@ class BaseProfileSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(read_only=True)
     is_active = serializers.BooleanField(read_only=True)
     profile_photo = serializers.URLField(source="profile_photo.url", read_only=True)
+    profile_photo_srcset = serializers.JSONField(source="profile_photo.get_srcset", read_only=True)
     created_by = VerySimpleProfileSerializer(read_only=True)
 
 
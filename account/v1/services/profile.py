@@ -1,15 +1,17 @@
-from django.core.cache import cache
 from django.utils import timezone
 from account.models import VerificationStatusOption, KYCVerificationService, KYCVerificationServiceOptions, \
     IDTypeLabelOptions, KYCVerificationData, IDType
 from account.tasks import background_verify_user
 from account.v1.services.user import AccountService
+from utils.cache import CachedQuery
 from utils.constants.messages import ResponseMessages
 from utils.errors import UserError
 from utils.models import ModelService
 from utils.third_party_connection import PremblyAPIService
 from utils.util import CustomApiRequest
 
+id_types_by_country_query = CachedQuery("id_types_by_country", depends_on=[IDType], timeout=300)
+
 
 class KYCService(CustomApiRequest):
     def __init__(self, request):
@@ -144,7 +146,6 @@ class IdTypeService(CustomApiRequest):
         def __do_fetch():
             id_types = IDType.active_available_objects.filter(country=country).values("id", "name")
 
-            return id_types
+            return list(id_types)
 
-        cache_key = self.generate_cache_key("country", country.id, model=IDType)
-        return cache.get_or_set(cache_key, __do_fetch, 300)
+        return id_types_by_country_query.get(country.id, fetch=__do_fetch)
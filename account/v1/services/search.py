@@ -0,0 +1,33 @@
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+
+
+class UserSearchBackend:
+    """
+    Keyword search over User.search_text. On Postgres the substring match is served by the trigram GIN index and
+    results are ranked by trigram word similarity; elsewhere (USE_TEST_DB, sqlite) it is a plain LIKE scan.
+    Exact email/user id/phone number matches come first, then prefix matches.
+    """
+
+    def search(self, queryset, keyword):
+        keyword = str(keyword).lower().strip()
+
+        queryset = queryset.filter(search_text__contains=keyword).annotate(
+            search_match=Case(
+                When(Q(email__iexact=keyword) | Q(user_id__iexact=keyword) | Q(phone_number=keyword), then=Value(2)),
+                When(search_text__startswith=keyword, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField()
+            )
+        )
+
+        if connections[queryset.db].vendor != "postgresql":
+            return queryset.order_by("-search_match", "-created_at")
+
+        return queryset.annotate(
+            search_rank=TrigramWordSimilarity(keyword, "search_text")
+        ).order_by("-search_match", "-search_rank", "-created_at")
+
+
+user_search_backend = UserSearchBackend()
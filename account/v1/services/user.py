@@ -1,17 +1,28 @@
 from django.contrib.auth.hashers import check_password, make_password
-from django.core.cache import cache
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 from django.utils import timezone
 from account.models import User
+from base.activity import fetch_user_activity
+from base.models import Activity
 from account.v1.serializers.profile import SimpleProfileSerializer
+from account.v1.services.search import user_search_backend
 from roles_permissions.models import Permission, Role
 from roles_permissions.services import RoleService
+from utils.cache import CachedQuery
+from utils.counts import CountStrategy
 from utils.constants.messages import ResponseMessages
-from roles_permissions.constants import RoleEnum, RoleHierarchy
+from utils.constants.others import MetricName
+from utils.metrics import AppMetrics
+from roles_permissions.constants import PermissionEnum, RoleEnum, RoleHierarchy
 from utils.errors import ServerError, NotFoundError, UserError, PermissionDeniedError
 from utils.models import ModelService
-from utils.util import CustomApiRequest, get_unique_id, generate_password
+from utils.util import CustomApiRequest, get_unique_id, generate_password, encode_cursor, decode_cursor
+
+user_by_user_id_query = CachedQuery("user_by_user_id", depends_on=[User])
+user_by_phone_number_query = CachedQuery("user_by_phone_number", depends_on=[User])
+# Membership changes of a single user are invalidated explicitly (see account.signals)
+permission_snapshot_query = CachedQuery("permission_snapshot", depends_on=[Role, Permission])
 
 
 class AccountService(CustomApiRequest):
@@ -40,9 +51,6 @@ class AccountService(CustomApiRequest):
         if profile_photo:
             self.set_profile_photo(profile_photo)
 
-        cache_key = self.generate_cache_key(self.auth_user.user_id, model=User)
-        cache.delete(cache_key)
-
         return user_update
 
     def fetch_user_by_user_id(self, user_id, is_background=False):
@@ -63,8 +71,7 @@ class AccountService(CustomApiRequest):
         if is_background:
             return __do_fetch_single()
 
-        cache_key = self.generate_cache_key(user_id, model=User)
-        return cache.get_or_set(cache_key, __do_fetch_single)
+        return user_by_user_id_query.get(user_id, fetch=__do_fetch_single)
 
     def fetch_user_by_phone_number(self, phone_number, is_fresh=False):
         """
@@ -85,8 +92,7 @@ class AccountService(CustomApiRequest):
             except Exception as e:
                 raise ServerError(error=e, error_position="UserService.fetch_user_by_user_id")
 
-        cache_key = self.generate_cache_key(phone_number, model=User)
-        return cache.get_or_set(cache_key, __do_fetch_single)
+        return user_by_phone_number_query.get(phone_number, fetch=__do_fetch_single)
 
     def check_username_exists(self, username):
         user = User.objects.filter(Q(username__iexact=username))
@@ -119,6 +125,7 @@ class AccountService(CustomApiRequest):
                 "first_name": user.first_name,
                 "last_name": user.last_name,
                 "profile_photo": user.profile_photo.url if user.profile_photo else None,
+                "profile_photo_srcset": user.profile_photo.get_srcset() if user.profile_photo else None,
                 "roles": roles,
                 "permissions": permissions,
                 "is_email_verified": user.email_verified
@@ -140,6 +147,13 @@ class AccountService(CustomApiRequest):
 
 
 class UserService(CustomApiRequest):
+    cursor_pagination_enabled = True
+    count_strategy = CountStrategy()
+    export_fields = [
+        "user_id", "email", "first_name", "last_name", "phone_number", "kyc_verification_status", "is_active",
+        "created_at"
+    ]
+
     def __init__(self, request):
         super().__init__(request)
         self.serializer_class = SimpleProfileSerializer
@@ -170,6 +184,27 @@ class UserService(CustomApiRequest):
 
         return user
 
+    def fetch_activity(self, user_id, filter_params):
+        """A user's activity, newest first. Pages are walked with the opaque next_cursor of the previous page"""
+        user = AccountService(self.request).fetch_user_by_user_id(user_id)
+
+        if user != self.auth_user and not self.auth_user.has_permission(PermissionEnum.view_users):
+            raise PermissionDeniedError()
+
+        limit = min(self.digify_number(filter_params.get("limit") or 20, "limit"), 100)
+        cursor = filter_params.get("cursor")
+
+        # (created_at, id) of the last row of the previous page
+        cursor_fields = [Activity._meta.get_field("created_at"), Activity._meta.get_field("id")]
+        activities, last_key = fetch_user_activity(
+            user.id, after=decode_cursor(cursor, cursor_fields) if cursor else None, limit=max(limit, 1)
+        )
+
+        return {
+            "results": activities,
+            "next_cursor": encode_cursor(*last_key) if last_key else None
+        }
+
     def update(self, payload, user_id):
         account_service = AccountService(self.request)
         user = account_service.fetch_user_by_user_id(user_id)
@@ -254,47 +289,74 @@ class UserService(CustomApiRequest):
         keyword = filter_params.get("keyword")
         roles = filter_params.get("roles")
 
-        q = Q()
-
-        if keyword:
-            q &= (Q(first_name__icontains=keyword) | Q(last_name__icontains=keyword) |
-                  Q(email__icontains=keyword) | Q(phone_number__icontains=keyword) |
-                  Q(user_id__icontains=keyword))
+        queryset = User.available_objects.select_related("profile_photo").prefetch_related(
+            "roles", "profile_photo__derivatives"
+        ).order_by("-created_at")
 
         if roles:
-            roles = roles.split(",")
-            q &= Q(roles__id__in=roles)
+            # Exists instead of a roles join, a user holding several of the roles is listed once
+            queryset = queryset.filter(Exists(
+                User.roles.through.objects.filter(user_id=OuterRef("pk"), role_id__in=roles.split(","))
+            ))
 
-        queryset = User.available_objects.filter(q).prefetch_related("roles").order_by("-created_at")
+        if keyword:
+            queryset = user_search_backend.search(queryset, keyword)
 
         return queryset
 
-    def get_user_permissions(self, user):
-        def __do_get_permissions():
-            if user.is_superuser or user.roles.filter(name__exact=RoleEnum.sysadmin).exists():
+    def get_permission_snapshot(self, user):
+        """Resolves the roles and permissions of the user into a PermissionSnapshot shared through the cache"""
+        def __do_build_snapshot():
+            roles = list(user.roles.values_list("id", "name").order_by("name"))
+            is_sysadmin = user.is_superuser or any(name == RoleEnum.sysadmin for _, name in roles)
+
+            if is_sysadmin:
                 permissions = Permission.objects.values("name", "label").order_by("name")
             else:
                 permissions = user.permissions.values("name", "label").order_by("name")
 
-            return permissions
+            AppMetrics.increment(MetricName.permission_snapshot_queries, 2)
 
-        cache_key = self.generate_cache_key("permissions", user.user_id)
-        return cache.get_or_set(cache_key, __do_get_permissions)
+            return PermissionSnapshot(
+                role_ids=[role_id for role_id, _ in roles],
+                role_names=[name for _, name in roles],
+                permissions=list(permissions),
+                is_sysadmin=is_sysadmin
+            )
 
-    def get_user_role_names(self, user):
-        def __do_get_role_names():
-            roles = user.roles.values_list("name", flat=True).order_by("name")
-            return roles
+        return permission_snapshot_query.get(user.pk, fetch=__do_build_snapshot)
+
+    def invalidate_permission_snapshots(self, user_pks):
+        permission_snapshot_query.invalidate_many([[user_pk] for user_pk in user_pks])
+
+    def get_user_permissions(self, user):
+        return user.get_permission_snapshot().permissions
 
-        cache_key = self.generate_cache_key("role_names", user.user_id)
-        return cache.get_or_set(cache_key, __do_get_role_names)
+    def get_user_role_names(self, user):
+        return user.get_permission_snapshot().role_names
 
     def get_user_role_ids(self, user):
-        def __do_get_role_ids():
-            roles = user.roles.values_list("id", flat=True)
-            return list(roles)
+        return user.get_permission_snapshot().role_ids
+
+
+class PermissionSnapshot:
+    """Roles and permissions of a user, held in sets so that every check is an in-memory lookup"""
+
+    def __init__(self, role_ids, role_names, permissions, is_sysadmin=False):
+        self.role_ids = list(role_ids)
+        self.role_names = list(role_names)
+        self.permissions = list(permissions)
+        self.is_sysadmin = is_sysadmin
+
+        self.role_name_set = frozenset(self.role_names)
+        self.permission_name_set = frozenset(permission["name"] for permission in self.permissions)
+
+    def has_permission(self, perm_name):
+        # str() turns TextChoices members into their values, which is what the sets hold
+        return self.is_sysadmin or str(perm_name) in self.permission_name_set
 
-        cache_key = self.generate_cache_key("role_ids", user.user_id)
-        perms = cache.get_or_set(cache_key, __do_get_role_ids)
+    def has_role(self, role_name):
+        return str(role_name) in self.role_name_set
 
-        return perms
+    def has_any_of_roles(self, role_names):
+        return any(str(role_name) in self.role_name_set for role_name in role_names)
@@ -5,6 +5,7 @@ from account.v1.serializers.profile import SimpleProfileSerializer, ProfileSeria
 from roles_permissions.serializers import VerySimpleRoleSerializer
 from account.v1.serializers.user import UserSerializer, UpdateUserSerializer
 from account.v1.services.user import UserService, AccountService
+from base.services import ExportService
 from api.serializers.others import ActivateDeactivateSerializer
 from utils.constants.messages import ResponseMessages
 from roles_permissions.constants import PermissionEnum
@@ -35,6 +36,19 @@ class ListCreateUsersAPIView(ListAPIView, CustomApiRequest):
         return self.process_request(request, service.create)
 
 
+class ExportUsersAPIView(ListAPIView, CustomApiRequest):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(tags=["Users"])
+    def get(self, request, *args, **kwargs):
+        self.permission_required = [PermissionEnum.view_users]
+        filter_params = self.get_request_filter_params("roles", "export_format", "background")
+
+        service = ExportService(request)
+
+        return self.process_request(request, service.export, resource="users", filter_params=filter_params)
+
+
 class RetrieveUpdateUserAPIView(RetrieveUpdateAPIView, CustomApiRequest):
     response_serializer = ProfileSerializer
     permission_classes = [IsAuthenticated]
@@ -94,3 +108,16 @@ class ListCreatableUsersRoles(ListAPIView, CustomApiRequest):
         service = UserService(request)
 
         return self.process_request(request, service.fetch_creatable_users_roles)
+
+
+class UserActivityAPIView(ListAPIView, CustomApiRequest):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(tags=["Users"])
+    def get(self, request, *args, **kwargs):
+        filter_params = self.get_request_filter_params("cursor", "limit")
+
+        user_id = kwargs.get("user_id")
+        service = UserService(request)
+
+        return self.process_request(request, service.fetch_activity, user_id=user_id, filter_params=filter_params)
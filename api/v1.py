@@ -11,6 +11,7 @@ urlpatterns = [
     path("media/", include("media.urls")),
     path("payment/", include("payment.urls")),
     path("location/", include("location.v1.urls")),
+    path("exports/", include("base.urls")),
     path('doc/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('doc/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
 ]
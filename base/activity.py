@@ -0,0 +1,79 @@
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from account.models import User
+from base.models import Activity
+from utils.buffers import RedisListBuffer
+
+activity_buffer = RedisListBuffer("activity")
+
+
+def record_activity(user_id, activity_type, note):
+    """Queues an activity, written to the database later by flush_activities together with others"""
+    activity_buffer.push({
+        "key": uuid.uuid4().hex,
+        "user_id": user_id,
+        "activity_type": str(activity_type),
+        "note": note,
+        "created_at": timezone.now().isoformat()
+    })
+
+
+def flush_activity_buffer(batch_size=None, max_batches=100):
+    """
+    Writes queued activities with bulk_create, batch by batch, until the buffer is empty. Returns the number
+    written.
+    """
+    batch_size = batch_size or settings.ACTIVITY_FLUSH_BATCH_SIZE
+    written = 0
+
+    for _ in range(max_batches):
+        # A batch that fails to insert stays in the buffer and is retried first by the next flush
+        with activity_buffer.drain(batch_size) as records:
+            if not records:
+                break
+
+            # Users deleted since, like on_delete=SET_NULL would have done to a written row
+            user_ids = set(User.objects.filter(
+                id__in={record["user_id"] for record in records if record["user_id"]}
+            ).values_list("id", flat=True))
+
+            Activity.objects.bulk_create([
+                Activity(
+                    user_id=record["user_id"] if record["user_id"] in user_ids else None,
+                    activity_type=record["activity_type"],
+                    note=record["note"],
+                    created_at=datetime.fromisoformat(record["created_at"]),
+                    buffer_key=record.get("key")
+                )
+                for record in records
+            ], ignore_conflicts=True)
+
+        written += len(records)
+
+    return written
+
+
+def fetch_user_activity(user_id, after=None, limit=20):
+    """
+    A page of a user's activity, newest first, and the (created_at, id) of its last row to fetch the next page with.
+    Paged with a keyset on the (user, created_at, id) index, so deep pages cost the same as the first one.
+    """
+    activities = Activity.objects.filter(user_id=user_id)
+
+    if after is not None:
+        created_at, pk = after
+        activities = activities.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    page = list(
+        activities.order_by("-created_at", "-id").values("id", "activity_type", "note", "created_at")[:limit + 1]
+    )
+
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    return page, (page[-1]["created_at"], page[-1]["id"]) if has_more else None
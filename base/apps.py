@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class BaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'base'
+
+    def ready(self):
+        from utils.cache import connect_versioned_models
+
+        connect_versioned_models()
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from utils.async_third_party_connection import AsyncPaystackAPIService
+from utils.stub_server import StubHTTPServer
+from utils.third_party_connection import PaystackAPIService
+
+
+# Resolves many account numbers against a local stub server answering after --latency seconds, one call at a time
+# with the blocking client and concurrently with the async one, e.g.
+# python manage.py benchmark_async_http_client --calls=200 --latency=0.05 --concurrency=20
+
+
+class Command(BaseCommand):
+    help = 'Benchmark sequential against concurrent third-party calls'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=200)
+        parser.add_argument('--latency', type=float, default=0.05)
+        parser.add_argument('--concurrency', type=int, default=20)
+
+    def handle(self, *args, **options):
+        calls = options.get("calls")
+        concurrency = options.get("concurrency")
+        accounts = [(f"{index:010d}", "001") for index in range(calls)]
+
+        with StubHTTPServer() as stub, override_settings(PAYSTACK_BASE_URL=stub.url):
+            stub.add_route(
+                "GET", "/bank/resolve", delay=options.get("latency"),
+                body={"status": True, "data": {"account_name": "Test", "account_number": "0000000000"}}
+            )
+
+            start = time.perf_counter()
+            service = PaystackAPIService()
+            sequential = [service.verify_account_number(number, code) for number, code in accounts]
+            sequential_time = time.perf_counter() - start
+
+            async def resolve_all():
+                async with AsyncPaystackAPIService(concurrency=concurrency) as async_service:
+                    return await async_service.gather(
+                        async_service.verify_account_number(number, code) for number, code in accounts
+                    )
+
+            start = time.perf_counter()
+            concurrent = asyncio.run(resolve_all())
+            concurrent_time = time.perf_counter() - start
+
+        failures = sum(1 for result in concurrent if isinstance(result, Exception) or not result.get("status"))
+
+        self.stdout.write(f"Sequential: {sequential_time:.2f}s for {len(sequential)} calls")
+        self.stdout.write(f"Concurrent ({concurrency} at once): {concurrent_time:.2f}s, {failures} failed, "
+                          f"{sequential_time / concurrent_time:.1f}x faster")
+        self.stdout.write(self.style.SUCCESS("Done"))
@@ -0,0 +1,107 @@
+import statistics
+import time
+from decimal import Decimal
+
+from Cryptodome.Cipher import AES
+from Cryptodome.Util.Padding import pad
+from base64 import b64encode
+from django.core.management.base import BaseCommand
+from rest_framework.utils.encoders import JSONEncoder
+
+from utils.encryption_util import AESCipher
+
+
+# Times response encryption on a typical paginated list, e.g.
+# python manage.py benchmark_encryption --items=20 --rounds=200
+
+
+class Command(BaseCommand):
+    help = 'Benchmark response payload encryption'
+
+    key = "0123456789abcdef0123456789abcdef"
+    vector = "abcdef9876543210"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=20)
+        parser.add_argument('--rounds', type=int, default=200)
+
+    def handle(self, *args, **options):
+        payload = self.make_payload(options.get("items"))
+        cipher = AESCipher(self.key, self.vector)
+
+        if self.encrypt_nested_per_leaf(payload) != cipher.encrypt_nested(payload):
+            self.stdout.write(self.style.ERROR("Batched encryption does not match per-leaf encryption."))
+            return
+
+        envelope = cipher.encrypt_envelope(payload, encoder=JSONEncoder)
+        if cipher.decrypt_envelope(envelope)["data"][0]["user_id"] != payload["data"][0]["user_id"]:
+            self.stdout.write(self.style.ERROR("Envelope does not round trip."))
+            return
+
+        results = {
+            "per leaf (previous)": self.time(options.get("rounds"), lambda: self.encrypt_nested_per_leaf(payload)),
+            "batched": self.time(options.get("rounds"), lambda: AESCipher(self.key, self.vector)
+                                 .encrypt_nested(payload)),
+            "envelope (GCM)": self.time(options.get("rounds"), lambda: cipher.encrypt_envelope(payload, JSONEncoder)),
+        }
+
+        for name, timings in results.items():
+            self.stdout.write(f"{name:>20}: avg {statistics.mean(timings):.3f}ms, max {max(timings):.3f}ms")
+
+        speedup = statistics.mean(results["per leaf (previous)"]) / statistics.mean(results["batched"])
+        self.stdout.write(self.style.SUCCESS(f"Batched encryption is {speedup:.1f}x faster than per leaf."))
+
+    @staticmethod
+    def time(rounds, function):
+        timings = []
+
+        for _ in range(rounds):
+            started_at = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - started_at) * 1000)
+
+        return timings
+
+    @staticmethod
+    def make_payload(items):
+        profiles = [
+            {
+                "user_id": f"2510180000{index:04d}",
+                "first_name": "Chinedu",
+                "last_name": f"Okafor {index}",
+                "email": f"user{index}@example.com",
+                "phone_number": f"+234803{index:07d}",
+                "is_active": True,
+                "balance": Decimal("15000.50") + index,
+                "country": {"id": 160, "name": "Nigeria", "code": "NG"},
+                "roles": [{"id": 5, "name": "user", "label": "User"}],
+                "profile_photo": None,
+                "created_at": "2026-10-18T10:00:00.000000Z",
+                "bio": "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor." * 2,
+            }
+            for index in range(items)
+        ]
+
+        return {
+            "page_size": items, "current_page": 1, "last_page": 50, "total": items * 50,
+            "next_page_url": "/api/v1/users/?page=2", "prev_page_url": None, "data": profiles
+        }
+
+    def encrypt_nested_per_leaf(self, ob):
+        """The previous implementation: a new CBC cipher for every leaf"""
+        def encrypt(raw):
+            if raw == "":
+                return raw
+            cipher = AES.new(bytes(self.key, 'ascii'), AES.MODE_CBC, iv=bytes(self.vector, 'ascii'))
+            return b64encode(cipher.encrypt(pad(bytes(raw, 'utf8'), AES.block_size))).decode('utf8')
+
+        if isinstance(ob, dict):
+            return {
+                k: encrypt(str(v)) if isinstance(v, (str, int, Decimal)) else self.encrypt_nested_per_leaf(v)
+                for k, v in ob.items()
+            }
+
+        if isinstance(ob, list):
+            return [self.encrypt_nested_per_leaf(v) for v in ob]
+
+        return encrypt(str(ob))
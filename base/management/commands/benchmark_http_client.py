@@ -0,0 +1,77 @@
+import statistics
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from utils.errors import ServiceUnavailableError
+from utils.metrics import AppMetrics
+from utils.stub_server import StubHTTPServer
+from utils.third_party_connection import PaystackAPIService
+
+
+# Compares pooled keep-alive requests with a new connection per call against a local stub server, then shows
+# retries and the circuit breaker at work, e.g.
+# python manage.py benchmark_http_client --calls=500
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the pooled HTTP client against a local stub server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=500)
+
+    def handle(self, *args, **options):
+        calls = options.get("calls")
+
+        with StubHTTPServer() as stub, override_settings(
+            PAYSTACK_BASE_URL=stub.url, HTTP_RETRY_BACKOFF=0.01, HTTP_CIRCUIT_RESET_TIMEOUT=60
+        ):
+            stub.add_route("GET", "/bank", body={"status": True, "data": [{"name": "Test Bank", "code": "001"}]})
+
+            unpooled = self.time_calls(calls, lambda: requests.get(f"{stub.url}/bank").json())
+            pooled = self.time_calls(calls, lambda: PaystackAPIService().fetch_bank_list())
+
+            self.stdout.write(f"New connection per call: {self.describe(unpooled)}")
+            self.stdout.write(f"Pooled session:          {self.describe(pooled)}")
+
+            # Two 503s, then the normal route: the GET succeeds on its third attempt
+            stub.add_route("GET", "/bank/resolve", status=503, times=2)
+            stub.add_route("GET", "/bank/resolve", body={"status": True, "data": {"account_name": "Test"}})
+            response = PaystackAPIService().verify_account_number("0000000000", "001")
+            self.stdout.write(f"Retried GET: {stub.count('GET', '/bank/resolve')} attempts, "
+                              f"status {response.get('status')}")
+
+            # A failing upstream opens the circuit, later calls fail fast without reaching it
+            stub.add_route("POST", "/transferrecipient", status=500)
+            rejected = 0
+
+            for _ in range(10):
+                try:
+                    PaystackAPIService().create_transfer_recipient({"name": "Test"})
+                except ServiceUnavailableError:
+                    rejected += 1
+
+            self.stdout.write(f"Circuit breaker: {stub.count('POST', '/transferrecipient')} calls reached the "
+                              f"upstream, {rejected} were refused")
+
+        self.stdout.write(str(AppMetrics.snapshot("http")))
+        self.stdout.write(self.style.SUCCESS("Done"))
+
+    @staticmethod
+    def time_calls(calls, function):
+        timings = []
+
+        for _ in range(calls):
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        return timings
+
+    @staticmethod
+    def describe(timings):
+        timings = sorted(timings)
+        return (f"avg {statistics.mean(timings):.3f}ms, p50 {timings[len(timings) // 2]:.3f}ms, "
+                f"p95 {timings[int(len(timings) * 0.95)]:.3f}ms")
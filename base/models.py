@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class AvailableManager(models.Manager):
@@ -80,7 +81,16 @@ class Activity(AppDbModel):
     user = models.ForeignKey("account.User", on_delete=models.SET_NULL, null=True, related_name="activity")
     activity_type = models.CharField(max_length=255, null=True)
     note = models.TextField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the activity is recorded, not when its buffered row is written
+    created_at = models.DateTimeField(default=timezone.now)
+    # Given when the activity is buffered, so a batch written twice (see RedisListBuffer.drain) adds no rows
+    buffer_key = models.CharField(max_length=32, null=True, blank=True, unique=True)
+
+    class Meta:
+        verbose_name_plural = "Activities"
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="activity_user_created_idx"),
+        ]
 
     def __str__(self):
         return "{} by {} - {}".format(self.activity_type, self.user, self.note)
@@ -97,3 +107,31 @@ class ApiRequestLogger(AppDbModel):
 
     class Meta:
         verbose_name_plural = "API Request Logs"
+
+
+class ExportFormatChoices(models.TextChoices):
+    csv = "csv"
+    ndjson = "ndjson"
+
+
+class ExportStatusChoices(models.TextChoices):
+    pending = "pending"
+    processing = "processing"
+    completed = "completed"
+    failed = "failed"
+
+
+class ExportJob(AppDbModel):
+    """An export too large to stream in the request, written to storage by a worker (base.tasks.run_export_job)"""
+    user = models.ForeignKey("account.User", on_delete=models.CASCADE, related_name="export_jobs")
+    resource = models.CharField(max_length=50)
+    export_format = models.CharField(max_length=10, choices=ExportFormatChoices.choices)
+    filter_params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=ExportStatusChoices.choices, default=ExportStatusChoices.pending)
+    file = models.CharField(max_length=255, blank=True)
+    row_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.resource}.{self.export_format}::{self.status}"
@@ -0,0 +1,145 @@
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import storages
+from django.db import transaction as db_transaction
+from django.http import FileResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from base.models import ExportFormatChoices, ExportJob, ExportStatusChoices
+from utils.constants.messages import ResponseMessages
+from utils.errors import NotFoundError, UserError
+from utils.exports import iter_export, make_export_response
+from utils.util import AppLogger, CustomApiRequest
+
+# Services whose fetch_list can be exported, by the resource name used in ExportJob
+EXPORT_SOURCES = {
+    "transactions": "payment.services.TransactionService",
+    "users": "account.v1.services.user.UserService",
+}
+
+
+class ExportService(CustomApiRequest):
+    def __init__(self, request):
+        super().__init__(request)
+
+    def export(self, resource, filter_params):
+        """
+        The rows of the resource's list matching filter_params, as CSV or NDJSON (?export_format=). Streamed in the
+        response, unless there are more than EXPORT_STREAM_MAX_ROWS or ?background=true: an ExportJob is queued and
+        returned.
+        """
+        export_format = filter_params.get("export_format") or ExportFormatChoices.csv
+
+        if export_format not in ExportFormatChoices.values:
+            raise UserError(ResponseMessages.invalid_export_format)
+
+        source = self.get_source(resource)
+        queryset = source.fetch_export_queryset(filter_params)
+
+        if str(filter_params.get("background")).lower() == "true" or self.count(source, queryset) > \
+                settings.EXPORT_STREAM_MAX_ROWS:
+            return self.queue_job(resource, export_format, filter_params)
+
+        return make_export_response(
+            queryset, source.export_fields, export_format, file_name=f"{resource}-{timezone.now():%Y%m%d%H%M%S}",
+            chunk_size=settings.EXPORT_CHUNK_SIZE
+        )
+
+    def get_source(self, resource):
+        return import_string(EXPORT_SOURCES[resource])(self.request)
+
+    @staticmethod
+    def count(source, queryset):
+        if source.count_strategy is not None:
+            return source.count_strategy.count(queryset)[0]
+
+        return queryset.count()
+
+    def queue_job(self, resource, export_format, filter_params):
+        from base.tasks import run_export_job
+
+        job = ExportJob.objects.create(
+            user=self.auth_user, resource=resource, export_format=export_format, filter_params=filter_params
+        )
+        db_transaction.on_commit(lambda: run_export_job.delay(job.id))
+
+        return self.make_job_data(job)
+
+    def fetch_job(self, job_id):
+        job = ExportJob.objects.filter(id=job_id, user=self.auth_user).first()
+
+        if not job:
+            raise NotFoundError()
+
+        return self.make_job_data(job)
+
+    def download_job(self, job_id):
+        """The file of a completed job of the user, as an attachment"""
+        job = ExportJob.objects.filter(id=job_id, user=self.auth_user, status=ExportStatusChoices.completed).first()
+
+        if not job or not job.file:
+            raise NotFoundError()
+
+        return FileResponse(
+            storages["exports"].open(job.file), as_attachment=True,
+            filename=f"{job.resource}-{job.completed_at:%Y%m%d%H%M%S}.{job.export_format}"
+        )
+
+    @staticmethod
+    def make_job_data(job):
+        completed = job.status == ExportStatusChoices.completed
+
+        return {
+            "id": job.id,
+            "resource": job.resource,
+            "format": job.export_format,
+            "status": job.status,
+            "row_count": job.row_count,
+            "url": reverse("export_job_download", kwargs={"job_id": job.id}) if completed else None,
+            "error": job.error or None,
+            "created_at": job.created_at,
+            "completed_at": job.completed_at,
+        }
+
+    def run_job(self, job_id):
+        """Writes the export of a pending job to storage. Returns False when another worker already took the job."""
+        claimed = ExportJob.objects.filter(id=job_id, status=ExportStatusChoices.pending).update(
+            status=ExportStatusChoices.processing
+        )
+
+        if not claimed:
+            return False
+
+        job = ExportJob.objects.get(id=job_id)
+
+        try:
+            source = self.get_source(job.resource)
+            queryset = source.fetch_export_queryset(job.filter_params)
+            lines = iter_export(queryset, source.export_fields, job.export_format, settings.EXPORT_CHUNK_SIZE)
+            line_count = 0
+
+            with tempfile.TemporaryFile() as file:
+                for line in lines:
+                    file.write(line.encode("utf-8"))
+                    line_count += 1
+
+                file.seek(0)
+                # A random name, nothing to guess it from
+                job.file = storages["exports"].save(f"{uuid.uuid4().hex}.{job.export_format}", File(file))
+
+            job.row_count = line_count - 1 if job.export_format == ExportFormatChoices.csv else line_count
+            job.status = ExportStatusChoices.completed
+            job.completed_at = timezone.now()
+        except Exception as e:
+            AppLogger.report(e, "ExportService.run_job")
+            job.status = ExportStatusChoices.failed
+            job.error = str(e)
+
+        job.save(update_fields=["file", "row_count", "status", "error", "completed_at"])
+
+        return True
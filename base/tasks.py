@@ -1,41 +1,35 @@
-from django.conf import settings
-from core.celery import app
-from base.models import ApiRequestLogger, Activity
-
-
-@app.task
-def make_api_request_log(user_id, request_data, request_path, ref_id, headers):
-    if isinstance(request_data, dict):
-        request_data = {k: "****" if k in settings.SENSITIVE_KEYS else v for k, v in request_data.items()}
-
-    ApiRequestLogger.objects.create(
-        user_id=user_id,
-        path=request_path,
-        headers=headers,
-        request_data=request_data,
-        ref_id=ref_id
-    )
-
-
-@app.task
-def update_api_request_log(ref_id, response_status, response_body):
-    request_log = ApiRequestLogger.objects.filter(ref_id=ref_id).first()
+import json
 
-    data = response_body.get("data")
-
-    if isinstance(data, dict):
-        response_body = {k: "****" if k in settings.SENSITIVE_KEYS else v for k, v in response_body.get("data").items()}
-
-    if request_log:
-        request_log.status = response_status
-        request_log.response_body = response_body
-        request_log.save()
-
-
-@app.task
-def report_activity(user, activity_type, description):
-    Activity.objects.create(
-        user=user,
-        activity_type=activity_type,
-        note=description
-    )
+from core.celery import app
+from base.activity import flush_activity_buffer
+from base.models import ApiRequestLogger
+from utils.constants.others import CeleryTaskQueue
+
+
+@app.task(queue=CeleryTaskQueue.logging, ignore_result=True)
+def save_api_request_logs(records):
+    """Writes a batch of buffered request logs (see utils.request_log), already masked, as one row per request"""
+    ApiRequestLogger.objects.bulk_create([
+        ApiRequestLogger(
+            user_id=record["user_id"],
+            path=record["path"],
+            ref_id=record["ref_id"],
+            headers=record["headers"],
+            request_data=json.loads(record["request_data"]),
+            response_body=json.loads(record["response_body"]),
+            status=record["status"]
+        )
+        for record in records
+    ], batch_size=500)
+
+
+@app.task(ignore_result=True)
+def flush_activities():
+    return flush_activity_buffer()
+
+
+@app.task(ignore_result=True)
+def run_export_job(job_id):
+    from base.services import ExportService
+
+    return ExportService(None).run_job(job_id)
@@ -0,0 +1,7 @@
+from django.urls import path
+from base.views import ExportJobAPIView, ExportJobDownloadAPIView
+
+urlpatterns = [
+    path("<int:job_id>", ExportJobAPIView.as_view(), name='export_job'),
+    path("<int:job_id>/download", ExportJobDownloadAPIView.as_view(), name='export_job_download'),
+]
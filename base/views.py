@@ -1,3 +1,25 @@
-from django.shortcuts import render
+from rest_framework.generics import RetrieveAPIView
+from rest_framework.permissions import IsAuthenticated
 
-# Create your views here.
+from base.services import ExportService
+from utils.util import CustomApiRequest
+
+
+class ExportJobAPIView(RetrieveAPIView, CustomApiRequest):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        service = ExportService(request)
+        job_id = kwargs.get("job_id")
+
+        return self.process_request(request, target_function=service.fetch_job, job_id=job_id)
+
+
+class ExportJobDownloadAPIView(RetrieveAPIView, CustomApiRequest):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        service = ExportService(request)
+        job_id = kwargs.get("job_id")
+
+        return self.process_request(request, target_function=service.download_job, job_id=job_id)
@@ -32,5 +32,20 @@ def debug_task(self):
 
 
 app.conf.beat_schedule = {
-
+    "flush-activities": {
+        "task": "base.tasks.flush_activities",
+        "schedule": settings.ACTIVITY_FLUSH_INTERVAL,
+    },
+    "reconcile-wallet-balances": {
+        "task": "payment.tasks.reconcile_wallet_balances",
+        "schedule": settings.WALLET_RECONCILIATION_INTERVAL,
+    },
+    "sweep-paystack-events": {
+        "task": "payment.tasks.sweep_paystack_events",
+        "schedule": settings.PAYSTACK_WEBHOOK_SWEEP_INTERVAL,
+    },
+    "process-payouts": {
+        "task": "payment.tasks.process_payouts",
+        "schedule": settings.PAYOUT_INTERVAL,
+    },
 }
@@ -154,6 +154,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = "account.User"
 
 DEFAULT_PAGE_SIZE = os.getenv("DEFAULT_PAGE_SIZE", 10)
+# List totals are cached this many seconds, and above this many rows (0 disables) the planner estimate is used
+PAGINATION_COUNT_CACHE_TIMEOUT = int(os.getenv("PAGINATION_COUNT_CACHE_TIMEOUT", 30))
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(os.getenv("PAGINATION_COUNT_ESTIMATE_THRESHOLD", 100000))
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
@@ -185,6 +188,21 @@ SIMPLE_JWT = {
 
 DEFAULT_CACHE_TIMEOUT = 600
 
+# Models whose saves, deletes and m2m changes bump the generation counter used by utils.cache.CachedQuery
+CACHE_VERSIONED_MODELS = [
+    "account.User",
+    "account.IDType",
+    "roles_permissions.Role",
+    "roles_permissions.Permission",
+    "location.Country",
+    "location.State",
+    "location.City",
+    "media.Media",
+    "media.UploadedMedia",
+    "payment.Bank",
+    "payment.BankAccount",
+]
+
 REDIS_HOST = os.getenv("REDIS_HOST")
 REDIS_PREFIX = os.getenv("REDIS_PREFIX", "dbt")
 
@@ -225,11 +243,14 @@ APP_INFO_DEFAULTS = {
 SYSTEM_DEFAULT_EMAIL_RECIPIENTS = os.getenv("DEFAULT_EMAIL_RECIPIENTS")
 
 APP_ENC_ENABLED = os.getenv("APP_ENC_ENABLED", "False").lower() == "true"
+# AES key (16, 24 or 32 characters) and CBC vector (16 characters) shared with the clients
+APP_ENC_KEY = os.getenv("APP_ENC_KEY", "")
+APP_ENC_VEC = os.getenv("APP_ENC_VEC", "")
+# Request header a client sets to "envelope" to receive the whole body sealed with AES-GCM instead
+APP_ENC_MODE_HEADER = os.getenv("APP_ENC_MODE_HEADER", "X-Encryption-Mode")
 DEFAULT_PASSWORD = os.getenv("DEFAULT_PASSWORD")
 DEFAULT_OTP = os.getenv("DEFAULT_OTP")
 
-DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
-
 # S3 bucket config
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID', '')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY', '')
@@ -240,6 +261,8 @@ AWS_S3_OBJECT_PARAMETERS = {
 }
 AWS_S3_SIGNATURE_VERSION = 's3v4'
 AWS_S3_REGION_NAME = os.getenv("AWS_S3_REGION_NAME", "")
+# Set to use an S3-compatible store (MinIO, a local stand-in) instead of AWS
+AWS_S3_ENDPOINT_URL = os.getenv("AWS_S3_ENDPOINT_URL") or None
 AWS_S3_FILE_OVERWRITE = False
 AWS_S3_VERIFY = True
 
@@ -250,6 +273,27 @@ USES_S3_BUCKET = os.getenv('USES_S3_BUCKET', 'true').lower() == 'true'
 MEDIA_URL = 'https://%s/%s/' % (AWS_S3_CUSTOM_DOMAIN, PUBLIC_MEDIA_LOCATION) if USES_S3_BUCKET else '/media/'
 AWS_DEFAULT_ACL = None
 
+STORAGES = {
+    "default": {
+        "BACKEND": "storages.backends.s3boto3.S3Boto3Storage" if USES_S3_BUCKET
+        else "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+    # Background exports hold personal data: kept private, only downloaded through the API by their owner
+    "exports": {
+        "BACKEND": "storages.backends.s3boto3.S3Boto3Storage",
+        "OPTIONS": {
+            "location": "private/exports", "default_acl": "private", "custom_domain": None, "querystring_auth": True,
+            "querystring_expire": 300,
+        },
+    } if USES_S3_BUCKET else {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": os.path.join(BASE_DIR, "private_exports"), "base_url": None},
+    },
+}
+
 
 DEFAULT_PROFILE_IMAGE = os.getenv("DEFAULT_PROFILE_IMAGE")
 
@@ -264,6 +308,24 @@ ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", None)
 ADMIN_PHONE_NUMBER = os.getenv("ADMIN_PHONE_NUMBER", None)
 
 API_REQUEST_LOGGING_ENABLED = os.getenv("API_REQUEST_LOGGING_ENABLED", "false").lower() == "true"
+# Share of requests logged (0 to 1), and the size in characters kept of each request/response body
+API_REQUEST_LOGGING_SAMPLE_RATE = float(os.getenv("API_REQUEST_LOGGING_SAMPLE_RATE", 1))
+API_REQUEST_LOGGING_MAX_BODY_SIZE = int(os.getenv("API_REQUEST_LOGGING_MAX_BODY_SIZE", 4096))
+# Logs are buffered per worker and written in batches of this size, or after this many seconds
+API_REQUEST_LOGGING_BATCH_SIZE = int(os.getenv("API_REQUEST_LOGGING_BATCH_SIZE", 100))
+API_REQUEST_LOGGING_FLUSH_INTERVAL = int(os.getenv("API_REQUEST_LOGGING_FLUSH_INTERVAL", 5))
+SENSITIVE_KEYS = os.getenv(
+    "SENSITIVE_KEYS",
+    "password,confirm_password,old_password,new_password,pin,otp,token,access,refresh,secret,cvv,card_number,bvn"
+).split(",")
+
+# Recorded activities are queued in Redis and written by a beat task every ACTIVITY_FLUSH_INTERVAL seconds
+ACTIVITY_FLUSH_INTERVAL = int(os.getenv("ACTIVITY_FLUSH_INTERVAL", 10))
+ACTIVITY_FLUSH_BATCH_SIZE = int(os.getenv("ACTIVITY_FLUSH_BATCH_SIZE", 1000))
+# Seconds a drain of a Redis buffer keeps its lock after its worker is gone (it is extended while the worker writes)
+BUFFER_DRAIN_LOCK_TIMEOUT = int(os.getenv("BUFFER_DRAIN_LOCK_TIMEOUT", 300))
+# Times a batch is tried before it is moved to the buffer's dead letter list
+BUFFER_DRAIN_MAX_ATTEMPTS = int(os.getenv("BUFFER_DRAIN_MAX_ATTEMPTS", 3))
 
 # MailJet Settings
 MJ_API_KEY = os.getenv("MJ_API_KEY")
@@ -276,6 +338,28 @@ CLOUDINARY_API_KEY = os.getenv("CLOUDINARY_API_KEY")
 CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET")
 CLOUDINARY_API_NAME = os.getenv("CLOUDINARY_API_NAME")
 
+# Uploads larger than FILE_UPLOAD_MAX_MEMORY_SIZE bytes are written to a temporary file as they arrive, then sent to
+# the storage backend in MEDIA_UPLOAD_CHUNK_SIZE byte chunks (Cloudinary takes 5MB at least), MEDIA_UPLOAD_CONCURRENCY
+# files of a request at a time
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv("FILE_UPLOAD_MAX_MEMORY_SIZE", 2621440))
+MEDIA_UPLOAD_CHUNK_SIZE = int(os.getenv("MEDIA_UPLOAD_CHUNK_SIZE", 6 * 1024 * 1024))
+MEDIA_UPLOAD_CONCURRENCY = int(os.getenv("MEDIA_UPLOAD_CONCURRENCY", 4))
+# Where uploads are stored, unless their Media type names a storage_backend: "cloudinary", "amazon" (default storage,
+# the S3 bucket) or "local", the disk of this machine under LOCAL_STORAGE_ROOT served at LOCAL_STORAGE_URL (in DEBUG)
+MEDIA_STORAGE_BACKEND = os.getenv("MEDIA_STORAGE_BACKEND", "cloudinary")
+LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", os.path.join(BASE_DIR, "local_media"))
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "/local-media/")
+# Direct uploads: the signed form is valid MEDIA_DIRECT_UPLOAD_EXPIRY seconds, the upload can be finalized for
+# MEDIA_DIRECT_UPLOAD_FINALIZE_WINDOW more seconds, enough for a large file to get through
+MEDIA_DIRECT_UPLOAD_EXPIRY = int(os.getenv("MEDIA_DIRECT_UPLOAD_EXPIRY", 300))
+MEDIA_DIRECT_UPLOAD_FINALIZE_WINDOW = int(os.getenv("MEDIA_DIRECT_UPLOAD_FINALIZE_WINDOW", 3600))
+# Uploaded images get copies MEDIA_DERIVATIVE_WIDTHS pixels wide in each of MEDIA_DERIVATIVE_FORMATS (webp, avif,
+# jpeg), encoded at MEDIA_DERIVATIVE_QUALITY by a pool of MEDIA_DERIVATIVE_PROCESSES processes per worker
+MEDIA_DERIVATIVE_WIDTHS = [int(width) for width in os.getenv("MEDIA_DERIVATIVE_WIDTHS", "160,320,640,1080").split(",")]
+MEDIA_DERIVATIVE_FORMATS = os.getenv("MEDIA_DERIVATIVE_FORMATS", "webp,avif").split(",")
+MEDIA_DERIVATIVE_QUALITY = int(os.getenv("MEDIA_DERIVATIVE_QUALITY", 75))
+MEDIA_DERIVATIVE_PROCESSES = int(os.getenv("MEDIA_DERIVATIVE_PROCESSES", 2))
+
 SEND_EMAIL_VIA = os.getenv("SEND_EMAIL_VIA")
 
 # Email config
@@ -289,6 +373,52 @@ EMAIL_PORT = os.getenv("EMAIL_PORT")
 # Prembly Config
 PREMBLY_API_KEY = os.getenv("PREMBLY_API_KEY", "")
 PREMBLY_APP_ID = os.getenv("PREMBLY_APP_ID", "")
+PREMBLY_BASE_URL = os.getenv("PREMBLY_BASE_URL", "https://api.prembly.com/verification")
 
 PAYSTACK_SECRET_KEY = os.getenv("PAYSTACK_SECRET_KEY")
 PAYSTACK_PUBLIC_KEY = os.getenv("PAYSTACK_PUBLIC_KEY")
+PAYSTACK_BASE_URL = os.getenv("PAYSTACK_BASE_URL", "https://api.paystack.co")
+
+# Paystack lookups a user waits on (bank list, account resolution) give up after PAYSTACK_LOOKUP_TIMEOUT seconds.
+# Their results are cached for *_CACHE_TTL seconds, then served stale for up to *_STALE_TTL more while refreshed in
+# the background; "not found" results and the local bank list used as fallback for PROVIDER_LOOKUP_NEGATIVE_TTL.
+PAYSTACK_LOOKUP_TIMEOUT = float(os.getenv("PAYSTACK_LOOKUP_TIMEOUT", 3))
+BANK_LIST_CACHE_TTL = int(os.getenv("BANK_LIST_CACHE_TTL", 6 * 60 * 60))
+BANK_LIST_STALE_TTL = int(os.getenv("BANK_LIST_STALE_TTL", 7 * 24 * 60 * 60))
+ACCOUNT_RESOLUTION_CACHE_TTL = int(os.getenv("ACCOUNT_RESOLUTION_CACHE_TTL", 24 * 60 * 60))
+ACCOUNT_RESOLUTION_STALE_TTL = int(os.getenv("ACCOUNT_RESOLUTION_STALE_TTL", 7 * 24 * 60 * 60))
+PROVIDER_LOOKUP_NEGATIVE_TTL = int(os.getenv("PROVIDER_LOOKUP_NEGATIVE_TTL", 60))
+
+# Webhook events still pending after PAYSTACK_WEBHOOK_SWEEP_INTERVAL seconds are queued again, until
+# PAYSTACK_WEBHOOK_MAX_ATTEMPTS processing attempts failed
+PAYSTACK_WEBHOOK_SWEEP_INTERVAL = int(os.getenv("PAYSTACK_WEBHOOK_SWEEP_INTERVAL", 60))
+PAYSTACK_WEBHOOK_MAX_ATTEMPTS = int(os.getenv("PAYSTACK_WEBHOOK_MAX_ATTEMPTS", 5))
+
+# Pending withdrawals are paid out every PAYOUT_INTERVAL seconds, PAYOUT_BATCH_SIZE claimed at a time and sent in
+# /transfer/bulk requests of PAYSTACK_BULK_TRANSFER_SIZE (Paystack accepts up to 100). A claim not submitted within
+# PAYOUT_CLAIM_TIMEOUT seconds goes back to the queue.
+PAYOUT_INTERVAL = int(os.getenv("PAYOUT_INTERVAL", 60))
+PAYOUT_BATCH_SIZE = int(os.getenv("PAYOUT_BATCH_SIZE", 1000))
+PAYOUT_CLAIM_TIMEOUT = int(os.getenv("PAYOUT_CLAIM_TIMEOUT", 15 * 60))
+PAYSTACK_BULK_TRANSFER_SIZE = int(os.getenv("PAYSTACK_BULK_TRANSFER_SIZE", 100))
+
+# Wallet balances are checked against the ledger (payment.LedgerEntry) every WALLET_RECONCILIATION_INTERVAL seconds
+WALLET_RECONCILIATION_INTERVAL = int(os.getenv("WALLET_RECONCILIATION_INTERVAL", 60 * 60))
+
+# Outbound HTTP (utils.http_client): timeouts in seconds, retries of idempotent calls with jittered backoff, and a
+# circuit breaker per upstream that stops calling it for HTTP_CIRCUIT_RESET_TIMEOUT seconds after repeated failures
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.05))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 15))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 10))
+# Calls in flight at once when a worker fans out through utils.async_third_party_connection
+HTTP_ASYNC_CONCURRENCY = int(os.getenv("HTTP_ASYNC_CONCURRENCY", 20))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 2))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", 0.25))
+HTTP_RETRY_BACKOFF_MAX = float(os.getenv("HTTP_RETRY_BACKOFF_MAX", 2))
+HTTP_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("HTTP_CIRCUIT_FAILURE_THRESHOLD", 5))
+HTTP_CIRCUIT_RESET_TIMEOUT = float(os.getenv("HTTP_CIRCUIT_RESET_TIMEOUT", 30))
+
+# Exports stream straight to the client, EXPORT_CHUNK_SIZE rows fetched at a time. Above EXPORT_STREAM_MAX_ROWS rows
+# they are written to the private "exports" storage by a worker instead and downloaded through the API once done.
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 2000))
+EXPORT_STREAM_MAX_ROWS = int(os.getenv("EXPORT_STREAM_MAX_ROWS", 100000))
@@ -1,3 +1,5 @@
+from utils.cache import CachedQuery
+from utils.metrics import AppMetrics
 from utils.util import CustomApiRequest
 
 
@@ -19,3 +21,9 @@ class OtherService(CustomApiRequest):
             system_options["options_items"] = options_items
 
         return system_options
+
+    def fetch_metrics(self, filter_params):
+        return {
+            **AppMetrics.snapshot(prefix=filter_params.get("keyword")),
+            "cached_queries": CachedQuery.stats()
+        }
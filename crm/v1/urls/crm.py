@@ -1,8 +1,9 @@
 from django.urls import path
 
-from crm.v1.views.others import ListOptionsAPIView, ListIdTypesAPIView
+from crm.v1.views.others import ListOptionsAPIView, ListIdTypesAPIView, MetricsAPIView
 
 urlpatterns = [
     path('id-types', ListIdTypesAPIView.as_view(), name="list_id_types"),
     path('options', ListOptionsAPIView.as_view(), name="list_options"),
+    path('metrics', MetricsAPIView.as_view(), name="metrics"),
 ]
@@ -5,6 +5,7 @@ from rest_framework.permissions import IsAuthenticated
 from account.v1.serializers.profile import IdTypeSerializer
 from account.v1.services.profile import IdTypeService
 from crm.v1.services.others import OtherService
+from roles_permissions.constants import RoleEnum
 from utils.util import CustomApiRequest
 
 
@@ -30,3 +31,16 @@ class ListIdTypesAPIView(ListAPIView, CustomApiRequest):
         service = IdTypeService(request)
 
         return self.process_request(request, service.fetch_list, filter_params={})
+
+
+@extend_schema(tags=["Options"])
+class MetricsAPIView(ListAPIView, CustomApiRequest):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        self.roles_required = [RoleEnum.sysadmin]
+        service = OtherService(request)
+
+        filter_params = self.get_request_filter_params()
+
+        return self.process_request(request, service.fetch_metrics, filter_params=filter_params)
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class LocationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'location'
+
+    def ready(self):
+        from django.db.models.signals import post_save, post_delete
+
+        from location.v1.index import record_location_change
+        from location.v1.models import City, Country, State
+
+        for model in [Country, State, City]:
+            post_save.connect(record_location_change, sender=model, dispatch_uid=f"location_index:{model.__name__}")
+            post_delete.connect(record_location_change, sender=model, dispatch_uid=f"location_index:{model.__name__}")
@@ -0,0 +1,79 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from location.v1.index import LocationIndex
+from location.v1.models import City
+
+
+class Command(BaseCommand):
+    help = "Compares in-memory location index lookups with icontains queries on City"
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--queries', type=int, default=500)
+        parser.add_argument('-l', '--limit', type=int, default=10)
+        parser.add_argument('--prefix-length', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        """
+            Samples city names already in the database and looks up a prefix of each one, e.g.
+            python manage.py benchmark_location_search --queries 1000 --prefix-length 4
+        """
+        limit = options.get("limit")
+        names = list(City.objects.filter(is_active=True).values_list("name", flat=True)[:50000])
+
+        if not names:
+            self.stdout.write(self.style.WARNING("No cities found, run seed_cities first."))
+            return
+
+        rng = random.Random(options.get("seed"))
+        queries = [rng.choice(names)[:options.get("prefix_length")] for _ in range(options.get("queries"))]
+
+        index = LocationIndex()
+        started_at = time.perf_counter()
+        index.refresh()
+        build_ms = (time.perf_counter() - started_at) * 1000
+
+        self.stdout.write(
+            f"Index built in {build_ms:.1f}ms ({len(index.city_index)} city keys, {len(index.state_index)} state keys)"
+        )
+
+        def run_icontains(query):
+            return list(
+                City.objects.filter(is_active=True, name__icontains=query)
+                .select_related("state__country")[:limit]
+            )
+
+        results = {
+            "icontains": self.time_queries(queries, run_icontains),
+            "index prefix": self.time_queries(queries, lambda query: index.search(query, limit=limit)),
+            "index fuzzy": self.time_queries(queries, lambda query: index.search(query, limit=limit, fuzzy=True)),
+        }
+
+        for name, timings in results.items():
+            self.stdout.write(
+                f"{name:>14}: avg {statistics.mean(timings):.3f}ms, "
+                f"p50 {self.percentile(timings, 50):.3f}ms, p95 {self.percentile(timings, 95):.3f}ms"
+            )
+
+        speedup = statistics.mean(results["icontains"]) / max(statistics.mean(results["index prefix"]), 1e-6)
+        self.stdout.write(self.style.SUCCESS(f"Index prefix lookups are {speedup:.1f}x faster than icontains."))
+
+    @staticmethod
+    def time_queries(queries, lookup):
+        timings = []
+
+        for query in queries:
+            started_at = time.perf_counter()
+            lookup(query)
+            timings.append((time.perf_counter() - started_at) * 1000)
+
+        return timings
+
+    @staticmethod
+    def percentile(timings, percent):
+        ordered = sorted(timings)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
@@ -6,6 +6,7 @@ from location.v1.services import location_service
 class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('-c', '--country', required=False)
+        parser.add_argument('-b', '--batch-size', type=int, default=1000)
 
     def handle(self, *args, **options):
         """
@@ -15,4 +16,15 @@ class Command(BaseCommand):
         """
         country = options.get("country")
 
-        location_service.create_cities(country=country)
+        stats = location_service.create_cities(country=country, batch_size=options.get("batch_size"),
+                                               progress=self.report_progress)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Cities seeded: {stats['created']} created, {stats['updated']} updated, {stats['skipped']} unchanged, "
+            f"{stats['invalid']} invalid."
+        ))
+
+    def report_progress(self, stats):
+        self.stdout.write(
+            f"{stats['processed']} rows processed, {stats['created']} cities created ({stats['rows_per_sec']} rows/sec)"
+        )
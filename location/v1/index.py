@@ -0,0 +1,327 @@
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right
+
+from django.core.cache import cache
+from django.db import transaction
+
+from location.v1.models import City, Country, State
+from utils.constants.others import LocationType, MetricName
+from utils.metrics import AppMetrics
+
+
+def normalize_name(name):
+    """Case and accent insensitive form of a name, e.g. 'Ọ̀yọ́' -> 'oyo'"""
+    decomposed = unicodedata.normalize("NFKD", str(name or ""))
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold().strip()
+
+
+def name_keys(name):
+    """The full name plus every word start, so 'Port Harcourt' is found by 'port' and by 'harc'"""
+    words = normalize_name(name).split()
+    return {" ".join(words[position:]) for position in range(len(words))}
+
+
+def bounded_distance(a, b, max_distance):
+    """Levenshtein distance between a and b, or max_distance + 1 as soon as it is known to be larger"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(b) + 1))
+
+    for i, char_a in enumerate(a, start=1):
+        current = [i] + [0] * len(b)
+
+        for j, char_b in enumerate(b, start=1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+
+        if min(current) > max_distance:
+            return max_distance + 1
+
+        previous = current
+
+    return previous[-1]
+
+
+class PrefixIndex:
+    """Sorted array of normalized keys with a parallel array of row ids"""
+
+    def __init__(self, entries=None):
+        entries = sorted(entries or [])
+        self.keys = [key for key, _ in entries]
+        self.ids = array("q", [pk for _, pk in entries])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, name, pk):
+        for key in name_keys(name):
+            position = bisect_right(self.keys, key)
+            self.keys.insert(position, key)
+            self.ids.insert(position, pk)
+
+    def remove(self, name, pk):
+        for key in name_keys(name):
+            for position in range(bisect_left(self.keys, key), bisect_right(self.keys, key)):
+                if self.ids[position] == pk:
+                    del self.keys[position]
+                    del self.ids[position]
+                    break
+
+    def prefix(self, query, max_results):
+        """Ids whose keys start with query, in key order"""
+        position = bisect_left(self.keys, query)
+
+        while position < len(self.keys) and self.keys[position].startswith(query):
+            yield self.keys[position], self.ids[position]
+            position += 1
+
+            max_results -= 1
+            if max_results <= 0:
+                return
+
+    def fuzzy(self, query, max_distance):
+        """(distance, key, id) of keys whose leading part is within max_distance edits of query"""
+        # Typos in the first letter are not looked for, it keeps the scan to a single bucket
+        start = bisect_left(self.keys, query[0])
+        end = bisect_left(self.keys, chr(ord(query[0]) + 1))
+
+        for position in range(start, end):
+            key = self.keys[position]
+            distance = min(bounded_distance(query, key[:len(query) + offset], max_distance) for offset in (-1, 0, 1))
+
+            if distance <= max_distance:
+                yield distance, key, self.ids[position]
+
+
+class LocationChangeFeed:
+    """
+    Ordered log of changed location rows kept in the shared cache, so the index of every worker catches up by applying
+    only the rows changed since it last looked instead of rebuilding.
+    """
+    sequence_key = "location_index:sequence"
+    entry_key = "location_index:change:{}"
+    max_entries = 1000
+    entry_timeout = 60 * 60 * 24
+
+    @classmethod
+    def current(cls):
+        return cache.get(cls.sequence_key) or 0
+
+    @classmethod
+    def push(cls, model_name, pk=None):
+        """pk=None asks every index for a full rebuild (e.g. after a bulk import)"""
+        try:
+            sequence = cache.incr(cls.sequence_key)
+        except ValueError:
+            cache.add(cls.sequence_key, 0, timeout=None)
+            sequence = cache.incr(cls.sequence_key)
+
+        cache.set(cls.entry_key.format(sequence), (model_name, pk), cls.entry_timeout)
+
+    @classmethod
+    def push_on_commit(cls, model_name, pk=None):
+        transaction.on_commit(lambda: cls.push(model_name, pk))
+
+    @classmethod
+    def read(cls, after, until):
+        """Changes in (after, until], or None when they can not all be read and a rebuild is needed"""
+        if until - after > cls.max_entries:
+            return None
+
+        keys = [cls.entry_key.format(sequence) for sequence in range(after + 1, until + 1)]
+        entries = cache.get_many(keys)
+
+        if len(entries) != len(keys):
+            return None
+
+        changes = [entries[key] for key in keys]
+
+        if any(pk is None for _, pk in changes):
+            return None
+
+        return changes
+
+
+class LocationIndex:
+    """
+    In-memory index of active cities and states for prefix (autocomplete) and fuzzy lookups, built lazily on first use.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.is_built = False
+        self.sequence = 0
+
+        self.countries = {}
+        self.states = {}
+        self.cities = {}
+        self.state_index = PrefixIndex()
+        self.city_index = PrefixIndex()
+
+    def build(self):
+        self.sequence = LocationChangeFeed.current()
+
+        self.countries = {
+            pk: (name, code, is_active)
+            for pk, name, code, is_active in Country.objects.values_list("id", "name", "code", "is_active")
+        }
+        self.states = {
+            pk: (name, code, country_id)
+            for pk, name, code, country_id in State.objects.filter(is_active=True)
+            .values_list("id", "name", "code", "country_id")
+        }
+        self.cities = {
+            pk: (name, state_id)
+            for pk, name, state_id in City.objects.filter(is_active=True).values_list("id", "name", "state_id")
+        }
+
+        self.state_index = PrefixIndex([(key, pk) for pk, (name, *_) in self.states.items() for key in name_keys(name)])
+        self.city_index = PrefixIndex([(key, pk) for pk, (name, _) in self.cities.items() for key in name_keys(name)])
+
+        self.is_built = True
+        AppMetrics.increment(MetricName.location_index_rebuilds)
+
+    def refresh(self):
+        """Builds the index on first use and afterwards applies the changes other workers (or this one) made"""
+        with self.lock:
+            if not self.is_built:
+                return self.build()
+
+            sequence = LocationChangeFeed.current()
+
+            if sequence == self.sequence:
+                return None
+
+            changes = LocationChangeFeed.read(self.sequence, sequence)
+
+            if changes is None or sequence < self.sequence:
+                return self.build()
+
+            self.apply_changes(changes)
+            self.sequence = sequence
+            AppMetrics.increment(MetricName.location_index_incremental_updates, len(changes))
+
+    def apply_changes(self, changes):
+        changed = {"country": set(), "state": set(), "city": set()}
+
+        for model_name, pk in changes:
+            changed[model_name].add(pk)
+
+        if changed["country"]:
+            rows = Country.objects.filter(pk__in=changed["country"]).values_list("id", "name", "code", "is_active")
+            found = {pk: (name, code, is_active) for pk, name, code, is_active in rows}
+
+            for pk in changed["country"]:
+                self.countries.pop(pk, None)
+                if pk in found:
+                    self.countries[pk] = found[pk]
+
+        if changed["state"]:
+            rows = State.objects.filter(pk__in=changed["state"], is_active=True).values_list(
+                "id", "name", "code", "country_id")
+            found = {pk: (name, code, country_id) for pk, name, code, country_id in rows}
+
+            for pk in changed["state"]:
+                self.upsert(self.states, self.state_index, pk, found.get(pk))
+
+        if changed["city"]:
+            rows = City.objects.filter(pk__in=changed["city"], is_active=True).values_list("id", "name", "state_id")
+            found = {pk: (name, state_id) for pk, name, state_id in rows}
+
+            for pk in changed["city"]:
+                self.upsert(self.cities, self.city_index, pk, found.get(pk))
+
+    @staticmethod
+    def upsert(records, prefix_index, pk, record):
+        existing = records.pop(pk, None)
+
+        if existing is not None:
+            prefix_index.remove(existing[0], pk)
+
+        if record is not None:
+            records[pk] = record
+            prefix_index.add(record[0], pk)
+
+    def search(self, query, kind=LocationType.city, limit=10, fuzzy=False):
+        self.refresh()
+
+        query = normalize_name(query)
+        if not query:
+            return []
+
+        if kind == LocationType.state:
+            records, prefix_index, serialize = self.states, self.state_index, self.serialize_state
+        else:
+            records, prefix_index, serialize = self.cities, self.city_index, self.serialize_city
+
+        matches = {}
+
+        for key, pk in prefix_index.prefix(query, max_results=limit * 20):
+            # Whole-name matches rank above word matches, shorter (closer) names first
+            rank = (0, key != query, not normalize_name(records[pk][0]).startswith(query), len(key))
+            matches[pk] = min(rank, matches.get(pk, rank))
+
+        if fuzzy and len(matches) < limit:
+            max_distance = 1 if len(query) <= 4 else 2
+
+            for distance, key, pk in prefix_index.fuzzy(query, max_distance):
+                rank = (distance + 1, False, False, len(key))
+                matches[pk] = min(rank, matches.get(pk, rank))
+
+        results = []
+
+        for pk in sorted(matches, key=lambda match_pk: matches[match_pk]):
+            result = serialize(pk)
+
+            # Rows under an inactive state or country are kept in the index but not returned
+            if result is not None:
+                results.append(result)
+
+            if len(results) >= limit:
+                break
+
+        return results
+
+    def serialize_country(self, country_id):
+        country = self.countries.get(country_id)
+
+        if country is None or not country[2]:
+            return None
+
+        name, code, _ = country
+        return {"id": country_id, "name": name, "code": code}
+
+    def serialize_state(self, state_id):
+        state = self.states.get(state_id)
+
+        if state is None:
+            return None
+
+        name, code, country_id = state
+        country = self.serialize_country(country_id)
+
+        if country is None:
+            return None
+
+        return {"id": state_id, "name": name, "code": code, "type": str(LocationType.state), "country": country}
+
+    def serialize_city(self, city_id):
+        name, state_id = self.cities[city_id]
+        state = self.serialize_state(state_id)
+
+        if state is None:
+            return None
+
+        country = state.pop("country")
+        state.pop("type")
+
+        return {"id": city_id, "name": name, "type": str(LocationType.city), "state": state, "country": country}
+
+
+def record_location_change(sender, instance, **kwargs):
+    LocationChangeFeed.push_on_commit(sender._meta.model_name, instance.pk)
+
+
+location_index = LocationIndex()
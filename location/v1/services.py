@@ -1,83 +1,62 @@
 import time
 import json
 import os
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
 from location.v1.models import City, Country, State
-from utils.errors import ServerError
-from utils.util import CustomApiRequest
-from django.core.cache import cache
+from location.v1.index import LocationChangeFeed, location_index
+from utils.cache import CacheGeneration, CachedQuery
+from utils.constants.messages import ResponseMessages
+from utils.constants.others import LocationType
+from utils.errors import ServerError, UserError
+from utils.util import CustomApiRequest, iter_json_array
+
+countries_query = CachedQuery("countries", depends_on=[Country])
+country_by_id_query = CachedQuery("country_by_id", depends_on=[Country])
+states_query = CachedQuery("states", depends_on=[State])
+cities_query = CachedQuery("cities", depends_on=[City])
+
+# Serialized (JSON bytes) responses of the location dropdown endpoints
+countries_payload_query = CachedQuery("countries_payload", depends_on=[Country])
+states_payload_query = CachedQuery("states_payload", depends_on=[State, Country])
+cities_payload_query = CachedQuery("cities_payload", depends_on=[City, State, Country])
 
 
 class LocationService(CustomApiRequest):
     def __init__(self, request=None):
         super().__init__(request)
-        self.country_code = None
-        self.country_name = None
-        self.state_code = None
-        self.state_name = None
-        self.city_name = None
 
-    def create_cities(self, country=None):
+    def create_cities(self, country=None, batch_size=1000, progress=None):
+        """
+        Seeds countries, states and cities from data/cities.json, streaming the file instead of loading it whole.
+        Safe to re-run: only missing rows are inserted and only rows whose code changed are updated.
+        """
         file_path = os.path.join(os.path.dirname(__file__), 'data', 'cities.json')
 
-        with open(file_path, 'r') as file:
-            data = json.loads(file.read())
-
-        if country:
-            return self.create_city_for_country(country=country, data=data)
-        else:
-            return self.create_all_cities(data=data)
+        importer = CityImporter(country=country, batch_size=batch_size, progress=progress)
 
-    def create_all_cities(self, data):
-        for city_detail in data:
-            self.populate_city(city_detail)
+        with open(file_path, 'r') as file:
+            return importer.run(iter_json_array(file))
 
-        return True
+    def search_locations(self, filter_params):
+        """Autocomplete over active cities (default) or states, served from the in-memory location index"""
+        kind = filter_params.get("type") or LocationType.city
 
-    def create_city_for_country(self, country, data):
-        for city_detail in data:
-            country_name = city_detail.get("country_name")
-            if country_name == country:
-                self.populate_city(city_detail)
+        if kind not in LocationType.values:
+            raise UserError(ResponseMessages.invalid_location_type)
 
-    def populate_city(self, city_detail):
         try:
-            self.city_name = city_detail.get("name")
-            self.state_name = city_detail.get("state_name")
-            self.state_code = city_detail.get("state_code")
-            self.country_name = city_detail.get("country_name")
-            self.country_code = city_detail.get("country_code")
-
-            created = self.get_or_create_city()
-
-            print(f'{created.id}. {self.city_name}==>{self.state_name}==>{self.country_name}')
-        except Exception as e:
-            print(e)
-            time.sleep(5)
-
-        return True
-
-    def get_or_create_country(self):
-        country, is_created = Country.objects.get_or_create(name=self.country_name, code=self.country_code)
-
-        return country
-
-    def get_or_create_state(self):
-        state, is_created = State.objects.get_or_create(
-            name=self.state_name,
-            code=self.state_code,
-            country=self.get_or_create_country()
-        )
-
-        return state
-
-    def get_or_create_city(self):
-        city, is_created = City.objects.get_or_create(
-            name=self.city_name,
-            state=self.get_or_create_state()
+            limit = min(max(int(filter_params.get("limit") or 10), 1), 50)
+        except ValueError:
+            raise UserError(ResponseMessages.invalid_input)
+
+        return location_index.search(
+            filter_params.get("keyword") or "",
+            kind=kind,
+            limit=limit,
+            fuzzy=str(filter_params.get("fuzzy")).lower() == "true"
         )
 
-        return city
-
     def fetch_countries(self):
         def __do_fetch():
             try:
@@ -87,80 +66,235 @@ class LocationService(CustomApiRequest):
             except Exception as e:
                 raise ServerError(error=e)
 
-        cache_key = self.generate_cache_key("countries")
-        return cache.get_or_set(cache_key, __do_fetch)
+        return countries_query.get("all", fetch=__do_fetch)
 
-    def fetch_active_countries(self):
+    def fetch_states(self, country_id):
         def __do_fetch():
             try:
-                countries = Country.objects.filter(is_active=True)
-                return countries
+                states = State.objects.filter(country_id=country_id)
+                return states
 
             except Exception as e:
                 raise ServerError(error=e)
 
-        cache_key = self.generate_cache_key("active_countries")
-        return cache.get_or_set(cache_key, __do_fetch)
+        return states_query.get(country_id, "all", fetch=__do_fetch)
 
-    def fetch_states(self, country_id):
+    def fetch_cities(self, state_id):
         def __do_fetch():
             try:
-                states = State.objects.filter(country_id=country_id)
-                return states
+                cities = City.objects.filter(state_id=state_id)
+                return cities
 
             except Exception as e:
                 raise ServerError(error=e)
 
-        cache_key = self.generate_cache_key("states", country_id)
-        return cache.get_or_set(cache_key, __do_fetch)
+        return cities_query.get(state_id, "all", fetch=__do_fetch)
 
-    def fetch_active_states(self, country_id):
+    def fetch_country_by_id(self, country_id):
         def __do_fetch():
             try:
-                states = State.objects.filter(country_id=country_id, is_active=True)
-                return states
+                country = Country.objects.get(pk=country_id)
+                return country
 
             except Exception as e:
                 raise ServerError(error=e)
 
-        cache_key = self.generate_cache_key(country_id, "active_states", model=Country)
-        return cache.get_or_set(cache_key, __do_fetch)
+        return country_by_id_query.get(country_id, fetch=__do_fetch)
+
+    @staticmethod
+    def render_payload(data):
+        return json.dumps({"results": data}, cls=DjangoJSONEncoder, separators=(",", ":")).encode("utf-8")
+
+    def get_active_countries_etag(self):
+        return countries_payload_query.get_etag("active")
+
+    def fetch_active_countries_payload(self):
+        """Returns the ETag and the serialized body of the active countries list"""
+        from location.v1.serializers import CountrySerializer
 
-    def fetch_cities(self, state_id):
         def __do_fetch():
             try:
-                cities = City.objects.filter(state_id=state_id)
-                return cities
+                countries = Country.objects.filter(is_active=True)
+                return self.render_payload(CountrySerializer(instance=countries, many=True).data)
 
             except Exception as e:
                 raise ServerError(error=e)
 
-        cache_key = self.generate_cache_key(state_id, "cities", model=State)
-        return cache.get_or_set(cache_key, __do_fetch)
+        return countries_payload_query.get_with_etag("active", fetch=__do_fetch)
+
+    def get_active_states_etag(self, country_id):
+        return states_payload_query.get_etag(country_id, "active")
+
+    def fetch_active_states_payload(self, country_id):
+        """Returns the ETag and the serialized body of the active states of a country"""
+        from location.v1.serializers import StateSerializer
 
-    def fetch_active_cities(self, state_id):
         def __do_fetch():
             try:
-                cities = City.objects.filter(state_id=state_id, is_active=True)
-                return cities
+                states = State.objects.filter(country_id=country_id, is_active=True).select_related("country")
+                return self.render_payload(StateSerializer(instance=states, many=True).data)
 
             except Exception as e:
                 raise ServerError(error=e)
 
-        cache_key = self.generate_cache_key(state_id, "active_cities", model=State)
-        return cache.get_or_set(cache_key, __do_fetch)
+        return states_payload_query.get_with_etag(country_id, "active", fetch=__do_fetch)
+
+    def get_active_cities_etag(self, state_id):
+        return cities_payload_query.get_etag(state_id, "active")
+
+    def fetch_active_cities_payload(self, state_id):
+        """Returns the ETag and the serialized body of the active cities of a state"""
+        from location.v1.serializers import CitySerializer
 
-    def fetch_country_by_id(self, country_id):
         def __do_fetch():
             try:
-                country = Country.objects.get(pk=country_id)
-                return country
+                cities = City.objects.filter(state_id=state_id, is_active=True).select_related("state__country")
+                return self.render_payload(CitySerializer(instance=cities, many=True).data)
 
             except Exception as e:
                 raise ServerError(error=e)
 
-        cache_key = self.generate_cache_key("country", country_id)
-        return cache.get_or_set(cache_key, __do_fetch)
+        return cities_payload_query.get_with_etag(state_id, "active", fetch=__do_fetch)
+
+
+class CityImporter:
+    """
+    Bulk importer for city records ({"name", "state_name", "state_code", "country_name", "country_code"}).
+    Countries and states are deduplicated in memory and cities are inserted with bulk_create, one transaction per batch.
+    """
+
+    def __init__(self, country=None, batch_size=1000, progress=None, progress_every=10000):
+        self.country = country
+        self.batch_size = batch_size
+        self.progress = progress
+        self.progress_every = progress_every
+
+        self.countries = {}
+        self.states = {}
+        self.cities = set()
+        self.pending_cities = []
+        self.changed_countries = {}
+        self.changed_states = {}
+
+        self.stats = {"processed": 0, "created": 0, "skipped": 0, "updated": 0, "invalid": 0, "rows_per_sec": 0}
+        self.started_at = None
+
+    def load_existing(self):
+        countries = Country.objects.all()
+        states = State.objects.all()
+        cities = City.objects.all()
+
+        if self.country:
+            countries = countries.filter(name=self.country)
+            states = states.filter(country__name=self.country)
+            cities = cities.filter(state__country__name=self.country)
+
+        for country in countries.order_by("-id"):
+            self.countries[country.name] = country
+
+        for state in states.order_by("-id"):
+            self.states[(state.country_id, state.name)] = state
+
+        self.cities = set(cities.values_list("state_id", "name"))
+
+    def run(self, records):
+        self.started_at = time.monotonic()
+        self.load_existing()
+
+        for record in records:
+            if self.country and record.get("country_name") != self.country:
+                continue
+
+            self.add(record)
+
+            if len(self.pending_cities) >= self.batch_size:
+                self.flush()
+
+            if self.stats["processed"] % self.progress_every == 0:
+                self.report()
+
+        self.flush()
+        self.report()
+
+        if self.stats["created"] or self.stats["updated"]:
+            # bulk_create/bulk_update send no signals: expire the cached location queries (and their ETags) and ask
+            # every location index to rebuild
+            for model in (Country, State, City):
+                CacheGeneration.bump_on_commit(model)
+
+            LocationChangeFeed.push_on_commit(City._meta.model_name)
+
+        return self.stats
+
+    def add(self, record):
+        self.stats["processed"] += 1
+
+        city_name = record.get("name")
+        state_name = record.get("state_name")
+        country_name = record.get("country_name")
+
+        if not city_name or not state_name or not country_name:
+            self.stats["invalid"] += 1
+            return
+
+        country = self.get_country(country_name, record.get("country_code"))
+        state = self.get_state(country, state_name, record.get("state_code"))
+
+        if (state.id, city_name) in self.cities:
+            self.stats["skipped"] += 1
+            return
+
+        self.cities.add((state.id, city_name))
+        self.pending_cities.append(City(name=city_name, state_id=state.id))
+
+    def get_country(self, name, code):
+        country = self.countries.get(name)
+
+        if country is None:
+            country = Country.objects.create(name=name, code=code)
+            self.countries[name] = country
+        elif code and country.code != code:
+            country.code = code
+            self.changed_countries[country.id] = country
+
+        return country
+
+    def get_state(self, country, name, code):
+        state = self.states.get((country.id, name))
+
+        if state is None:
+            state = State.objects.create(name=name, code=code, country=country)
+            self.states[(country.id, name)] = state
+        elif code and state.code != code:
+            state.code = code
+            self.changed_states[state.id] = state
+
+        return state
+
+    def flush(self):
+        with transaction.atomic():
+            if self.pending_cities:
+                City.objects.bulk_create(self.pending_cities, batch_size=self.batch_size)
+                self.stats["created"] += len(self.pending_cities)
+
+            if self.changed_countries:
+                Country.objects.bulk_update(self.changed_countries.values(), ["code"], batch_size=self.batch_size)
+
+            if self.changed_states:
+                State.objects.bulk_update(self.changed_states.values(), ["code"], batch_size=self.batch_size)
+
+        self.stats["updated"] += len(self.changed_countries) + len(self.changed_states)
+
+        self.pending_cities = []
+        self.changed_countries = {}
+        self.changed_states = {}
+
+    def report(self):
+        elapsed = time.monotonic() - self.started_at
+        self.stats["rows_per_sec"] = round(self.stats["processed"] / elapsed) if elapsed > 0 else 0
+
+        if self.progress:
+            self.progress(self.stats)
 
 
 location_service = LocationService()
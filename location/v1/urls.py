@@ -1,10 +1,11 @@
 from django.urls import path
 
-from location.v1.views import CountryApiView, StateApiView, CityApiView
+from location.v1.views import CountryApiView, StateApiView, CityApiView, LocationSearchApiView
 
 
 urlpatterns = [
     path("country", CountryApiView.as_view(), name="country"),
     path("country/<int:country_id>/state", StateApiView.as_view(), name="state"),
     path("country/state/<int:state_id>", CityApiView.as_view(), name="city"),
+    path("search", LocationSearchApiView.as_view(), name="location-search"),
 ]
\ No newline at end of file
@@ -1,11 +1,9 @@
 from drf_spectacular.utils import extend_schema
 from rest_framework.generics import ListAPIView
-from rest_framework.response import Response
-from rest_framework import status
 
-from location.v1.services import location_service
+from location.v1.services import LocationService, location_service
 from location.v1.serializers import CitySerializer, CountrySerializer, StateSerializer
-from utils.util import CustomApiResponse
+from utils.util import CustomApiRequest, CustomApiResponse
 
 
 @extend_schema(tags=["Location"])
@@ -14,15 +12,11 @@ class CountryApiView(ListAPIView, CustomApiResponse):
 
     def get(self, request, *args, **kwargs):
         try:
-            countries = location_service.fetch_active_countries()
-
-            response = self.serializer_class(instance=countries, many=True)
-
-            data = {
-                "results": response.data
-            }
-
-            return Response(data, status=status.HTTP_200_OK)
+            return self.cached_json_response(
+                request,
+                etag=location_service.get_active_countries_etag(),
+                fetch_payload=location_service.fetch_active_countries_payload
+            )
 
         except Exception as e:
             return self.error_response(e)
@@ -35,14 +29,12 @@ class StateApiView(ListAPIView, CustomApiResponse):
     def get(self, request, *args, **kwargs):
         try:
             country_id = self.kwargs.get("country_id")
-            states = location_service.fetch_active_states(country_id=country_id)
-            response = self.serializer_class(instance=states, many=True)
 
-            data = {
-                "results": response.data
-            }
-
-            return Response(data, status=status.HTTP_200_OK)
+            return self.cached_json_response(
+                request,
+                etag=location_service.get_active_states_etag(country_id=country_id),
+                fetch_payload=lambda: location_service.fetch_active_states_payload(country_id=country_id)
+            )
 
         except Exception as e:
             return self.error_response(e)
@@ -55,14 +47,22 @@ class CityApiView(ListAPIView, CustomApiResponse):
     def get(self, request, *args, **kwargs):
         try:
             state_id = self.kwargs.get("state_id")
-            cities = location_service.fetch_active_cities(state_id=state_id)
-            response = self.serializer_class(instance=cities, many=True)
-
-            data = {
-                "results": response.data
-            }
 
-            return Response(data, status=status.HTTP_200_OK)
+            return self.cached_json_response(
+                request,
+                etag=location_service.get_active_cities_etag(state_id=state_id),
+                fetch_payload=lambda: location_service.fetch_active_cities_payload(state_id=state_id)
+            )
 
         except Exception as e:
             return self.error_response(e)
+
+
+@extend_schema(tags=["Location"])
+class LocationSearchApiView(ListAPIView, CustomApiRequest):
+    def get(self, request, *args, **kwargs):
+        service = LocationService(request)
+
+        filter_params = self.get_request_filter_params("type", "fuzzy", "limit")
+
+        return self.process_request(request, service.search_locations, filter_params=filter_params)
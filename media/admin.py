@@ -1,12 +1,17 @@
 from django.contrib import admin
-from .models import Media, UploadedMedia
+from .models import Media, MediaDerivative, UploadedMedia
 
 
 @admin.register(Media)
 class MediaAdmin(admin.ModelAdmin):
-    list_display = ["name", "label", "allowed_file_types", "max_file_size_in_kb"]
+    list_display = ["name", "label", "allowed_file_types", "max_file_size_in_kb", "storage_backend"]
 
 
 @admin.register(UploadedMedia)
 class UploadedMediaAdmin(admin.ModelAdmin):
     list_display = ["id", "url", "name", "size", "file_type"]
+
+
+@admin.register(MediaDerivative)
+class MediaDerivativeAdmin(admin.ModelAdmin):
+    list_display = ["id", "media", "image_format", "width", "height", "size"]
@@ -0,0 +1,120 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.uploaders import UPLOADERS, get_uploader_class
+from utils.util import FileUploader
+
+
+# Uploads the same file many times through each storage backend and reports throughput and latency, e.g.
+# python manage.py benchmark_uploaders --backends=local,amazon --uploads=100 --size-kb=2048 --concurrency=8
+# Remote backends are called for real (credentials from the settings), use --source for a file they accept.
+# --in-memory hands the backends bytes instead of a file on disk, as for uploads under FILE_UPLOAD_MAX_MEMORY_SIZE.
+
+
+def get_percentile(values, percentile):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+class Command(BaseCommand):
+    help = 'Measure upload throughput and latency of the storage backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', type=str, default="local", help=f"Of {', '.join(UPLOADERS)}")
+        parser.add_argument('--uploads', type=int, default=50)
+        parser.add_argument('--size-kb', type=int, default=1024)
+        parser.add_argument('--concurrency', type=int, default=settings.MEDIA_UPLOAD_CONCURRENCY)
+        parser.add_argument('--source', type=str, default=None)
+        parser.add_argument('--in-memory', action='store_true')
+        parser.add_argument('--keep', action='store_true', help="Leave the uploaded files in storage")
+
+    def handle(self, *args, **options):
+        backends = [backend.strip() for backend in options.get("backends").split(",") if backend.strip()]
+
+        for backend in backends:
+            if backend not in UPLOADERS:
+                raise CommandError(f"No storage backend named {backend}, choose one of {', '.join(UPLOADERS)}")
+
+        source = options.get("source")
+        temporary_source = None
+
+        if not source:
+            temporary_source = tempfile.NamedTemporaryFile(suffix=".bin", delete=False)
+
+            with temporary_source:
+                temporary_source.write(os.urandom(options.get("size_kb") * 1024))
+
+            source = temporary_source.name
+
+        try:
+            for backend in backends:
+                self.run_backend(backend, source, options)
+        finally:
+            if temporary_source:
+                os.remove(temporary_source.name)
+
+    def run_backend(self, backend, source, options):
+        size = os.path.getsize(source)
+        file_extension = source.rsplit(".", 1)[-1].lower()
+        content = None
+
+        if options.get("in_memory"):
+            with open(source, "rb") as file:
+                content = file.read()
+
+        def send(index):
+            if content is not None:
+                file = ContentFile(content, name=f"benchmark.{file_extension}")
+            else:
+                file = File(open(source, "rb"), name=f"benchmark.{file_extension}")
+
+            upload = {
+                "file": file,
+                "file_path": f"benchmark/{backend}_{int(time.time() * 1000)}_{index}",
+                "file_extension": file_extension,
+                "storage_backend": backend,
+            }
+            start = time.perf_counter()
+
+            try:
+                return FileUploader.send_upload(upload), time.perf_counter() - start
+            finally:
+                file.close()
+
+        uploads = options.get("uploads")
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=options.get("concurrency")) as executor:
+            futures = [executor.submit(send, index) for index in range(uploads)]
+
+        elapsed = time.perf_counter() - start
+        results = [future.result() for future in futures if future.exception() is None]
+        errors = [future.exception() for future in futures if future.exception() is not None]
+
+        if not options.get("keep"):
+            uploader_class = get_uploader_class(backend)
+
+            for url, _ in results:
+                try:
+                    uploader_class(url).delete()
+                except Exception as e:
+                    self.stderr.write(f"Could not delete {url}: {e}")
+
+        if not results:
+            self.stderr.write(self.style.ERROR(f"{backend}: every upload failed, first error: {errors[0]}"))
+            return
+
+        latencies = [latency * 1000 for _, latency in results]
+        throughput = len(results) * size / elapsed / (1024 * 1024)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{backend}: {len(results)} uploads of {size / 1024:.0f}KB in {elapsed:.2f}s, {throughput:.1f}MB/s, "
+            f"{len(results) / elapsed:.1f} uploads/s, latency p50 {get_percentile(latencies, 50):.1f}ms "
+            f"p95 {get_percentile(latencies, 95):.1f}ms max {max(latencies):.1f}ms, {len(errors)} failed"
+        ))
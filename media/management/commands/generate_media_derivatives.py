@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from media.models import UploadedMedia
+from media.tasks import generate_media_derivatives
+
+
+# Queues the derivatives of images uploaded before they existed (or after the widths/formats changed), e.g.
+# python manage.py generate_media_derivatives --batch-size=100
+
+
+class Command(BaseCommand):
+    help = 'Queue derivative generation for uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        batch_size = options.get("batch_size")
+        media_ids = list(
+            UploadedMedia.objects.filter(file_type__startswith="image/").order_by("id").values_list("id", flat=True)
+        )
+
+        for start in range(0, len(media_ids), batch_size):
+            generate_media_derivatives.delay(media_ids[start:start + batch_size])
+
+        self.stdout.write(self.style.SUCCESS(f"Queued {len(media_ids)} images"))
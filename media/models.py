@@ -1,3 +1,4 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from base.models import AppDbModel
 
@@ -21,6 +22,8 @@ class Media(AppDbModel):
     max_file_size_in_kb = models.PositiveIntegerField(default=1000)
     upload_to = models.CharField(max_length=50, blank=False, null=False, choices=UploadToChoices.choices,
                                  default=UploadToChoices.general)
+    # Name of the utils.uploaders backend files of this type are stored with, blank for MEDIA_STORAGE_BACKEND
+    storage_backend = models.CharField(max_length=50, blank=True, default="")
 
     class Meta:
         ordering = ['name']
@@ -29,6 +32,12 @@ class Media(AppDbModel):
     def __str__(self):
         return "{}".format(self.name)
 
+    def clean(self):
+        from utils.uploaders import UPLOADERS
+
+        if self.storage_backend and self.storage_backend not in UPLOADERS:
+            raise ValidationError({"storage_backend": f"Choose one of {', '.join(UPLOADERS)}"})
+
 
 class UploadedMedia(AppDbModel):
     user = models.ForeignKey("account.User", null=True, on_delete=models.CASCADE)
@@ -37,9 +46,49 @@ class UploadedMedia(AppDbModel):
     size = models.IntegerField(null=True)
     file_type = models.CharField(max_length=255, null=True)
     media = models.ForeignKey("media.Media", null=True, on_delete=models.SET_NULL, related_name="uploads")
+    # SHA-256 of the content, rows with the same content share one stored object (url)
+    content_hash = models.CharField(max_length=64, null=True, blank=True)
 
     class Meta:
         verbose_name_plural = "Uploaded Media"
+        indexes = [
+            models.Index(fields=["content_hash", "size"], name="uploaded_media_hash_size_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name}::{self.file_type}"
+
+    def get_srcset(self):
+        """{"webp": "<url> 160w, <url> 320w", ...}, one srcset per derivative format, None until they are generated"""
+        srcset = {}
+
+        # all() so a prefetch of derivatives is used
+        for derivative in self.derivatives.all():
+            srcset.setdefault(derivative.image_format, []).append(f"{derivative.url} {derivative.width}w")
+
+        return {image_format: ", ".join(sources) for image_format, sources in srcset.items()} or None
+
+
+class DerivativeFormatChoices(models.TextChoices):
+    webp = "webp"
+    avif = "avif"
+    jpeg = "jpeg"
+
+
+class MediaDerivative(AppDbModel):
+    """A resized, re-encoded copy of an uploaded image, stored beside the original (see media.tasks)"""
+    media = models.ForeignKey("media.UploadedMedia", on_delete=models.CASCADE, related_name="derivatives")
+    image_format = models.CharField(max_length=10, choices=DerivativeFormatChoices.choices)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    url = models.URLField()
+    size = models.IntegerField(null=True)
+
+    class Meta:
+        ordering = ["width"]
+        constraints = [
+            models.UniqueConstraint(fields=["media", "image_format", "width"], name="media_derivative_unique_variant"),
+        ]
+
+    def __str__(self):
+        return f"{self.media_id}::{self.width}w.{self.image_format}"
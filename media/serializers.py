@@ -22,6 +22,24 @@ class UploadMediaSerializer(serializers.Serializer):
         return data
 
 
+class CreateDirectUploadSerializer(serializers.Serializer):
+    media_type_id = serializers.CharField(required=True)
+    file_name = serializers.CharField(required=True, max_length=255)
+    file_size = serializers.IntegerField(required=True, min_value=1)
+
+    def validate(self, attrs):
+        data = attrs.copy()
+
+        service = MediaService(self.context.get("request"))
+        data["media_type"] = service.find_media_type_by_id(data.get("media_type_id"))
+
+        return data
+
+
+class FinalizeDirectUploadSerializer(serializers.Serializer):
+    upload_token = serializers.CharField(required=True)
+
+
 class UploadMediaResponseSerializer(serializers.ModelSerializer):
     class Meta:
         model = UploadedMedia
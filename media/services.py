@@ -1,9 +1,25 @@
-from django.core.cache import cache
-from .models import Media, UploadedMedia
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction as db_transaction
+
+from .models import Media, MediaDerivative, UploadedMedia
+from utils.cache import CachedQuery
 from utils.errors import UserError, ServerError, NotFoundError
-from utils.util import CustomApiRequest, FileUploader
+from utils.images import discard_process_pool, get_display_size, get_process_pool, render_variant
+from utils.uploaders import AmazonDirectUploader, get_uploader_class_for_url
+from utils.util import AppLogger, CustomApiRequest, FileUploader
 from utils.constants.messages import ResponseMessages
 
+media_type_by_id_query = CachedQuery("media_type_by_id", depends_on=[Media])
+media_types_query = CachedQuery("media_types", depends_on=[Media])
+uploaded_media_by_id_query = CachedQuery("uploaded_media_by_id", depends_on=[UploadedMedia])
+DIRECT_UPLOAD_SALT = "media.direct_upload"
+
 
 class MediaService(CustomApiRequest):
     def __init__(self, request):
@@ -17,13 +33,84 @@ class MediaService(CustomApiRequest):
 
         file_uploader = FileUploader(request=self.request)
 
-        uploaded_file_list = []
+        return file_uploader.upload_many(files=files, description_payload=payload)
+
+    def create_direct_upload(self, payload):
+        """
+        A signed form the client posts the file to, straight to storage, and the upload_token to finalize it with.
+        The form only accepts this media type's size limit and the content type of the file's extension.
+        """
+        media_type = payload.get("media_type")
+        file_uploader = FileUploader(request=self.request)
+        file_name = payload.get("file_name").lower()
+        file_extension = file_uploader.validate_file(file_name, payload.get("file_size"), media_type)
+        file_path = f"{media_type.upload_to}/{file_uploader.generate_file_name(file_extension)}.{file_extension}"
+        content_type = file_uploader.get_content_type_from_extension(file_extension)
+
+        uploader = AmazonDirectUploader(file_path, content_type)
+        target = uploader.create_target(
+            max_size=media_type.max_file_size_in_kb * 1024, expires_in=settings.MEDIA_DIRECT_UPLOAD_EXPIRY
+        )
+
+        upload_token = signing.dumps({
+            "user_id": self.auth_user.id,
+            "media_type_id": media_type.id,
+            "file_path": file_path,
+            "content_type": content_type,
+            "name": file_name.removesuffix(f".{file_extension}"),
+        }, salt=DIRECT_UPLOAD_SALT)
+
+        return {
+            "upload_url": target["url"],
+            "fields": target["fields"],
+            "upload_token": upload_token,
+            "expires_in": settings.MEDIA_DIRECT_UPLOAD_EXPIRY,
+        }
+
+    def finalize_direct_upload(self, payload):
+        """Records the UploadedMedia of a direct upload once the file is in storage. Finalizing again returns it."""
+        try:
+            upload = signing.loads(
+                payload.get("upload_token"), salt=DIRECT_UPLOAD_SALT,
+                max_age=settings.MEDIA_DIRECT_UPLOAD_EXPIRY + settings.MEDIA_DIRECT_UPLOAD_FINALIZE_WINDOW
+            )
+        except signing.BadSignature:
+            raise UserError(ResponseMessages.invalid_upload_token)
+
+        if upload["user_id"] != self.auth_user.id:
+            raise UserError(ResponseMessages.invalid_upload_token)
+
+        uploader = AmazonDirectUploader(upload["file_path"], upload["content_type"])
+        uploaded_media = UploadedMedia.objects.filter(url=uploader.url, user=self.auth_user).first()
+
+        if uploaded_media:
+            return uploaded_media
 
-        for file in files:
-            uploaded_file = file_uploader.upload(file=file, description_payload=payload)
-            uploaded_file_list.append(uploaded_file)
+        media_type = self.find_media_type_by_id(upload["media_type_id"])
 
-        return uploaded_file_list
+        try:
+            file_size = uploader.fetch_size()
+        except Exception as e:
+            raise ServerError(error=e, error_position="MediaService.finalize_direct_upload")
+
+        if file_size is None:
+            raise UserError(ResponseMessages.upload_not_received)
+
+        if file_size > media_type.max_file_size_in_kb * 1024:
+            uploader.delete()
+            raise UserError(ResponseMessages.file_too_large)
+
+        uploaded_media = UploadedMedia.objects.create(
+            media=media_type,
+            user=self.auth_user,
+            url=uploader.url,
+            name=upload["name"],
+            size=file_size,
+            file_type=upload["content_type"]
+        )
+        MediaDerivativeService.queue([uploaded_media])
+
+        return uploaded_media
 
     def delete_media(self, media_id):
         uploaded_media = UploadedMedia.objects.filter(id=media_id).first()
@@ -31,11 +118,23 @@ class MediaService(CustomApiRequest):
         if uploaded_media:
             self.check_resource_owner(uploaded_media)
 
-            # Delete from Cloud storage
-            file_uploader = FileUploader(request=self.request)
-            file_uploader.delete(file_path=uploaded_media.url)
+            with db_transaction.atomic():
+                # Rows sharing the stored object are locked, so it cannot be reused while its last row goes
+                list(UploadedMedia.objects.select_for_update().filter(
+                    content_hash=uploaded_media.content_hash, size=uploaded_media.size, url=uploaded_media.url
+                ).values_list("id", flat=True))
+
+                derivative_urls = list(uploaded_media.derivatives.values_list("url", flat=True))
+                uploaded_media.delete()
+                last_reference = not UploadedMedia.objects.filter(url=uploaded_media.url).exists()
+
+            if last_reference:
+                # Delete from Cloud storage
+                file_uploader = FileUploader(request=self.request)
+                file_uploader.delete(file_path=uploaded_media.url)
 
-            uploaded_media.delete()
+                for derivative_url in derivative_urls:
+                    file_uploader.delete_quietly(derivative_url)
 
             return ResponseMessages.media_deleted_successfully
 
@@ -55,8 +154,7 @@ class MediaService(CustomApiRequest):
             except Exception as e:
                 raise ServerError(error=e, error_position="MediaService.find_media_type_by_id")
 
-        cache_key = self.generate_cache_key("media_type", media_type_id)
-        return cache.get_or_set(cache_key, __do_fetch_single)
+        return media_type_by_id_query.get(media_type_id, fetch=__do_fetch_single)
 
     def find_uploaded_media_by_id(self, media_id, many=False):
         if not many and not str(media_id).isdigit():
@@ -75,8 +173,8 @@ class MediaService(CustomApiRequest):
             except Exception as e:
                 raise ServerError(error=e, error_position="MediaService.find_uploaded_media_by_id")
 
-        cache_key = self.generate_cache_key("uploaded_media", media_id)
-        return cache.get_or_set(cache_key, __do_fetch_single)
+        lookup = sorted(media_id) if many else [media_id]
+        return uploaded_media_by_id_query.get(*lookup, fetch=__do_fetch_single)
 
     def fetch_media_types(self):
         def __do_fetch():
@@ -85,5 +183,128 @@ class MediaService(CustomApiRequest):
             except Exception as e:
                 raise ServerError(error=e, error_position="MediaService.fetch_media_types")
 
-        cache_key = self.generate_cache_key("media_types")
-        return cache.get_or_set(cache_key, __do_fetch)
+        return media_types_query.get("all", fetch=__do_fetch)
+
+
+class MediaDerivativeService(CustomApiRequest):
+    """
+    Resized WebP/AVIF copies of uploaded images, MEDIA_DERIVATIVE_WIDTHS wide in every MEDIA_DERIVATIVE_FORMATS, for
+    clients to pick the smallest that fits from UploadedMedia.get_srcset. Encoding runs in a process pool.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+
+    @staticmethod
+    def queue(uploaded_media):
+        """Queues the derivatives of the images among uploaded_media, once the surrounding transaction commits"""
+        from media.tasks import generate_media_derivatives
+
+        media_ids = [media.id for media in uploaded_media if (media.file_type or "").startswith("image/")]
+
+        if media_ids:
+            db_transaction.on_commit(lambda: generate_media_derivatives.delay(media_ids))
+
+    def generate(self, media_ids):
+        """Creates the derivatives the media are missing. Returns the number created."""
+        created = 0
+        queryset = UploadedMedia.objects.filter(id__in=media_ids).prefetch_related("derivatives")
+
+        for uploaded_media in queryset:
+            try:
+                created += self.generate_for(uploaded_media)
+            except Exception as e:
+                AppLogger.report(e, "MediaDerivativeService.generate")
+
+        return created
+
+    def generate_for(self, uploaded_media):
+        existing = {(derivative.image_format, derivative.width) for derivative in uploaded_media.derivatives.all()}
+        shared = self.copy_shared_derivatives(uploaded_media, existing)
+
+        # Made from the same content, the other row's derivatives are the whole set
+        if shared:
+            return shared
+
+        with tempfile.TemporaryDirectory() as directory:
+            source_path = os.path.join(directory, "source")
+            self.download(uploaded_media.url, source_path)
+
+            # Never enlarged: an image narrower than every width still gets re-encoded at its own width
+            source_width = get_display_size(source_path)[0]
+            widths = [width for width in settings.MEDIA_DERIVATIVE_WIDTHS if width < source_width] or [source_width]
+            variants = [
+                (width, image_format, os.path.join(directory, f"{width}.{image_format}"))
+                for width in widths for image_format in settings.MEDIA_DERIVATIVE_FORMATS
+                if (image_format, width) not in existing
+            ]
+
+            pool = get_process_pool()
+            renders = [
+                pool.submit(
+                    render_variant, source_path, output_path, width, image_format, settings.MEDIA_DERIVATIVE_QUALITY
+                )
+                for width, image_format, output_path in variants
+            ]
+
+            try:
+                results = [render.result() for render in renders]
+            except BrokenProcessPool:
+                discard_process_pool()
+                raise
+
+            with ThreadPoolExecutor(max_workers=settings.MEDIA_UPLOAD_CONCURRENCY) as executor:
+                urls = list(executor.map(
+                    lambda variant: self.store(uploaded_media.url, *variant), variants
+                ))
+
+        MediaDerivative.objects.bulk_create([
+            MediaDerivative(
+                media=uploaded_media, image_format=image_format, width=width, height=height, url=url, size=size
+            )
+            for (_, image_format, _), (width, height, size), url in zip(variants, results, urls)
+        ], ignore_conflicts=True)
+
+        return len(variants)
+
+    @staticmethod
+    def copy_shared_derivatives(uploaded_media, existing):
+        """
+        Rows sharing the stored object of uploaded_media (see FileUploader.upload_many) share its derivatives too:
+        those already made for another row are recorded for this one. Returns the number copied.
+        """
+        if not uploaded_media.content_hash:
+            return 0
+
+        shared = {}
+        derivatives = MediaDerivative.objects.filter(
+            media__content_hash=uploaded_media.content_hash, media__url=uploaded_media.url
+        ).exclude(media=uploaded_media)
+
+        for derivative in derivatives:
+            if (derivative.image_format, derivative.width) not in existing:
+                shared.setdefault((derivative.image_format, derivative.width), derivative)
+
+        MediaDerivative.objects.bulk_create([
+            MediaDerivative(
+                media=uploaded_media, image_format=derivative.image_format, width=derivative.width,
+                height=derivative.height, url=derivative.url, size=derivative.size
+            )
+            for derivative in shared.values()
+        ], ignore_conflicts=True)
+
+        return len(shared)
+
+    @staticmethod
+    def download(url, path):
+        get_uploader_class_for_url(url)(url).download(path)
+
+    @staticmethod
+    def store(original_url, width, image_format, output_path):
+        """URL of the derivative, uploaded next to the original in the storage the original is in"""
+        uploader_class = get_uploader_class_for_url(original_url)
+        stem = uploader_class.get_stem(original_url)
+
+        with open(output_path, "rb") as file:
+            # The format is in the name too: Cloudinary's public_id leaves the extension out
+            return uploader_class(f"{stem}_{width}w_{image_format}", file, image_format).upload()
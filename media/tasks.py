@@ -0,0 +1,8 @@
+from core.celery import app
+
+
+@app.task(ignore_result=True)
+def generate_media_derivatives(media_ids):
+    from media.services import MediaDerivativeService
+
+    return MediaDerivativeService().generate(media_ids)
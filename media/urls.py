@@ -1,8 +1,10 @@
 from django.urls import path
 
-from .views import MediaTypeAPIView, UploadMediaAPIView
+from .views import MediaTypeAPIView, UploadMediaAPIView, DirectUploadAPIView, FinalizeDirectUploadAPIView
 
 urlpatterns = [
     path("types", MediaTypeAPIView.as_view(), name='media_type'),
     path("upload", UploadMediaAPIView.as_view(), name='upload_media'),
+    path("direct-upload", DirectUploadAPIView.as_view(), name='direct_upload'),
+    path("direct-upload/finalize", FinalizeDirectUploadAPIView.as_view(), name='finalize_direct_upload'),
 ]
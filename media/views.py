@@ -1,6 +1,7 @@
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.generics import CreateAPIView, DestroyAPIView, ListAPIView
-from .serializers import MediaTypeSerializer, UploadMediaSerializer, UploadMediaResponseSerializer
+from .serializers import MediaTypeSerializer, UploadMediaSerializer, UploadMediaResponseSerializer, \
+    CreateDirectUploadSerializer, FinalizeDirectUploadSerializer
 from .services import MediaService
 from utils.util import CustomApiRequest
 
@@ -29,6 +30,27 @@ class UploadMediaAPIView(CreateAPIView, CustomApiRequest):
         return self.process_request(request, target_function=service.upload_media)
 
 
+class DirectUploadAPIView(CreateAPIView, CustomApiRequest):
+    permission_classes = [IsAuthenticated]
+    serializer_class = CreateDirectUploadSerializer
+
+    def post(self, request, *args, **kwargs):
+        service = MediaService(request)
+
+        return self.process_request(request, target_function=service.create_direct_upload)
+
+
+class FinalizeDirectUploadAPIView(CreateAPIView, CustomApiRequest):
+    permission_classes = [IsAuthenticated]
+    serializer_class = FinalizeDirectUploadSerializer
+
+    def post(self, request, *args, **kwargs):
+        self.response_serializer = UploadMediaResponseSerializer
+        service = MediaService(request)
+
+        return self.process_request(request, target_function=service.finalize_direct_upload)
+
+
 class DeleteMediaAPIView(DestroyAPIView, CustomApiRequest):
     permission_classes = [IsAuthenticated]
 
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from account.admin import BaseAdmin
-from payment.models import Transaction, BankAccount
+from payment.models import Transaction, BankAccount, LedgerEntry, PaystackWebhookEvent, TransactionRollup
 
 
 @admin.register(Transaction)
@@ -11,4 +11,19 @@ class TransactionAdmin(BaseAdmin):
 
 @admin.register(BankAccount)
 class BankAccountAdmin(BaseAdmin):
-    list_display = ["user__first_name", "bank_name", "account_number", "account_name", "paystack_recipient_code"]
\ No newline at end of file
+    list_display = ["user__first_name", "bank_name", "account_number", "account_name", "paystack_recipient_code"]
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(BaseAdmin):
+    list_display = ["transaction__reference", "user__first_name", "account", "amount", "balance_after"]
+
+
+@admin.register(PaystackWebhookEvent)
+class PaystackWebhookEventAdmin(BaseAdmin):
+    list_display = ["event", "reference", "status", "attempts", "created_at", "processed_at"]
+
+
+@admin.register(TransactionRollup)
+class TransactionRollupAdmin(BaseAdmin):
+    list_display = ["granularity", "bucket", "user__first_name", "transaction_type", "status", "count", "amount"]
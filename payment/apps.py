@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class PaymentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payment'
+
+    def ready(self):
+        from django.db.models.signals import post_save, post_delete
+
+        from payment.models import Transaction
+        from payment.rollups import record_transaction_delete, record_transaction_save
+
+        post_save.connect(record_transaction_save, sender=Transaction, dispatch_uid="transaction_rollups")
+        post_delete.connect(record_transaction_delete, sender=Transaction, dispatch_uid="transaction_rollups")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from payment.rollups import rebuild_rollups
+
+
+# Recomputes the transaction report rollups from the Transaction table, after a backfill or a manual data fix, e.g.
+# python manage.py rebuild_transaction_rollups --batch-size=1000
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the pre-aggregated transaction rollups behind the transaction report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups(batch_size=options.get("batch_size"))
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} rollup rows"))
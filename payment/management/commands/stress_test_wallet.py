@@ -0,0 +1,109 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+
+from account.models import User
+from payment.models import LedgerAccountChoices, LedgerEntry, TransactionTypeChoices
+from payment.services import TransactionService
+from utils.errors import UserError
+
+
+# Hammers one wallet with concurrent credits and debits, every operation sent twice with the same idempotency key,
+# then checks that the balance matches both the ledger and the expected total. Needs a database with real row locks
+# (Postgres), e.g.
+# python manage.py stress_test_wallet --email=wallet-test@example.com --operations=500 --workers=16
+
+
+class Command(BaseCommand):
+    help = 'Stress test concurrent wallet updates against the ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', type=str, required=True, help='User whose wallet is used for the test')
+        parser.add_argument('--operations', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--amount', type=str, default="10.00")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options.get("email")).first()
+
+        if user is None:
+            raise CommandError(f"User with email '{options.get('email')}' not found")
+
+        amount = Decimal(options.get("amount"))
+        operations = options.get("operations")
+        run_id = int(time.time() * 1000)
+
+        opening_balance = user.balance
+        opening_ledger_balance = self.get_ledger_balance(user)
+
+        # Every third operation is a debit, each operation is submitted twice
+        jobs = [
+            (f"stress:{run_id}:{index}",
+             TransactionTypeChoices.debit if index % 3 == 2 else TransactionTypeChoices.credit)
+            for index in range(operations)
+        ]
+        jobs = jobs + jobs
+
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=options.get("workers")) as executor:
+            results = list(executor.map(lambda job: self.apply(user.pk, amount, *job), jobs))
+
+        elapsed = time.perf_counter() - start
+
+        applied = {}
+        rejected = 0
+
+        for key, transaction_type, transaction_id in results:
+            if transaction_id is None:
+                rejected += 1
+            else:
+                applied.setdefault(key, set()).add((transaction_type, transaction_id))
+
+        duplicated = sum(1 for transactions in applied.values() if len(transactions) > 1)
+        expected_change = sum(
+            amount if transaction_type == TransactionTypeChoices.credit else -amount
+            for transactions in applied.values()
+            for transaction_type, _ in list(transactions)[:1]
+        )
+
+        user.refresh_from_db(fields=["balance"])
+        balance_change = user.balance - opening_balance
+        ledger_change = self.get_ledger_balance(user) - opening_ledger_balance
+
+        self.stdout.write(f"{len(jobs)} calls ({operations} unique) in {elapsed:.2f}s, "
+                          f"{len(jobs) / elapsed:.0f} calls/s, {rejected} rejected for insufficient balance")
+        self.stdout.write(f"Balance change: {balance_change}, ledger change: {ledger_change}, "
+                          f"expected: {expected_change}")
+
+        if duplicated or balance_change != ledger_change or balance_change != expected_change:
+            raise CommandError(f"Wallet is inconsistent ({duplicated} idempotency keys applied more than once)")
+
+        self.stdout.write(self.style.SUCCESS("Wallet is consistent"))
+
+    @staticmethod
+    def get_ledger_balance(user):
+        return LedgerEntry.objects.filter(
+            user=user, account=LedgerAccountChoices.wallet
+        ).aggregate(total=Sum("amount"))["total"] or Decimal("0.00")
+
+    @staticmethod
+    def apply(user_id, amount, key, transaction_type):
+        try:
+            user = User.objects.get(pk=user_id)
+            transaction = TransactionService(None).fund_balance(
+                user=user,
+                amount=amount,
+                transaction_type=transaction_type,
+                description="Wallet stress test",
+                idempotency_key=key
+            )
+            return key, transaction_type, transaction.id
+        except UserError:
+            return key, transaction_type, None
+        finally:
+            connection.close()
@@ -1,6 +1,6 @@
 from django.db import models
 
-from base.models import BaseModel
+from base.models import AppDbModel, BaseModel
 
 
 class TransactionStatusChoices(models.TextChoices):
@@ -49,3 +49,113 @@ class Transaction(BaseModel):
     destination = models.CharField(max_length=255, null=True)
     description = models.TextField(blank=True)
     response_data = models.JSONField(default=dict, blank=True)
+    # Retrying a wallet operation with the same key returns the first transaction instead of moving money twice
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True, unique=True)
+    # Where a withdrawal is paid out to
+    bank_account = models.ForeignKey(BankAccount, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name="transactions")
+
+    class Meta:
+        indexes = [
+            # The payout engine's queue: pending withdrawals, oldest first
+            models.Index(fields=["transaction_type", "status", "id"], name="transaction_type_status_idx"),
+            # Keyset pages of the transaction list (CustomApiRequest.cursor_ordering)
+            models.Index(fields=["-created_at", "-id"], name="transaction_created_id_idx"),
+        ]
+
+    # Fields deciding which rollup rows a transaction counts in (see payment.rollups)
+    ROLLUP_FIELDS = ["user_id", "transaction_type", "status", "amount", "fee", "paid_amount", "created_at"]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_rollup_values()
+        return instance
+
+    def remember_rollup_values(self):
+        self._rollup_values = {field: self.__dict__.get(field) for field in self.ROLLUP_FIELDS}
+
+
+class LedgerAccountChoices(models.TextChoices):
+    wallet = "wallet"
+    funding = "funding"
+    payout = "payout"
+    platform = "platform"
+
+
+class LedgerEntry(AppDbModel):
+    """
+    One side of a double-entry posting. Every wallet Transaction writes two entries whose amounts sum to zero: the
+    user's wallet and the counterpart account money came from or went to. A user's balance is the sum of their
+    wallet entries, which is what reconcile_wallet_balances checks User.balance against.
+    """
+    transaction = models.ForeignKey(Transaction, on_delete=models.PROTECT, related_name="ledger_entries")
+    user = models.ForeignKey("account.User", on_delete=models.PROTECT, null=True, related_name="ledger_entries")
+    account = models.CharField(max_length=50, choices=LedgerAccountChoices.choices)
+    # Positive when money enters the account, negative when it leaves
+    amount = models.DecimalField(decimal_places=2, max_digits=14)
+    balance_after = models.DecimalField(decimal_places=2, max_digits=14, null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Ledger Entries"
+        indexes = [
+            models.Index(fields=["user", "account"], name="ledger_user_account_idx"),
+        ]
+
+
+class WebhookEventStatusChoices(models.TextChoices):
+    pending = "pending"
+    processed = "processed"
+    ignored = "ignored"
+    failed = "failed"
+
+
+class PaystackWebhookEvent(AppDbModel):
+    """
+    A Paystack webhook as received. The callback only inserts it and queues processing, so a redelivered event is
+    rejected by the unique event_key and costs nothing else. Events of a reference are processed in id order.
+    """
+    event_key = models.CharField(max_length=255, unique=True)
+    event = models.CharField(max_length=100)
+    reference = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=50, choices=WebhookEventStatusChoices.choices,
+                              default=WebhookEventStatusChoices.pending)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["reference", "status", "id"], name="paystack_event_ref_status_idx"),
+        ]
+
+
+class RollupGranularityChoices(models.TextChoices):
+    hour = "hour"
+    day = "day"
+
+
+class TransactionRollup(models.Model):
+    """
+    Totals of the transactions created within one hour or day, per user, type and status. Kept up to date as
+    transactions are created and change status (payment.rollups), so reports never scan Transaction.
+    """
+    granularity = models.CharField(max_length=10, choices=RollupGranularityChoices.choices)
+    bucket = models.DateTimeField()
+    user = models.ForeignKey("account.User", on_delete=models.CASCADE, related_name="transaction_rollups")
+    transaction_type = models.CharField(max_length=50, choices=TransactionTypeChoices.choices)
+    status = models.CharField(max_length=50, choices=TransactionStatusChoices.choices)
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(decimal_places=2, max_digits=18, default=0)
+    fee = models.DecimalField(decimal_places=2, max_digits=18, default=0)
+    paid_amount = models.DecimalField(decimal_places=2, max_digits=18, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["granularity", "bucket", "user", "transaction_type", "status"],
+                                    name="transaction_rollup_unique_bucket"),
+        ]
+        indexes = [
+            models.Index(fields=["granularity", "bucket"], name="transaction_rollup_bucket_idx"),
+        ]
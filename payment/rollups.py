@@ -0,0 +1,137 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from payment.models import RollupGranularityChoices, Transaction, TransactionRollup
+
+TRUNCATE_FUNCTIONS = {
+    RollupGranularityChoices.hour: TruncHour,
+    RollupGranularityChoices.day: TruncDay,
+}
+
+
+def get_buckets(created_at):
+    """Start of the hour and of the day (in the current time zone) a transaction created at created_at counts in"""
+    local_time = timezone.localtime(created_at)
+    hour = local_time.replace(minute=0, second=0, microsecond=0)
+
+    return [
+        (RollupGranularityChoices.hour, hour),
+        (RollupGranularityChoices.day, hour.replace(hour=0)),
+    ]
+
+
+def to_decimal(value):
+    return Decimal(str(value or 0))
+
+
+def add_contribution(deltas, values, sign):
+    for granularity, bucket in get_buckets(values["created_at"]):
+        key = (granularity, bucket, values["user_id"], values["transaction_type"], values["status"])
+        delta = deltas[key]
+
+        delta[0] += sign
+        delta[1] += sign * to_decimal(values["amount"])
+        delta[2] += sign * to_decimal(values["fee"])
+        delta[3] += sign * to_decimal(values["paid_amount"])
+
+
+def record_transaction_changes(transactions, deleted=False):
+    """
+    Moves the transactions' contributions between rollup rows: what they counted for when loaded (or last recorded)
+    is taken out, what they count for now is added. Call it after saving transactions without save() (update(),
+    bulk_update()); save() and delete() are recorded by the signal handlers below.
+    """
+    deltas = defaultdict(lambda: [0, Decimal("0"), Decimal("0"), Decimal("0")])
+
+    for instance in transactions:
+        old_values = getattr(instance, "_rollup_values", None)
+        new_values = None if deleted else {field: getattr(instance, field) for field in Transaction.ROLLUP_FIELDS}
+
+        if old_values == new_values:
+            continue
+
+        if old_values and old_values["created_at"] is not None:
+            add_contribution(deltas, old_values, -1)
+
+        if new_values:
+            add_contribution(deltas, new_values, 1)
+            instance.remember_rollup_values()
+
+    apply_deltas(deltas)
+
+
+def apply_deltas(deltas):
+    # Always in the same order, so two transactions updating the same rows cannot deadlock
+    for key in sorted(deltas):
+        count, amount, fee, paid_amount = deltas[key]
+
+        if not (count or amount or fee or paid_amount):
+            continue
+
+        granularity, bucket, user_id, transaction_type, status = key
+        lookup = {
+            "granularity": granularity, "bucket": bucket, "user_id": user_id, "transaction_type": transaction_type,
+            "status": status
+        }
+        changes = {
+            "count": F("count") + count, "amount": F("amount") + amount, "fee": F("fee") + fee,
+            "paid_amount": F("paid_amount") + paid_amount
+        }
+
+        if TransactionRollup.objects.filter(**lookup).update(**changes):
+            continue
+
+        try:
+            with db_transaction.atomic():
+                TransactionRollup.objects.create(
+                    **lookup, count=count, amount=amount, fee=fee, paid_amount=paid_amount
+                )
+        except IntegrityError:
+            # Created by a concurrent transaction since the update above
+            TransactionRollup.objects.filter(**lookup).update(**changes)
+
+
+def record_transaction_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_transaction_changes([instance])
+
+
+def record_transaction_delete(sender, instance, **kwargs):
+    record_transaction_changes([instance], deleted=True)
+
+
+def rebuild_rollups(batch_size=1000):
+    """
+    Recomputes every rollup row from the Transaction table and swaps them in, in one transaction. Transactions that
+    change while it runs may be missed, so run it when payments are quiet. Returns the number of rows.
+    """
+    rows = []
+
+    for granularity, truncate in TRUNCATE_FUNCTIONS.items():
+        buckets = Transaction.objects.annotate(bucket=truncate("created_at")).values(
+            "bucket", "user_id", "transaction_type", "status"
+        ).annotate(
+            rollup_count=Count("id"), rollup_amount=Sum("amount"), rollup_fee=Sum("fee"),
+            rollup_paid_amount=Sum("paid_amount")
+        ).order_by()
+
+        rows.extend(
+            TransactionRollup(
+                granularity=granularity, bucket=bucket["bucket"], user_id=bucket["user_id"],
+                transaction_type=bucket["transaction_type"], status=bucket["status"], count=bucket["rollup_count"],
+                amount=bucket["rollup_amount"] or 0, fee=bucket["rollup_fee"] or 0,
+                paid_amount=bucket["rollup_paid_amount"] or 0
+            )
+            for bucket in buckets.iterator()
+        )
+
+    with db_transaction.atomic():
+        TransactionRollup.objects.all().delete()
+        TransactionRollup.objects.bulk_create(rows, batch_size=batch_size)
+
+    return len(rows)
@@ -15,6 +15,10 @@ class VerifyAccountSerializer(serializers.Serializer):
     account_number = serializers.CharField(required=True)
 
 
+class VerifyAccountsSerializer(serializers.Serializer):
+    accounts = serializers.ListField(child=VerifyAccountSerializer(), min_length=1, max_length=50)
+
+
 class BankAccountSerializer(serializers.ModelSerializer):
     class Meta:
         model = BankAccount
@@ -1,16 +1,40 @@
+import asyncio
+from datetime import datetime, time, timedelta
 from decimal import Decimal
-from payment.models import Bank, BankAccount, TransactionTypeChoices, Transaction, TransactionStatusChoices
+from account.models import User
+from payment.models import Bank, BankAccount, TransactionTypeChoices, Transaction, TransactionStatusChoices, \
+    LedgerAccountChoices, LedgerEntry, PaystackWebhookEvent, WebhookEventStatusChoices, RollupGranularityChoices, \
+    TransactionRollup
+from payment.rollups import record_transaction_changes
+from utils.cache import CachedQuery, ReadThroughCache
+from utils.counts import CountStrategy
 from utils.constants.messages import ResponseMessages
+from utils.constants.others import MetricName
 from utils.errors import ServerError, UnprocessableEntityError, UserError, NotFoundError
 from utils.models import ModelService
+from utils.async_third_party_connection import AsyncPaystackAPIService
 from utils.third_party_connection import PaystackAPIService
-from utils.util import CustomApiRequest
-from django.core.cache import cache
+from utils.metrics import AppMetrics
+from utils.util import AppLogger, CustomApiRequest
 from django.utils.crypto import get_random_string
 from django.utils import timezone
-from django.db.models import Q, TextChoices
+from django.utils.dateparse import parse_date
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Q, Subquery, Sum, TextChoices, Value, When
+from django.db.models.functions import Coalesce
 from django.conf import settings
 
+banks_query = CachedQuery("banks", depends_on=[Bank])
+online_banks_lookup = ReadThroughCache(
+    "online_banks", ttl=settings.BANK_LIST_CACHE_TTL, stale_ttl=settings.BANK_LIST_STALE_TTL,
+    negative_ttl=settings.PROVIDER_LOOKUP_NEGATIVE_TTL
+)
+account_resolution_lookup = ReadThroughCache(
+    "account_resolution", ttl=settings.ACCOUNT_RESOLUTION_CACHE_TTL, stale_ttl=settings.ACCOUNT_RESOLUTION_STALE_TTL,
+    negative_ttl=settings.PROVIDER_LOOKUP_NEGATIVE_TTL, is_negative=lambda details: "account_name" not in details
+)
+bank_account_by_id_query = CachedQuery("bank_account_by_id", depends_on=[BankAccount])
+
 
 class PaystackEventsChoices(TextChoices):
     charge_success = "charge.success"
@@ -73,8 +97,7 @@ class BankAccountService(CustomApiRequest):
             except Exception as e:
                 raise ServerError(error=e, error_position="BankService.fetch_single")
 
-        cache_key = self.generate_cache_key("bank_account", bank_account_id, model=BankAccount)
-        return cache.get_or_set(cache_key, __do_fetch_single)
+        return bank_account_by_id_query.get(bank_account_id, fetch=__do_fetch_single)
 
 
 class BankService(CustomApiRequest):
@@ -89,21 +112,45 @@ class BankService(CustomApiRequest):
             except Exception as e:
                 raise ServerError(error=e, error_position="BankService.fetch_list")
 
-        cache_key = self.generate_cache_key("banks", model=Bank)
-        return cache.get_or_set(cache_key, __do_fetch)
+        return banks_query.get("all", fetch=__do_fetch)
 
     def fetch_list_online(self, filter_params, **extra_args):
         def __do_fetch():
-            try:
-                paystack_service = PaystackAPIService()
-                bank_list_response = paystack_service.fetch_bank_list()
-                return bank_list_response.get("data")
+            paystack_service = PaystackAPIService()
+            bank_list_response = paystack_service.fetch_bank_list(timeout=self.get_lookup_timeout())
 
-            except Exception as e:
-                raise ServerError(error=e, error_position="BankService.fetch_list_online")
+            if not bank_list_response.get("status"):
+                raise ServerError(error=bank_list_response.get("message"),
+                                  error_position="BankService.fetch_list_online")
+
+            return bank_list_response.get("data")
+
+        def __do_fetch_local():
+            # The banks seeded by populate_ng_banks, in the shape of Paystack's list
+            return list(Bank.objects.order_by("name").values("name", "code", "country"))
 
-        cache_key = self.generate_cache_key("online_banks")
-        return cache.get_or_set(cache_key, __do_fetch)
+        return online_banks_lookup.get("all", fetch=__do_fetch, fallback=__do_fetch_local)
+
+    @staticmethod
+    def get_lookup_timeout():
+        return settings.HTTP_CONNECT_TIMEOUT, settings.PAYSTACK_LOOKUP_TIMEOUT
+
+    @staticmethod
+    def make_account_details(account_details):
+        if account_details.get("status") in ["200", 200, True]:
+            data = account_details.get("data", {})
+            account_name = data.get("account_name")
+            account_number = data.get("account_number")
+
+            return {
+                "account_number": account_number,
+                "account_name": account_name,
+            }
+
+        else:
+            return {
+                "message": "Account not found",
+            }
 
     def verify_account(self, payload):
         account_number = payload.get("account_number")
@@ -114,28 +161,51 @@ class BankService(CustomApiRequest):
 
         def __do_verify_single(account_number=account_number):
             service = PaystackAPIService()
-            account_details = service.verify_account_number(account_number, bank_code)
+            account_details = service.verify_account_number(
+                account_number, bank_code, timeout=self.get_lookup_timeout()
+            )
 
-            if account_details.get("status") in ["200", 200, True]:
-                data = account_details.get("data", {})
-                account_name = data.get("account_name")
-                account_number = data.get("account_number")
+            return self.make_account_details(account_details)
 
-                return {
-                    "account_number": account_number,
-                    "account_name": account_name,
-                }
+        return account_resolution_lookup.get(account_number, bank_code, fetch=__do_verify_single)
 
-            else:
-                return {
-                    "message": "Account not found",
-                }
+    def verify_accounts(self, payload):
+        """
+        verify_account for many accounts ({"account_number", "bank_code"}): cached ones are answered from the cache,
+        the rest are resolved concurrently. Results are in the order of the accounts.
+        """
+        accounts = [(account["account_number"], account["bank_code"]) for account in payload.get("accounts")]
+        cache_keys = [account_resolution_lookup.make_key(number, code) for number, code in accounts]
+        results = account_resolution_lookup.get_many(cache_keys)
+        missing = [(key, account) for key, account in zip(cache_keys, accounts) if key not in results]
 
-        cache_key = self.generate_cache_key("bank_account", account_number, bank_code)
-        return cache.get_or_set(cache_key, __do_verify_single)
+        async def __do_verify_many():
+            async with AsyncPaystackAPIService() as service:
+                return await service.gather(
+                    service.verify_account_number(number, code) for _, (number, code) in missing
+                )
+
+        if missing:
+            for (key, _), account_details in zip(missing, asyncio.run(__do_verify_many())):
+                if isinstance(account_details, Exception):
+                    results[key] = {"message": "Account not found"}
+                    continue
+
+                results[key] = self.make_account_details(account_details)
+                account_resolution_lookup.set(key, results[key])
+
+        return [results[key] for key in cache_keys]
 
 
 class TransactionService(CustomApiRequest):
+    cursor_pagination_enabled = True
+    count_strategy = CountStrategy()
+    max_hourly_report_days = 31
+    export_fields = [
+        "id", "reference", "user__user_id", "user__email", "transaction_type", "status", "amount", "fee",
+        "paid_amount", "description", "created_at"
+    ]
+
     def __init__(self, request):
         from payment.serializers import TransactionSerializer
 
@@ -169,6 +239,77 @@ class TransactionService(CustomApiRequest):
 
         return queryset
 
+    def fetch_report(self, filter_params):
+        """
+        Counts and sums of transactions per hour or day between from_date and to_date (inclusive, default the last 30
+        days), read from the pre-aggregated TransactionRollup rows rather than the Transaction table.
+        """
+        granularity = filter_params.get("granularity") or RollupGranularityChoices.day
+        today = timezone.localdate()
+
+        try:
+            from_date = parse_date(filter_params.get("from_date") or str(today - timedelta(days=29)))
+            to_date = parse_date(filter_params.get("to_date") or str(today))
+        except ValueError:
+            raise UserError(ResponseMessages.invalid_date_range)
+
+        if granularity not in RollupGranularityChoices.values:
+            raise UserError(ResponseMessages.invalid_option)
+
+        if not from_date or not to_date or from_date > to_date:
+            raise UserError(ResponseMessages.invalid_date_range)
+
+        if granularity == RollupGranularityChoices.hour and (to_date - from_date).days >= self.max_hourly_report_days:
+            raise UserError(ResponseMessages.report_range_too_large.format(self.max_hourly_report_days))
+
+        q = Q(
+            granularity=granularity,
+            bucket__gte=timezone.make_aware(datetime.combine(from_date, time.min)),
+            bucket__lt=timezone.make_aware(datetime.combine(to_date + timedelta(days=1), time.min))
+        )
+
+        if filter_params.get("user_id"):
+            q &= Q(user_id=self.digify_number(filter_params.get("user_id"), "user_id"))
+
+        if filter_params.get("transaction_type"):
+            q &= Q(transaction_type=filter_params.get("transaction_type"))
+
+        success = Q(status=TransactionStatusChoices.success)
+        rows = list(TransactionRollup.objects.filter(q).values("bucket").annotate(
+            transaction_count=Sum("count"), volume=Sum("amount"), fees=Sum("fee"), paid=Sum("paid_amount"),
+            successful_count=Coalesce(Sum("count", filter=success), 0),
+            successful_volume=Coalesce(Sum("amount", filter=success), Decimal("0"))
+        ).order_by("bucket"))
+
+        buckets = [self.make_report_row(row, bucket=row["bucket"]) for row in rows]
+        totals = {
+            key: sum(row[key] for row in rows)
+            for key in ["transaction_count", "volume", "fees", "paid", "successful_count", "successful_volume"]
+        }
+
+        return {
+            "granularity": granularity,
+            "from_date": from_date,
+            "to_date": to_date,
+            "buckets": buckets,
+            "totals": self.make_report_row(totals)
+        }
+
+    @staticmethod
+    def make_report_row(row, **extra):
+        count = row["transaction_count"]
+
+        return {
+            **extra,
+            "count": count,
+            "volume": row["volume"] or Decimal("0"),
+            "fees": row["fees"] or Decimal("0"),
+            "paid_amount": row["paid"] or Decimal("0"),
+            "successful_count": row["successful_count"],
+            "successful_volume": row["successful_volume"],
+            "success_rate": round(row["successful_count"] * 100 / count, 2) if count else 0,
+        }
+
     def fetch_transaction_types(self):
         return TransactionTypeChoices.values
 
@@ -199,9 +340,6 @@ class TransactionService(CustomApiRequest):
 
         return transaction
 
-    def verify_account_balance_after_transaction(self, account_balance, supposed_amount):
-        return account_balance == supposed_amount
-
     def reverse_transaction(self, transaction):
         amount = transaction.amount
         fee = transaction.fee
@@ -215,32 +353,39 @@ class TransactionService(CustomApiRequest):
             transaction_type=TransactionTypeChoices.credit,
             description=f"Reversal for Transaction with ID: {transaction.reference}",
             source="Platform",
-            destination="Wallet"
+            destination="Wallet",
+            counterpart_account=LedgerAccountChoices.payout,
+            idempotency_key=f"reversal:{transaction.reference}"
         )
 
-    def fund_balance(self, user, amount, transaction_type, description, **kwargs):
+    def fund_balance(self, user, amount, transaction_type, description, idempotency_key=None, **kwargs):
         """
+        Moves money in or out of the user's wallet and records it, all in one database transaction:
+        the balance is changed with a single conditional UPDATE (balance = balance +/- amount, and for debits only
+        while balance >= amount), so concurrent calls can neither lose an update nor overdraw the wallet, and the
+        Transaction is written with its two ledger entries.
+
         :param user:
         :param amount:
         :param transaction_type: Credit, Debit, Withdrawal
         :param description:
-        :param kwargs: source, destination, fee
+        :param idempotency_key: calls repeated with the same key return the first transaction
+        :param kwargs: source, destination, fee, counterpart_account, bank_account (withdrawals)
         :return:
         """
-        amount = Decimal(amount)
+        amount = Decimal(str(amount))
 
-        amount_before = user.balance
-        is_credit = transaction_type in [TransactionTypeChoices.credit]
+        if amount <= 0:
+            raise UserError(ResponseMessages.invalid_amount)
 
-        amount_after = amount_before + amount if is_credit else amount_before - amount
+        if idempotency_key:
+            existing_transaction = Transaction.objects.filter(idempotency_key=idempotency_key).first()
 
-        if is_credit:
-            user.balance += amount
-        else:
-            user.balance -= amount
+            if existing_transaction is not None:
+                return existing_transaction
 
-        if not self.verify_account_balance_after_transaction(user.balance, amount_after):
-            raise UserError(ResponseMessages.possible_duplicate_error)
+        is_credit = transaction_type in [TransactionTypeChoices.credit]
+        signed_amount = amount if is_credit else -amount
 
         transaction_status = TransactionStatusChoices.success
         paid_amount = amount
@@ -259,11 +404,250 @@ class TransactionService(CustomApiRequest):
             "fee": kwargs.get("fee", 0),
             "source": kwargs.get("source"),
             "destination": kwargs.get("destination"),
+            "idempotency_key": idempotency_key,
+            "bank_account": kwargs.get("bank_account"),
         }
 
-        user.save(update_fields=["balance"])
+        counterpart_account = kwargs.get("counterpart_account") or self.get_counterpart_account(transaction_type)
+
+        try:
+            with db_transaction.atomic():
+                # Inserted first: a concurrent call with the same idempotency key waits on the unique index here
+                transaction = self.create_transaction(transaction_payload)
+
+                users = User.objects.filter(pk=user.pk)
+
+                if not is_credit:
+                    users = users.filter(balance__gte=amount)
+
+                if not users.update(balance=F("balance") + signed_amount):
+                    raise UserError(ResponseMessages.insufficient_balance)
+
+                # The row stays locked by the UPDATE until commit, so this is the balance this operation produced
+                user.balance = User.objects.filter(pk=user.pk).values_list("balance", flat=True).get()
+
+                LedgerEntry.objects.bulk_create([
+                    LedgerEntry(transaction=transaction, user=user, account=LedgerAccountChoices.wallet,
+                                amount=signed_amount, balance_after=user.balance),
+                    LedgerEntry(transaction=transaction, account=counterpart_account, amount=-signed_amount),
+                ])
+
+        except ServerError:
+            existing_transaction = Transaction.objects.filter(idempotency_key=idempotency_key).first() \
+                if idempotency_key else None
+
+            if existing_transaction is None:
+                raise
+
+            return existing_transaction
+
+        return transaction
+
+    @staticmethod
+    def get_counterpart_account(transaction_type):
+        return {
+            TransactionTypeChoices.credit: LedgerAccountChoices.funding,
+            TransactionTypeChoices.withdrawal: LedgerAccountChoices.payout,
+        }.get(transaction_type, LedgerAccountChoices.platform)
+
+    def reconcile_balances(self, batch_size=1000):
+        """
+        Recomputes wallet balances from the ledger and corrects the users whose User.balance drifted from it.
+        Mismatches are found in one query, then fixed under row locks: the ledger is summed again once the rows are
+        locked, so that an operation committed in between is not overwritten. Returns the number of balances corrected.
+        """
+        ledger_balance = Coalesce(
+            Subquery(
+                LedgerEntry.objects.filter(user_id=OuterRef("pk"), account=LedgerAccountChoices.wallet)
+                .values("user_id").annotate(total=Sum("amount")).values("total")
+            ),
+            Value(Decimal("0.00")),
+            output_field=DecimalField(decimal_places=2, max_digits=14)
+        )
+
+        mismatched_ids = list(
+            User.objects.annotate(ledger_balance=ledger_balance).exclude(balance=F("ledger_balance"))
+            .values_list("id", flat=True)
+        )
+
+        corrected = 0
+
+        for start in range(0, len(mismatched_ids), batch_size):
+            with db_transaction.atomic():
+                # Locked first, the ledger is summed by a later statement: one started while waiting on a lock would
+                # still see the ledger as it was before the operation that held it
+                balances = dict(
+                    User.objects.select_for_update().filter(id__in=mismatched_ids[start:start + batch_size])
+                    .values_list("id", "balance")
+                )
+                ledger_balances = dict(
+                    LedgerEntry.objects.filter(user_id__in=balances, account=LedgerAccountChoices.wallet)
+                    .values("user_id").annotate(total=Sum("amount")).values_list("user_id", "total")
+                )
+
+                changed = []
+
+                for user_id, balance in balances.items():
+                    expected = ledger_balances.get(user_id) or Decimal("0.00")
 
-        return self.create_transaction(transaction_payload)
+                    if balance == expected:
+                        continue
+
+                    AppLogger.report(
+                        f"Wallet balance of user {user_id} was {balance}, ledger says {expected}",
+                        "TransactionService.reconcile_balances"
+                    )
+                    changed.append(User(id=user_id, balance=expected))
+
+                User.objects.bulk_update(changed, ["balance"])
+                corrected += len(changed)
+
+        AppMetrics.increment(MetricName.wallet_balances_corrected, corrected)
+
+        return corrected
+
+
+class PayoutService(CustomApiRequest):
+    """
+    Pays pending withdrawals out in bulk. A run claims a batch of them (rows locked with SKIP LOCKED, so concurrent
+    runs take different withdrawals), creates the missing Paystack recipients concurrently, submits the transfers
+    through /transfer/bulk in chunks of PAYSTACK_BULK_TRANSFER_SIZE, and writes every item's outcome back with one
+    bulk_update, to the rows still queued. Final statuses arrive through the transfer webhooks.
+    """
+
+    def __init__(self, request):
+        super().__init__(request)
+
+    def claim_withdrawals(self, limit):
+        # Claims of a run that died before submitting expire; resubmitting is safe, Paystack dedupes by reference
+        expired_claims = Q(status=TransactionStatusChoices.queued,
+                           updated_at__lt=timezone.now() - timedelta(seconds=settings.PAYOUT_CLAIM_TIMEOUT))
+
+        with db_transaction.atomic():
+            transactions = list(
+                Transaction.objects.select_for_update(skip_locked=True, of=("self",)).filter(
+                    Q(status=TransactionStatusChoices.pending) | expired_claims,
+                    transaction_type=TransactionTypeChoices.withdrawal,
+                    bank_account__isnull=False
+                ).select_related("bank_account").order_by("id")[:limit]
+            )
+
+            Transaction.objects.filter(id__in=[transaction.id for transaction in transactions]).update(
+                status=TransactionStatusChoices.queued, updated_at=timezone.now()
+            )
+
+            for transaction in transactions:
+                transaction.status = TransactionStatusChoices.queued
+
+            record_transaction_changes(transactions)
+
+        return transactions
+
+    def process_payouts(self, batch_size=None):
+        """Pays out every pending withdrawal, one batch at a time. Returns the number submitted to Paystack."""
+        batch_size = batch_size or settings.PAYOUT_BATCH_SIZE
+        submitted = 0
+
+        while True:
+            transactions = self.claim_withdrawals(batch_size)
+
+            if not transactions:
+                return submitted
+
+            batch_submitted = self.pay_out(transactions)
+            submitted += batch_submitted
+
+            # A batch that got nothing through (Paystack down) ends the run instead of claiming the same rows again
+            if len(transactions) < batch_size or not batch_submitted:
+                return submitted
+
+    def pay_out(self, transactions):
+        from payment.tasks import generate_paystack_recipient_codes
+
+        recipient_codes = generate_paystack_recipient_codes(
+            list({transaction.bank_account_id for transaction in transactions})
+        )
+
+        ready = []
+
+        for transaction in transactions:
+            if transaction.bank_account_id in recipient_codes:
+                ready.append(transaction)
+            else:
+                # Back in the queue for the next run
+                transaction.status = TransactionStatusChoices.pending
+                transaction.response_data = {"status": False, "message": "Transfer recipient could not be created"}
+
+        chunk_size = settings.PAYSTACK_BULK_TRANSFER_SIZE
+        chunks = [ready[start:start + chunk_size] for start in range(0, len(ready), chunk_size)]
+
+        async def __do_submit():
+            async with AsyncPaystackAPIService() as service:
+                return await service.gather(
+                    service.initiate_bulk_transfer([
+                        {
+                            "recipient": recipient_codes[transaction.bank_account_id],
+                            "amount": transaction.amount,
+                            "reference": transaction.reference,
+                            "reason": transaction.description
+                        }
+                        for transaction in chunk
+                    ])
+                    for chunk in chunks
+                )
+
+        responses = asyncio.run(__do_submit()) if chunks else []
+        failed = []
+
+        for chunk, response in zip(chunks, responses):
+            if isinstance(response, Exception) or not response.get("status"):
+                # Nothing in the chunk was accepted; it is resubmitted with the same references next run
+                message = str(response) if isinstance(response, Exception) else response.get("message")
+
+                for transaction in chunk:
+                    transaction.status = TransactionStatusChoices.pending
+                    transaction.response_data = {"status": False, "message": message}
+
+                continue
+
+            items = {item.get("reference"): item for item in response.get("data") or []}
+
+            for transaction in chunk:
+                item = items.get(transaction.reference)
+
+                if item is None:
+                    transaction.status = TransactionStatusChoices.pending
+                    transaction.response_data = {"status": False, "message": "Missing from bulk transfer response"}
+                elif item.get("status") == TransactionStatusChoices.failed:
+                    transaction.status = TransactionStatusChoices.failed
+                    transaction.response_data = item
+                    failed.append(transaction)
+                else:
+                    transaction.status = TransactionStatusChoices.processing
+                    transaction.response_data = item
+
+        with db_transaction.atomic():
+            # A transfer webhook applied since the claim (apply_event locks the row too) has the final say, rows no
+            # longer queued are left as it wrote them
+            still_queued = set(
+                Transaction.objects.select_for_update().filter(
+                    id__in=[transaction.id for transaction in transactions], status=TransactionStatusChoices.queued
+                ).values_list("id", flat=True)
+            )
+            transactions = [transaction for transaction in transactions if transaction.id in still_queued]
+
+            Transaction.objects.bulk_update(transactions, ["status", "response_data"], batch_size=500)
+            record_transaction_changes(transactions)
+
+        transaction_service = TransactionService(self.request)
+
+        for transaction in failed:
+            if transaction.id in still_queued:
+                transaction_service.reverse_transaction(transaction)
+
+        return sum(
+            1 for transaction in transactions if transaction.status == TransactionStatusChoices.processing
+        )
 
 
 class PaystackService(CustomApiRequest):
@@ -281,13 +665,10 @@ class PaystackService(CustomApiRequest):
 
         return verification_data
 
-    def successful_transaction(self, paystack_response_data, transaction, transaction_ref):
+    def successful_transaction(self, paystack_response_data, transaction, verification_data):
         """ Take action after successful transaction """
         user_full_name = ""
 
-        # Verify Transaction status from Paystack
-        verification_data = self.verify_transaction(transaction_ref)
-
         if not verification_data:
             raise UserError("Verification failed")
 
@@ -306,7 +687,8 @@ class PaystackService(CustomApiRequest):
             transaction_owner = transaction.user
 
             message = f"""Your payment of ₦{transaction_amount} for transaction with ref. {transaction.reference} 
-            is lower than the amount ₦{transaction.amount} to be paid. Please check your transaction, and try again."""
+            is lower than the amount ₦{transaction.amount} to be paid. Please check your transaction, and try
+            again."""
             # _ = send_notification_alert.delay(user_id=transaction_owner.user_id, message=message,
             #                                   notification_type=DynamicNotificationType.transaction_update)
 
@@ -332,7 +714,16 @@ class PaystackService(CustomApiRequest):
 
         transaction.save(update_fields=["response_data", "status"])
 
+    @staticmethod
+    def make_event_key(event, data):
+        # Paystack redelivers the same event with the same data id, transfers and charges have their own ids
+        return f"{event}:{data.get('id') or data.get('reference')}"
+
     def callback(self, payload):
+        """
+        Stores the event and queues its processing (see process_events), so Paystack gets its 200 without waiting on
+        our verification call. A redelivered event only hits the unique index on event_key.
+        """
         event = payload.get("event")
         transaction_data = payload.get("data")
 
@@ -341,25 +732,110 @@ class PaystackService(CustomApiRequest):
         if not transaction_ref:
             raise UserError("Transaction reference not found")
 
-        # Fetch Transaction from DB
-        transaction_service = TransactionService(self.request)
-        transaction = transaction_service.fetch_transaction_by_ref(transaction_ref)
+        # The validated payload keeps a few fields only, the event is stored as Paystack sent it
+        raw_payload = self.request.data if self.request is not None else payload
+        raw_data = raw_payload.get("data") or transaction_data
+
+        try:
+            PaystackWebhookEvent.objects.create(
+                event_key=self.make_event_key(event, raw_data),
+                event=event,
+                reference=transaction_ref,
+                payload=raw_payload
+            )
+        except IntegrityError:
+            return True
+
+        from payment.tasks import process_paystack_events
+
+        db_transaction.on_commit(lambda: process_paystack_events.delay(transaction_ref))
+
+        return True
+
+    def process_events(self, reference):
+        """
+        Applies the pending events of a reference one at a time, oldest first. Verification with Paystack happens
+        before any lock is taken, the event and its transaction are then locked and the event is applied only if no
+        other worker got to it in the meantime. Returns the number of events processed.
+        """
+        processed = 0
+
+        event_ids = list(
+            PaystackWebhookEvent.objects.filter(reference=reference, status=WebhookEventStatusChoices.pending)
+            .order_by("id").values_list("id", flat=True)
+        )
+
+        for event_id in event_ids:
+            event = PaystackWebhookEvent.objects.filter(id=event_id, status=WebhookEventStatusChoices.pending).first()
+
+            if event is None:
+                continue
+
+            try:
+                verification_data = None
+
+                if event.event == PaystackEventsChoices.charge_success:
+                    verification_data = self.verify_transaction(reference)
+
+                with db_transaction.atomic():
+                    event = PaystackWebhookEvent.objects.select_for_update().get(id=event_id)
+
+                    if event.status != WebhookEventStatusChoices.pending:
+                        continue
+
+                    event.status, event.error = self.apply_event(event, verification_data)
+                    event.attempts += 1
+                    event.processed_at = timezone.now()
+                    event.save(update_fields=["status", "error", "attempts", "processed_at"])
+
+                    processed += 1
+
+            except Exception as e:
+                AppLogger.report(e, "PaystackService.process_events")
+
+                # Left pending for the next sweep until it runs out of attempts
+                PaystackWebhookEvent.objects.filter(id=event_id).update(
+                    attempts=F("attempts") + 1,
+                    error=str(e),
+                    status=Case(
+                        When(attempts__gte=settings.PAYSTACK_WEBHOOK_MAX_ATTEMPTS - 1,
+                             then=Value(WebhookEventStatusChoices.failed)),
+                        default=F("status")
+                    )
+                )
+
+                # Later events of this reference wait until this one is through
+                break
+
+        return processed
+
+    def apply_event(self, event, verification_data):
+        """Runs inside process_events' transaction, returns the event's new (status, error)"""
+        transaction_data = event.payload.get("data") or {}
+
+        # Every event of the reference serializes on the transaction row
+        transaction = Transaction.objects.select_for_update().filter(reference=event.reference).first()
 
         if transaction is None:
-            raise UserError("Transaction reference not found")
+            return WebhookEventStatusChoices.ignored, "Transaction reference not found"
 
-        if transaction.status != TransactionStatusChoices.pending:
-            raise UserError("Transaction already acted upon!")
+        # Withdrawals submitted by the payout engine wait in queued/processing for their transfer event
+        if transaction.status not in [TransactionStatusChoices.pending, TransactionStatusChoices.queued,
+                                      TransactionStatusChoices.processing]:
+            return WebhookEventStatusChoices.ignored, "Transaction already acted upon!"
 
-        if event == PaystackEventsChoices.charge_success:
+        if event.event == PaystackEventsChoices.charge_success:
             self.successful_transaction(paystack_response_data=transaction_data, transaction=transaction,
-                                        transaction_ref=transaction_ref)
+                                        verification_data=verification_data)
 
-        elif event == PaystackEventsChoices.transfer_success:
+        elif event.event == PaystackEventsChoices.transfer_success:
             self.successful_transfer(paystack_response_data=transaction_data, transaction=transaction)
 
-        elif event in [PaystackEventsChoices.transfer_failed, PaystackEventsChoices.transfer_reversed]:
+        elif event.event in [PaystackEventsChoices.transfer_failed, PaystackEventsChoices.transfer_reversed]:
             self.failed_transfer(paystack_response_data=transaction_data, transaction=transaction)
-            transaction_service.reverse_transaction(transaction)
+            TransactionService(self.request).reverse_transaction(transaction)
 
-        return True
+        else:
+            return WebhookEventStatusChoices.ignored, "Unhandled event"
+
+        return WebhookEventStatusChoices.processed, ""
@@ -1,67 +1,153 @@
+import asyncio
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
 from core.celery import app
-from utils.third_party_connection import PaystackAPIService
+from payment.models import BankAccount, Transaction
+from utils.async_third_party_connection import AsyncPaystackAPIService
+from utils.cache import CacheGeneration
+from utils.util import AppLogger
 
 
 @app.task
 def generate_paystack_recipient_code(bank_account_id):
-    from payment.services import BankAccountService
-
-    service = BankAccountService(None)
-    bank_account = service.fetch_bank_account_by_id(bank_account_id)
+    return generate_paystack_recipient_codes([bank_account_id]).get(bank_account_id)
 
-    if bank_account is None:
-        return
 
-    payload = {
-        "name": bank_account.account_name,
-        "account_number": bank_account.account_number,
-        "bank_code": bank_account.bank_code,
+@app.task
+def generate_paystack_recipient_codes(bank_account_ids):
+    """
+    Creates the missing Paystack recipients of the bank accounts, concurrently. Returns {bank_account_id:
+    recipient_code}, without the accounts whose recipient could not be created.
+    """
+    bank_accounts = list(BankAccount.objects.filter(id__in=bank_account_ids))
+    missing = [bank_account for bank_account in bank_accounts if not bank_account.paystack_recipient_code]
+
+    if missing:
+        async def create_recipients():
+            async with AsyncPaystackAPIService() as paystack_service:
+                return await paystack_service.gather(
+                    paystack_service.create_transfer_recipient({
+                        "name": bank_account.account_name,
+                        "account_number": bank_account.account_number,
+                        "bank_code": bank_account.bank_code,
+                    })
+                    for bank_account in missing
+                )
+
+        created = []
+
+        for bank_account, response in zip(missing, asyncio.run(create_recipients())):
+            if isinstance(response, Exception) or response.get("status") not in [200, "200", True]:
+                AppLogger.report(f"Recipient for bank account {bank_account.id} not created: {response}",
+                                 "generate_paystack_recipient_codes")
+                continue
+
+            bank_account.paystack_recipient_code = response.get("data", {}).get("recipient_code")
+            created.append(bank_account)
+
+        if created:
+            BankAccount.objects.bulk_update(created, ["paystack_recipient_code"])
+            CacheGeneration.bump_on_commit(BankAccount)
+
+    return {
+        bank_account.id: bank_account.paystack_recipient_code
+        for bank_account in bank_accounts if bank_account.paystack_recipient_code
     }
 
-    if not bank_account.paystack_recipient_code:
-        paystack_service = PaystackAPIService()
-        response = paystack_service.create_transfer_recipient(payload)
 
-        if response.get("status") in [200, "200", True]:
-            data = response.get("data", {})
-            recipient_code = data.get("recipient_code")
+@app.task
+def initiate_paystack_transfer(bank_account_id, amount, transaction_reference):
+    return initiate_paystack_transfers([{
+        "bank_account_id": bank_account_id,
+        "amount": amount,
+        "transaction_reference": transaction_reference
+    }])
 
-            bank_account.paystack_recipient_code = recipient_code
-            bank_account.save()
 
-            return recipient_code
+@app.task
+def initiate_paystack_transfers(transfers):
+    """
+    Sends many transfers from one worker: the recipients still missing are created first, then the transfers are
+    initiated concurrently (see AsyncAPIService). Each item has bank_account_id, amount and transaction_reference;
+    Paystack's response is saved on the transaction.
+    """
+    recipient_codes = generate_paystack_recipient_codes([transfer["bank_account_id"] for transfer in transfers])
+    transactions = Transaction.objects.in_bulk(
+        [transfer["transaction_reference"] for transfer in transfers], field_name="reference"
+    )
 
-    return True
+    ready = []
 
+    for transfer in transfers:
+        transaction = transactions.get(transfer["transaction_reference"])
+        recipient_code = recipient_codes.get(transfer["bank_account_id"])
 
-@app.task
-def initiate_paystack_transfer(bank_account_id, amount, transaction_reference):
-    from payment.services import BankAccountService, TransactionService
+        if transaction is None or recipient_code is None:
+            AppLogger.report(f"Transfer {transfer} skipped, transaction or recipient missing",
+                             "initiate_paystack_transfers")
+            continue
 
-    service = BankAccountService(None)
+        ready.append((transaction, recipient_code, transfer["amount"]))
 
-    bank_account = service.fetch_bank_account_by_id(bank_account_id)
+    async def send_transfers():
+        async with AsyncPaystackAPIService() as paystack_service:
+            return await paystack_service.gather(
+                paystack_service.initiate_transfer(
+                    recipient=recipient_code,
+                    amount=amount,
+                    reference=transaction.reference,
+                    reason=transaction.description
+                )
+                for transaction, recipient_code, amount in ready
+            )
 
-    if bank_account is None:
-        return
+    if not ready:
+        return 0
 
-    paystack_recipient_code = bank_account.paystack_recipient_code
+    for (transaction, _, _), response in zip(ready, asyncio.run(send_transfers())):
+        if isinstance(response, Exception):
+            response = {"status": False, "message": str(response)}
 
-    if not paystack_recipient_code:
-        paystack_recipient_code = generate_paystack_recipient_code(bank_account_id)
+        transaction.response_data = response
 
-    transaction_service = TransactionService(None)
-    transaction = transaction_service.fetch_transaction_by_ref(transaction_reference)
+    Transaction.objects.bulk_update([transaction for transaction, _, _ in ready], ["response_data"])
 
-    paystack_service = PaystackAPIService()
-    response = paystack_service.initiate_transfer(
-        recipient=paystack_recipient_code,
-        amount=amount,
-        reference=transaction_reference,
-        reason=transaction.description
-    )
+    return len(ready)
+
+
+@app.task(ignore_result=True)
+def reconcile_wallet_balances():
+    from payment.services import TransactionService
+
+    return TransactionService(None).reconcile_balances()
+
+
+@app.task(ignore_result=True)
+def process_paystack_events(reference):
+    from payment.services import PaystackService
+
+    return PaystackService(None).process_events(reference)
+
+
+@app.task(ignore_result=True)
+def sweep_paystack_events():
+    """Picks up events whose processing task was lost or failed and can still be retried"""
+    from payment.models import PaystackWebhookEvent, WebhookEventStatusChoices
+
+    references = PaystackWebhookEvent.objects.filter(
+        status=WebhookEventStatusChoices.pending,
+        created_at__lte=timezone.now() - timedelta(seconds=settings.PAYSTACK_WEBHOOK_SWEEP_INTERVAL)
+    ).values_list("reference", flat=True).distinct()
+
+    for reference in references:
+        process_paystack_events.delay(reference)
 
-    transaction.response_data = response
-    transaction.save(update_fields=["response_data"])
 
+@app.task(ignore_result=True)
+def process_payouts():
+    from payment.services import PayoutService
 
+    return PayoutService(None).process_payouts()
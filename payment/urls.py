@@ -1,16 +1,20 @@
 from django.urls import path
-from payment.views import BanksAPIView, VerifyAccountAPIView, AccountDetailsAPIView, UpdateDeleteAccountDetailsAPIView, \
-    TransactionAPIView, TransactionTypesAPIView, PaystackCallbackAPIView
+from payment.views import BanksAPIView, VerifyAccountAPIView, VerifyAccountsAPIView, AccountDetailsAPIView, \
+    UpdateDeleteAccountDetailsAPIView, TransactionAPIView, TransactionTypesAPIView, TransactionReportAPIView, \
+    TransactionExportAPIView, PaystackCallbackAPIView
 
 urlpatterns = [
     path("banks", BanksAPIView.as_view(), name='bank_list'),
     path("verify-account", VerifyAccountAPIView.as_view(), name='verify_account'),
+    path("verify-accounts", VerifyAccountsAPIView.as_view(), name='verify_accounts'),
     path("account-details", AccountDetailsAPIView.as_view(), name='account_details'),
     path("account-details/<int:account_detail_id>", UpdateDeleteAccountDetailsAPIView.as_view(),
          name='update_delete_account_details'),
 
     path("transaction", TransactionAPIView.as_view(), name='transaction'),
     path("transaction-types", TransactionTypesAPIView.as_view(), name='transaction_types'),
+    path("transaction/report", TransactionReportAPIView.as_view(), name='transaction_report'),
+    path("transaction/export", TransactionExportAPIView.as_view(), name='transaction_export'),
 
     # Callbacks
     path("callback/paystack", PaystackCallbackAPIView.as_view(), name='paystack_callback'),
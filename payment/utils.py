@@ -11,6 +11,11 @@ class IsPaystackAuthenticated(BasePermission):
         if settings.DEBUG:
             return True
 
+        received_signature = request.headers.get('x-paystack-signature')
+
+        if not received_signature or not self.secret_key:
+            return False
+
         body_str = request.body
         signature = hmac.new(
             key=self.secret_key.encode(),
@@ -18,4 +23,5 @@ class IsPaystackAuthenticated(BasePermission):
             digestmod=hashlib.sha512
         ).hexdigest()
 
-        return signature == request.headers.get('x-paystack-signature')
+        # Constant time, so the signature cannot be guessed byte by byte from response times
+        return hmac.compare_digest(signature, received_signature)
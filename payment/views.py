@@ -1,10 +1,13 @@
 from rest_framework.generics import CreateAPIView, DestroyAPIView, ListAPIView, RetrieveAPIView, UpdateAPIView
 from rest_framework.permissions import IsAuthenticated
 
-from payment.serializers import BankSerializer, VerifyAccountSerializer, BankAccountSerializer, \
-    CreateTransactionSerializer, TransactionSerializer, PaystackCallbackSerializer, WithdrawalSerializer
+from base.services import ExportService
+from payment.serializers import BankSerializer, VerifyAccountSerializer, VerifyAccountsSerializer, \
+    BankAccountSerializer, CreateTransactionSerializer, TransactionSerializer, PaystackCallbackSerializer, \
+    WithdrawalSerializer
 from payment.services import BankService, BankAccountService, TransactionService, PaystackService
 from payment.utils import IsPaystackAuthenticated
+from roles_permissions.constants import PermissionEnum
 from utils.util import CustomApiRequest
 
 
@@ -31,6 +34,17 @@ class VerifyAccountAPIView(RetrieveAPIView, CustomApiRequest):
         return self.process_request(request, target_function=service.verify_account)
 
 
+class VerifyAccountsAPIView(CreateAPIView, CustomApiRequest):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        self.serializer_class = VerifyAccountsSerializer
+
+        service = BankService(request)
+
+        return self.process_request(request, target_function=service.verify_accounts)
+
+
 class AccountDetailsAPIView(CreateAPIView, CustomApiRequest):
     permission_classes = [IsAuthenticated]
     serializer_class = BankAccountSerializer
@@ -81,6 +95,32 @@ class TransactionAPIView(CreateAPIView, CustomApiRequest):
         return self.process_request(request, target_function=service.fetch_paginated_list, filter_params=filter_params)
 
 
+class TransactionExportAPIView(RetrieveAPIView, CustomApiRequest):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        self.permission_required = [PermissionEnum.view_transaction_reports]
+        service = ExportService(request)
+        filter_params = self.get_request_filter_params(
+            "transaction_type", "status", "amount", "export_format", "background"
+        )
+
+        return self.process_request(
+            request, target_function=service.export, resource="transactions", filter_params=filter_params
+        )
+
+
+class TransactionReportAPIView(RetrieveAPIView, CustomApiRequest):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        self.permission_required = [PermissionEnum.view_transaction_reports]
+        service = TransactionService(request)
+        filter_params = self.get_request_filter_params("granularity", "user_id", "transaction_type")
+
+        return self.process_request(request, target_function=service.fetch_report, filter_params=filter_params)
+
+
 class TransactionTypesAPIView(CreateAPIView, CustomApiRequest):
     permission_classes = [IsAuthenticated]
 
@@ -14,6 +14,9 @@ class PermissionEnum(TextChoices):
     update_users = "update_users", "Update Users"
     activate_or_deactivate_users = "activate_deactivate_users", "Activate/Deactivate Users"
 
+    # Reports
+    view_transaction_reports = "view_transaction_reports", "View Transaction Reports"
+
 
 class RoleEnum(TextChoices):
     sysadmin = "sys_admin", "System Administrator"
@@ -37,16 +40,22 @@ PermissionGroups = {
         PermissionEnum.update_users,
         PermissionEnum.activate_or_deactivate_users
     ],
+    "Reports": [
+        PermissionEnum.view_transaction_reports
+    ],
 }
 
 DefaultRolesPermissions = {
     RoleEnum.sysadmin: [
         PermissionGroups.get("Roles Management"),
         PermissionGroups.get("User Management"),
+        PermissionGroups.get("Reports"),
     ],
     RoleEnum.admin: [],
     RoleEnum.moderator: [],
-    RoleEnum.accountant: [],
+    RoleEnum.accountant: [
+        PermissionGroups.get("Reports"),
+    ],
     RoleEnum.user: [],
     RoleEnum.estate_developer: []
 }
@@ -1,6 +1,6 @@
-from django.core.cache import cache
 from django.db.models import Q
 from django.utils import timezone
+from utils.cache import CachedQuery
 from utils.constants.messages import ResponseMessages
 from utils.constants.others import ActivityType
 from utils.errors import UserError, NotFoundError
@@ -8,6 +8,9 @@ from utils.util import CustomApiRequest
 from .constants import PermissionGroups, DefaultRolesPermissions
 from .models import Permission, Role
 
+role_by_id_query = CachedQuery("role_by_id", depends_on=[Role, Permission])
+role_by_label_query = CachedQuery("role_by_label", depends_on=[Role, Permission])
+
 
 class PermissionService(CustomApiRequest):
     # TODO: Insert fetch list and fetch paginated list response
@@ -130,9 +133,6 @@ class RoleService(CustomApiRequest):
         role.deleted_by = self.auth_user
         role.save()
 
-        cache_key = self.generate_cache_key(role.id, model=Role)
-        cache.delete(cache_key)
-
         self.report_activity(ActivityType.delete, role)
 
         return role
@@ -160,9 +160,6 @@ class RoleService(CustomApiRequest):
 
         self.report_activity(ActivityType.update, role)
 
-        cache_key = self.generate_cache_key(role_id, model=Role)
-        cache.delete(cache_key)
-
         return role
 
     def fetch_single(self, role_id):
@@ -174,8 +171,7 @@ class RoleService(CustomApiRequest):
 
             return role
 
-        cache_key = self.generate_cache_key(role_id, model=Role)
-        return cache.get_or_set(cache_key, fetch)
+        return role_by_id_query.get(role_id, fetch=fetch)
 
     @classmethod
     def fetch_by_ids(cls, role_ids):
@@ -204,5 +200,4 @@ class RoleService(CustomApiRequest):
 
             return role
 
-        cache_key = self.generate_cache_key(role_label, model=Role)
-        return cache.get_or_set(cache_key, fetch)
+        return role_by_label_query.get(role_label, fetch=fetch)
@@ -0,0 +1,193 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+
+import httpx
+from django.conf import settings
+
+from utils.constants.others import MetricName
+from utils.errors import ServerError, ServiceUnavailableError
+from utils.http_client import IDEMPOTENT_METHODS, get_circuit_breaker, get_retry_delay, should_retry
+from utils.metrics import AppMetrics
+from utils.third_party_connection import HTTPMethods, PaystackAPIService, PremblyAPIService
+from utils.util import AppLogger
+
+
+class AsyncAPIService(ABC):
+    """
+    asyncio counterpart of APIService, for fanning many calls out from one worker, e.g.
+
+        async with AsyncPaystackAPIService() as service:
+            results = await service.gather(
+                service.verify_account_number(number, code) for number, code in accounts
+            )
+
+    The client is opened by the async context manager and keeps at most concurrency connections, gather runs at
+    most concurrency calls at once. Timeouts, retries, the circuit breaker and the latency histograms are the ones of
+    the blocking client (utils.http_client). Django's ORM cannot be used from the coroutines: load what the calls
+    need before, save what they return after.
+    """
+    provider = "default"
+
+    def __init__(self, api_key="", base_url="", concurrency=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.headers = self.get_headers()
+        self.concurrency = concurrency or settings.HTTP_ASYNC_CONCURRENCY
+        self.client = None
+        self.semaphore = None
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=httpx.Timeout(settings.HTTP_READ_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        )
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.client.aclose()
+        self.client = None
+
+    async def make_request(self, endpoint, method, data=None, json_data=None, params=None, name=None,
+                           idempotent=None):
+        """(ok, response), same rules as APIService.make_request"""
+        method = method.upper()
+        idempotent = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        histogram = f"{MetricName.http_request}.{self.provider}.{name or endpoint.split('?')[0]}"
+        breaker = get_circuit_breaker(self.base_url)
+
+        if not breaker.allow():
+            AppMetrics.increment(f"{MetricName.http_circuit_rejected}.{self.provider}")
+            AppLogger.report(f"Circuit open for {self.base_url}", "AsyncAPIService.make_request")
+            raise ServiceUnavailableError()
+
+        attempt = 0
+
+        while True:
+            start = time.perf_counter()
+            response = None
+            error = None
+
+            try:
+                response = await self.client.request(
+                    method, self.base_url + endpoint, data=data, json=json_data, params=params
+                )
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                # Decoding errors, redirect loops, a cancelled gather: a half open circuit must not wait for it forever
+                breaker.record_failure()
+                raise
+
+            AppMetrics.observe(histogram, (time.perf_counter() - start) * 1000)
+
+            if error is not None or response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+            retryable = should_retry(
+                idempotent, isinstance(error, httpx.ConnectTimeout), error,
+                response.status_code if response is not None else None
+            )
+
+            if not retryable or attempt >= settings.HTTP_MAX_RETRIES or not breaker.allow():
+                if error is not None:
+                    raise ServerError(error=error, error_position="AsyncAPIService.make_request")
+
+                return response.is_success, response
+
+            AppMetrics.increment(f"{MetricName.http_retries}.{self.provider}")
+            await asyncio.sleep(get_retry_delay(attempt, response))
+            attempt += 1
+
+    async def gather(self, coroutines):
+        """Results of the coroutines in order, at most concurrency running at once; failures are returned as errors"""
+        async def bounded(coroutine):
+            async with self.semaphore:
+                return await coroutine
+
+        return await asyncio.gather(*(bounded(coroutine) for coroutine in coroutines), return_exceptions=True)
+
+    @abstractmethod
+    def get_headers(self):
+        pass
+
+
+class AsyncPaystackAPIService(AsyncAPIService):
+    provider = "paystack"
+
+    def __init__(self, concurrency=None):
+        super().__init__(
+            api_key=settings.PAYSTACK_SECRET_KEY, base_url=settings.PAYSTACK_BASE_URL, concurrency=concurrency
+        )
+
+    def get_headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+    async def request_json(self, endpoint, method, **kwargs):
+        status, response = await self.make_request(endpoint=endpoint, method=method, **kwargs)
+
+        return PaystackAPIService.parse_json(response)
+
+    async def verify_transaction(self, reference):
+        return await self.request_json(
+            method=HTTPMethods.get, endpoint=f"/transaction/verify/{reference}", name="/transaction/verify"
+        )
+
+    async def create_transfer_recipient(self, payload):
+        return await self.request_json(
+            method=HTTPMethods.post, endpoint="/transferrecipient",
+            data=PaystackAPIService.make_recipient_data(payload)
+        )
+
+    async def initiate_transfer(self, recipient, amount, reference, **kwargs):
+        return await self.request_json(
+            method=HTTPMethods.post, endpoint="/transfer", idempotent=True,
+            data=PaystackAPIService.make_transfer_data(recipient, amount, reference, **kwargs)
+        )
+
+    async def initiate_bulk_transfer(self, transfers):
+        return await self.request_json(
+            method=HTTPMethods.post, endpoint="/transfer/bulk", idempotent=True,
+            json_data=PaystackAPIService.make_bulk_transfer_data(transfers)
+        )
+
+    async def fetch_bank_list(self):
+        return await self.request_json(method=HTTPMethods.get, endpoint="/bank")
+
+    async def verify_account_number(self, account_number, bank_code):
+        return await self.request_json(
+            method=HTTPMethods.get, endpoint=f"/bank/resolve?account_number={account_number}&bank_code={bank_code}"
+        )
+
+
+class AsyncPremblyAPIService(AsyncAPIService):
+    provider = "prembly"
+
+    def __init__(self, api_key=settings.PREMBLY_API_KEY, concurrency=None):
+        super().__init__(api_key=api_key, base_url=settings.PREMBLY_BASE_URL, concurrency=concurrency)
+
+    def get_headers(self):
+        return {
+            "x-api-key": f"{self.api_key}",
+            "app-id": settings.PREMBLY_APP_ID,
+        }
+
+    async def verify_nin(self, id_number):
+        status, response = await self.make_request(
+            endpoint="/vnin", method=HTTPMethods.post, data={"number_nin": id_number}
+        )
+
+        return PremblyAPIService.parse_nin_response(response.json())
+
+    async def verify_bvn(self, id_number):
+        status, response = await self.make_request(
+            endpoint="/bvn", method=HTTPMethods.post, data={"number": id_number}
+        )
+
+        return PremblyAPIService.parse_bvn_response(response.json())
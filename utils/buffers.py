@@ -0,0 +1,230 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django_redis import get_redis_connection
+from redis.exceptions import LockError
+
+# Drops a drained batch only while the drain still holds the lock
+DELETE_IF_LOCK_OWNER = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[2], KEYS[3])
+end
+return -1
+"""
+
+
+class BatchBuffer:
+    """
+    Process-local buffer that hands records over in batches, e.g.
+
+        request_log_buffer = BatchBuffer("request_logs", flush=lambda records: save_logs.delay(records))
+        request_log_buffer.add(record)
+
+    A batch is flushed as soon as batch_size records are waiting, or by a background thread once the oldest waiting
+    record is flush_interval seconds old. Whatever is left is flushed when the process exits.
+    """
+
+    def __init__(self, name, flush, batch_size=100, flush_interval=5):
+        self.name = name
+        self.flush_function = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.lock = threading.Lock()
+        self.records = []
+        self.first_added_at = None
+        self.pid = None
+
+        atexit.register(self.flush)
+
+    def add(self, record):
+        with self.lock:
+            self.ensure_flusher()
+
+            if not self.records:
+                self.first_added_at = time.monotonic()
+
+            self.records.append(record)
+
+            if len(self.records) < self.batch_size:
+                return
+
+            batch = self.take()
+
+        self.send(batch)
+
+    def take(self):
+        batch, self.records, self.first_added_at = self.records, [], None
+        return batch
+
+    def flush(self):
+        with self.lock:
+            batch = self.take()
+
+        self.send(batch)
+
+    def send(self, batch):
+        if not batch:
+            return
+
+        try:
+            self.flush_function(batch)
+        except Exception as e:
+            logging.error(f"{self.name}: could not flush {len(batch)} records: {e}")
+
+    def ensure_flusher(self):
+        # Started lazily and per process, threads do not survive the fork of a preloading gunicorn/celery master
+        if self.pid == os.getpid():
+            return
+
+        self.pid = os.getpid()
+        self.records = []
+        self.first_added_at = None
+
+        threading.Thread(target=self.run_flusher, name=f"{self.name}-flusher", daemon=True).start()
+
+    def run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval / 2)
+
+            with self.lock:
+                is_due = self.first_added_at is not None and \
+                         time.monotonic() - self.first_added_at >= self.flush_interval
+                batch = self.take() if is_due else []
+
+            self.send(batch)
+
+
+class RedisListBuffer:
+    """
+    Buffer shared by every web and celery process through a Redis list, drained by a periodic task. Records being
+    written are kept in a second list until the write succeeds, so a failed write loses none; a batch failing
+    BUFFER_DRAIN_MAX_ATTEMPTS times is moved to a dead letter list (dead_key) for inspection, so it cannot block the
+    buffer.
+    Records are stored JSON encoded. Without a Redis cache backend (local development) it falls back to a list local to
+    the process, only drained when the draining task runs in that same process (e.g. CELERY_TASK_ALWAYS_EAGER).
+    """
+
+    def __init__(self, name):
+        self.key = f"{settings.REDIS_PREFIX}:buffer:{name}"
+        self.processing_key = f"{self.key}:processing"
+        self.attempts_key = f"{self.key}:attempts"
+        self.dead_key = f"{self.key}:dead"
+        self.lock_key = f"{self.key}:lock"
+        self.local_records = deque()
+
+    @staticmethod
+    def get_connection():
+        try:
+            return get_redis_connection("default")
+        except NotImplementedError:
+            return None
+
+    def push(self, record):
+        connection = self.get_connection()
+
+        if connection is None:
+            self.local_records.append(record)
+        else:
+            connection.rpush(self.key, json.dumps(record, cls=DjangoJSONEncoder))
+
+    @contextmanager
+    def drain(self, max_records):
+        """
+        Takes up to max_records records, oldest first, for the with block to write, e.g.
+
+            with activity_buffer.drain(1000) as records:
+                save(records)
+
+        They are only dropped once the block succeeds. When it raises they stay in a processing list, handed out
+        again before anything else by the next drain. One drain runs at a time, the others get no records. Should the
+        lock still be lost mid-write, another drain can hand the same records out again: writes must be idempotent.
+        """
+        connection = self.get_connection()
+
+        if connection is None:
+            records = [self.local_records.popleft() for _ in range(min(max_records, len(self.local_records)))]
+
+            try:
+                yield records
+            except BaseException:
+                self.local_records.extendleft(reversed(records))
+                raise
+
+            return
+
+        timeout = settings.BUFFER_DRAIN_LOCK_TIMEOUT
+        # Not thread local: keep_lock extends it from its own thread
+        lock = connection.lock(self.lock_key, timeout=timeout, thread_local=False)
+
+        if not lock.acquire(blocking=False):
+            yield []
+            return
+
+        # The lock is extended while the block writes, it only expires when the worker holding it is gone
+        writing = threading.Event()
+        threading.Thread(target=self.keep_lock, args=(lock, timeout, writing), daemon=True).start()
+
+        try:
+            records = self.take_batch(connection, max_records)
+
+            yield [json.loads(record) for record in records]
+
+            deleted = connection.eval(
+                DELETE_IF_LOCK_OWNER, 3, self.lock_key, self.processing_key, self.attempts_key, lock.local.token
+            )
+
+            if deleted == -1:
+                logging.error(f"{self.key}: lock lost while writing a batch, it may be written again")
+        finally:
+            writing.set()
+
+            try:
+                lock.release()
+            except LockError:
+                pass
+
+    def take_batch(self, connection, max_records):
+        records = connection.lrange(self.processing_key, 0, -1)
+
+        if records and connection.incr(self.attempts_key) > settings.BUFFER_DRAIN_MAX_ATTEMPTS:
+            pipeline = connection.pipeline(transaction=True)
+            pipeline.rpush(self.dead_key, *records)
+            pipeline.delete(self.processing_key, self.attempts_key)
+            pipeline.execute()
+
+            logging.error(f"{self.key}: moved a batch of {len(records)} records failing to write to {self.dead_key}")
+            records = []
+
+        if records:
+            return records
+
+        # Moved one by one in a single MULTI, so a record is always in one of the two lists
+        pipeline = connection.pipeline(transaction=True)
+
+        for _ in range(max_records):
+            pipeline.lmove(self.key, self.processing_key, "LEFT", "RIGHT")
+
+        pipeline.set(self.attempts_key, 1)
+
+        return [record for record in pipeline.execute()[:-1] if record is not None]
+
+    @staticmethod
+    def keep_lock(lock, timeout, writing):
+        while not writing.wait(timeout / 3):
+            try:
+                lock.extend(timeout, replace_ttl=True)
+            except LockError:
+                return
+
+    def __len__(self):
+        connection = self.get_connection()
+        return len(self.local_records) if connection is None else connection.llen(self.key)
@@ -0,0 +1,337 @@
+import hashlib
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.utils.text import slugify
+
+from utils.metrics import AppMetrics
+
+
+def get_model_label(model):
+    if isinstance(model, str):
+        return model.lower()
+
+    return model._meta.label_lower
+
+
+class CacheGeneration:
+    """
+    Per-model generation counters kept in the shared cache.
+    Bumping a model's generation invalidates every CachedQuery that depends on it in O(1), for every worker.
+    """
+    key_prefix = "cache_generation"
+
+    @classmethod
+    def make_key(cls, model):
+        return f"{cls.key_prefix}:{get_model_label(model)}"
+
+    @staticmethod
+    def initial_value():
+        # Time based so that a counter lost to eviction never restarts at a value an old entry was tagged with
+        return int(time.time() * 1000)
+
+    @classmethod
+    def resolve(cls, generation_key, value):
+        if value is not None:
+            return value
+
+        cache.add(generation_key, cls.initial_value(), timeout=None)
+        return cache.get(generation_key)
+
+    @classmethod
+    def get(cls, model):
+        generation_key = cls.make_key(model)
+        return cls.resolve(generation_key, cache.get(generation_key))
+
+    @classmethod
+    def bump(cls, model):
+        generation_key = cls.make_key(model)
+
+        try:
+            return cache.incr(generation_key)
+        except ValueError:
+            cache.add(generation_key, cls.initial_value(), timeout=None)
+            return cache.get(generation_key)
+
+    @classmethod
+    def bump_on_commit(cls, model, using=None):
+        """
+        Bump now and again once the surrounding transaction commits, so a reader that refilled the cache from the
+        pre-commit state in between does not keep serving it.
+        """
+        cls.bump(model)
+
+        if connections[using or "default"].in_atomic_block:
+            transaction.on_commit(lambda: cls.bump(model), using=using)
+
+
+class CachedQuery:
+    """
+    A cached lookup declared once per key family, e.g.
+
+        user_by_user_id_query = CachedQuery("user_by_user_id", depends_on=[User])
+        user = user_by_user_id_query.get(user_id, fetch=lambda: User.objects.get(user_id=user_id))
+
+    Entries are stored together with the generations of the models they depend on. A save, delete or m2m change on
+    any of those models bumps its generation, and older entries are treated as stale and refetched.
+    """
+    key_prefix = "cached_query"
+    families = {}
+
+    def __init__(self, family, depends_on, timeout=settings.DEFAULT_CACHE_TIMEOUT):
+        self.family = family
+        self.depends_on = [get_model_label(model) for model in depends_on]
+        self.timeout = timeout
+
+        CachedQuery.families[family] = self
+
+        for model in depends_on:
+            if not isinstance(model, str):
+                connect_generation_signals(model)
+
+    def make_key(self, *lookup):
+        return ":".join([self.key_prefix, self.family] + [slugify(str(arg)) for arg in lookup])
+
+    def get_generation_keys(self):
+        return [CacheGeneration.make_key(model) for model in self.depends_on]
+
+    def get_generations(self):
+        generation_keys = self.get_generation_keys()
+        values = cache.get_many(generation_keys)
+
+        return tuple(
+            CacheGeneration.resolve(generation_key, values.get(generation_key)) for generation_key in generation_keys
+        )
+
+    def get(self, *lookup, fetch):
+        _, value = self.get_with_generations(*lookup, fetch=fetch)
+        return value
+
+    def get_with_generations(self, *lookup, fetch):
+        key = self.make_key(*lookup)
+        generation_keys = self.get_generation_keys()
+
+        values = cache.get_many([key] + generation_keys)
+        generations = tuple(
+            CacheGeneration.resolve(generation_key, values.get(generation_key)) for generation_key in generation_keys
+        )
+
+        entry = values.get(key)
+
+        if entry is not None:
+            entry_generations, value = entry
+
+            if entry_generations == generations:
+                self.record("hit")
+                return generations, value
+
+            self.record("stale")
+        else:
+            self.record("miss")
+
+        value = fetch()
+        cache.set(key, (generations, value), self.timeout)
+
+        return generations, value
+
+    def make_etag(self, generations, *lookup):
+        """A strong ETag that changes whenever one of the models the lookup depends on changes"""
+        version = ":".join([self.make_key(*lookup)] + [str(generation) for generation in generations])
+        return '"{}"'.format(hashlib.md5(version.encode("utf-8")).hexdigest())
+
+    def get_etag(self, *lookup):
+        return self.make_etag(self.get_generations(), *lookup)
+
+    def get_with_etag(self, *lookup, fetch):
+        generations, value = self.get_with_generations(*lookup, fetch=fetch)
+        return self.make_etag(generations, *lookup), value
+
+    def invalidate(self, *lookup):
+        cache.delete(self.make_key(*lookup))
+
+    def invalidate_many(self, lookups):
+        cache.delete_many([self.make_key(*lookup) for lookup in lookups])
+
+    def record(self, outcome):
+        AppMetrics.increment(f"{self.key_prefix}.{self.family}.{outcome}")
+
+    @classmethod
+    def stats(cls):
+        """Hit, miss and stale rates of every key family seen by this worker"""
+        stats = {}
+
+        for family in sorted(cls.families):
+            counts = {outcome: AppMetrics.get(f"{cls.key_prefix}.{family}.{outcome}")
+                      for outcome in ["hit", "miss", "stale"]}
+            total = sum(counts.values())
+
+            stats[family] = {
+                **counts,
+                "total": total,
+                "hit_rate": round(counts["hit"] / total, 4) if total else 0,
+                "miss_rate": round(counts["miss"] / total, 4) if total else 0,
+                "stale_rate": round(counts["stale"] / total, 4) if total else 0,
+            }
+
+        return stats
+
+
+class ReadThroughCache:
+    """
+    Cache in front of a slow or rate limited lookup (an upstream API), declared once per key family, e.g.
+
+        banks_lookup = ReadThroughCache("paystack_banks", ttl=3600, stale_ttl=86400)
+        banks = banks_lookup.get("all", fetch=lambda: paystack.fetch_bank_list(), fallback=load_local_banks)
+
+    - A value is fresh for ttl seconds, then served stale for up to stale_ttl more seconds while one worker refreshes
+      it in a background thread.
+    - On a miss a single worker fetches (a lock in the shared cache), the others wait up to lock_wait seconds for its
+      result instead of calling the upstream too; then they use fallback, or fetch themselves without one.
+    - Values is_negative accepts (e.g. "not found") are kept for negative_ttl only, as are fallback values.
+    - A failed fetch keeps serving a stale value; with nothing cached it uses fallback, or raises.
+    """
+    key_prefix = "read_through"
+    families = {}
+
+    def __init__(self, family, ttl, stale_ttl=0, negative_ttl=60, is_negative=None, lock_timeout=30, lock_wait=2):
+        self.family = family
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.is_negative = is_negative or (lambda value: False)
+        self.lock_timeout = lock_timeout
+        self.lock_wait = lock_wait
+
+        ReadThroughCache.families[family] = self
+
+    def make_key(self, *lookup):
+        return ":".join([self.key_prefix, self.family] + [slugify(str(arg)) for arg in lookup])
+
+    def get(self, *lookup, fetch, fallback=None):
+        key = self.make_key(*lookup)
+        entry = cache.get(key)
+
+        if entry is not None:
+            fresh_until, value = entry
+
+            if time.time() < fresh_until:
+                self.record("hit")
+                return value
+
+            self.record("stale")
+
+            if self.acquire(key):
+                threading.Thread(target=self.refresh_in_background, args=(key, fetch), daemon=True).start()
+
+            return value
+
+        self.record("miss")
+
+        if self.acquire(key):
+            try:
+                return self.load(key, fetch, fallback)
+            finally:
+                self.release(key)
+
+        # Someone else is fetching this key: wait for their result rather than calling the upstream as well
+        deadline = time.monotonic() + self.lock_wait
+
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+
+            if entry is not None:
+                self.record("waited")
+                return entry[1]
+
+        if fallback is not None:
+            self.record("fallback")
+            return fallback()
+
+        return self.load(key, fetch)
+
+    def load(self, key, fetch, fallback=None):
+        try:
+            value = fetch()
+            negative = None
+
+        except Exception as e:
+            if fallback is None:
+                raise
+
+            from utils.util import AppLogger
+
+            AppLogger.report(e, f"ReadThroughCache.{self.family}")
+            self.record("fallback")
+
+            value = fallback()
+            negative = True
+
+        self.set(key, value, negative=negative)
+        return value
+
+    def refresh_in_background(self, key, fetch):
+        try:
+            self.load(key, fetch)
+
+        except Exception as e:
+            # The stale value stays in place until the next refresh
+            from utils.util import AppLogger
+
+            AppLogger.report(e, f"ReadThroughCache.{self.family}")
+
+        finally:
+            self.release(key)
+
+    def set(self, key, value, negative=None):
+        negative = self.is_negative(value) if negative is None else negative
+        ttl = self.negative_ttl if negative else self.ttl
+
+        cache.set(key, (time.time() + ttl, value), ttl + (0 if negative else self.stale_ttl))
+
+    def get_many(self, keys):
+        """Cached values (fresh or stale) of the keys that have one"""
+        return {key: entry[1] for key, entry in cache.get_many(keys).items()}
+
+    def acquire(self, key):
+        return cache.add(f"{key}:lock", 1, self.lock_timeout)
+
+    def release(self, key):
+        cache.delete(f"{key}:lock")
+
+    def invalidate(self, *lookup):
+        cache.delete(self.make_key(*lookup))
+
+    def record(self, outcome):
+        AppMetrics.increment(f"{self.key_prefix}.{self.family}.{outcome}")
+
+
+def bump_generation_on_change(sender, **kwargs):
+    CacheGeneration.bump_on_commit(sender, using=kwargs.get("using"))
+
+
+def connect_generation_signals(model):
+    """Bump the generation of model whenever one of its rows, or one of its m2m relations, changes"""
+    label = get_model_label(model)
+
+    post_save.connect(bump_generation_on_change, sender=model, weak=False, dispatch_uid=f"cache_generation:{label}")
+    post_delete.connect(bump_generation_on_change, sender=model, weak=False, dispatch_uid=f"cache_generation:{label}")
+
+    for field in model._meta.local_many_to_many:
+        def bump_m2m_owner(sender, action, using=None, owner=model, **kwargs):
+            if action in ["post_add", "post_remove", "post_clear"]:
+                CacheGeneration.bump_on_commit(owner, using=using)
+
+        m2m_changed.connect(bump_m2m_owner, sender=field.remote_field.through, weak=False,
+                            dispatch_uid=f"cache_generation:{label}:{field.name}")
+
+
+def connect_versioned_models():
+    """Called on startup so every process (web or celery) bumps generations, whatever modules it has imported"""
+    for model_label in settings.CACHE_VERSIONED_MODELS:
+        connect_generation_signals(apps.get_model(model_label))
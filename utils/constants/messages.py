@@ -36,6 +36,8 @@ class ResponseMessages(TextChoices):
     verification_unsuccessful = "Email Verification Unsuccessful. The token is invalid or expired. ❌"
     media_type_not_found = "Media Type not found."
     media_not_found = "Media not found."
+    invalid_upload_token = "Invalid or expired upload token."
+    upload_not_received = "The file has not been uploaded yet."
     token_expired = "Not Authorized. Expired Token."
     user_with_id_not_found = "User with id '{}' not found."
     invalid_user_id = "Invalid user id."
@@ -48,6 +50,9 @@ class ResponseMessages(TextChoices):
     phone_number_is_required = "Phone number is required."
     user_with_phone_number_not_found = "User with phone number '{}' not found."
     invalid_option = "Invalid option."
+    invalid_cursor = "Invalid cursor."
+    payload_decryption_failed = "The following fields could not be decrypted: {}."
+    invalid_location_type = "Invalid location type, use city or state."
     role_already_exists = "Role '{}' already exists."
     invalid_user_type = "Invalid user type."
     role_not_found = "Role not found."
@@ -67,6 +72,12 @@ class ResponseMessages(TextChoices):
     max_accounts_exceeded = "Max number of accounts exceeded."
     account_details_not_exist = "Account details not found."
     insufficient_balance = "Insufficient balance."
+    invalid_amount = "Amount must be greater than zero."
+    invalid_date_range = "Provide valid from_date and to_date (YYYY-MM-DD), from_date not after to_date."
+    report_range_too_large = "Hourly reports cover at most {} days."
+
+    # Exports
+    invalid_export_format = "Invalid export format, use csv or ndjson."
 
 
 class ErrorMessages(TextChoices):
@@ -79,5 +90,6 @@ class ErrorMessages(TextChoices):
     unprocessable_entity = "Unprocessable Entity"
     success = "Success"
     inactive_account = "Your account is inactive. Contact your administrator."
+    service_unavailable = "Service temporarily unavailable. Please try again later."
 
     # App Specific
@@ -31,3 +31,21 @@ class CeleryTaskQueue(TextChoices):
     email = "email"
     logging = "logging"
     default = "default"
+
+
+class LocationType(TextChoices):
+    city = "city"
+    state = "state"
+
+
+class MetricName(TextChoices):
+    permission_queries_avoided = "permissions.queries_avoided"
+    permission_snapshot_queries = "permissions.snapshot_queries"
+    location_index_rebuilds = "location_index.rebuilds"
+    location_index_incremental_updates = "location_index.incremental_updates"
+    request_decrypt = "request.decrypt_ms"
+    wallet_balances_corrected = "wallet.balances_corrected"
+    http_request = "http.request_ms"
+    http_retries = "http.retries"
+    http_circuit_opened = "http.circuit_opened"
+    http_circuit_rejected = "http.circuit_rejected"
@@ -0,0 +1,76 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+
+class CountStrategy:
+    """
+    Totals for paginated lists, e.g. on a service:
+
+        count_strategy = CountStrategy()
+
+    Counts are cached for a short time per filter signature (the SQL of the filtered queryset, so filters and the
+    user scope are part of it). When the planner expects more than estimate_threshold rows, its estimate is returned
+    instead of running the COUNT(*), and the total is flagged as an estimate.
+    """
+    key_prefix = "list_count"
+
+    def __init__(self, cache_timeout=None, estimate_threshold=None):
+        self.cache_timeout = settings.PAGINATION_COUNT_CACHE_TIMEOUT if cache_timeout is None else cache_timeout
+        self.estimate_threshold = settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD \
+            if estimate_threshold is None else estimate_threshold
+
+    def make_key(self, queryset):
+        sql, params = queryset.order_by().query.sql_with_params()
+        signature = json.dumps([sql, [str(param) for param in params]])
+
+        return "{}:{}:{}".format(
+            self.key_prefix, queryset.model._meta.label_lower, hashlib.md5(signature.encode("utf-8")).hexdigest()
+        )
+
+    def count(self, queryset):
+        """(total, total_is_estimate)"""
+        key = self.make_key(queryset) if self.cache_timeout else None
+
+        if key:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        result = None
+
+        if self.estimate_threshold:
+            estimate = estimate_queryset_count(queryset)
+
+            if estimate is not None and estimate >= self.estimate_threshold:
+                result = (estimate, True)
+
+        if result is None:
+            result = (queryset.count(), False)
+
+        if key:
+            cache.set(key, result, self.cache_timeout)
+
+        return result
+
+
+def estimate_queryset_count(queryset):
+    """Rows the Postgres planner expects the queryset to return, None on other databases"""
+    connection = connections[queryset.db]
+
+    if connection.vendor != "postgresql":
+        return None
+
+    sql, params = queryset.order_by().query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -1,11 +1,24 @@
+import binascii
 import hashlib
+import json
+import os
 from base64 import b64decode, b64encode
+from collections.abc import Mapping
 from decimal import Decimal
+from functools import lru_cache
 
 from Cryptodome.Cipher import AES
 from Cryptodome.Util.Padding import pad, unpad
 from django.db.models import QuerySet
 
+ENVELOPE_MODE = "envelope"
+
+
+class DecryptionError(ValueError):
+    def __init__(self, fields):
+        self.fields = fields
+        super().__init__(f"Could not decrypt: {', '.join(fields)}")
+
 
 class AESCipher:
     """
@@ -13,11 +26,16 @@ class AESCipher:
         c = AESCipher('password').encrypt('message')
         m = AESCipher('password').decrypt(c)
     Tested under Python 3 and PyCrypto 2.6.1.
+
+    encrypt_nested encrypts every leaf of a payload separately (AES-CBC, base64). Instead of one cipher object per
+    leaf, the key schedule is set up once (see get_cipher) and all leaves advance through CBC together, one
+    block position at a time, so a payload costs as many AES calls as its longest leaf has blocks.
     """
 
     def __init__(self, key, vector):
         self.key = bytes(key, 'ascii')
         self.vector = bytes(vector, 'ascii')
+        self.block_cipher = AES.new(self.key, AES.MODE_ECB)
 
     def encrypt(self, raw):
         if raw == "" or raw is None:
@@ -34,21 +52,89 @@ class AESCipher:
         cipher = AES.new(self.key, AES.MODE_CBC, self.vector)
         return unpad(cipher.decrypt(text), AES.block_size).decode('utf8')
 
+    def encrypt_many(self, raws):
+        """Same output as [self.encrypt(raw) for raw in raws], with one ECB call per block position"""
+        results = list(raws)
+        pending = {}
+
+        # Leaves share the IV, so equal values encrypt to the same text and are only encrypted once
+        for position, raw in enumerate(results):
+            if raw != "" and raw is not None:
+                pending.setdefault(raw, []).append(position)
+
+        if not pending:
+            return results
+
+        block_size = AES.block_size
+        plaintexts = [pad(bytes(raw, 'utf8'), block_size) for raw in pending]
+        ciphertexts = [bytearray() for _ in plaintexts]
+        previous_blocks = [self.vector] * len(plaintexts)
+
+        offset = 0
+        active = list(range(len(plaintexts)))
+
+        while active:
+            chunk = b"".join(plaintexts[leaf][offset:offset + block_size] for leaf in active)
+            chained = b"".join(previous_blocks[leaf] for leaf in active)
+
+            # CBC: every block is xored with the previous cipher block before going through the block cipher
+            mixed = (int.from_bytes(chunk, "big") ^ int.from_bytes(chained, "big")).to_bytes(len(chunk), "big")
+            encrypted = self.block_cipher.encrypt(mixed)
+
+            for index, leaf in enumerate(active):
+                block = encrypted[index * block_size:(index + 1) * block_size]
+                ciphertexts[leaf] += block
+                previous_blocks[leaf] = block
+
+            offset += block_size
+            active = [leaf for leaf in active if len(plaintexts[leaf]) > offset]
+
+        for raw, ciphertext in zip(pending, ciphertexts):
+            encoded = b64encode(bytes(ciphertext)).decode('utf8')
+
+            for position in pending[raw]:
+                results[position] = encoded
+
+        return results
+
     def encrypt_nested(self, ob):
-        if isinstance(ob, dict):
-            ret_obj = {}
-            for k, v in ob.items():
-                if isinstance(v, str) or isinstance(v, int) or isinstance(v, Decimal):
-                    ret_obj[k] = self.encrypt(str(v))
-                else:
-                    ret_obj[k] = self.encrypt_nested(v)
-        elif isinstance(ob, list) or isinstance(ob, QuerySet):
-            ret_obj = []
-            for v in ob:
-                ret_obj.append(self.encrypt_nested(v))
-        else:
-            ret_obj = self.encrypt(str(ob))
-        return ret_obj
+        """
+        Copy of ob with every leaf encrypted (numbers, booleans and None as their str()). Walks the payload with a
+        stack instead of recursion, collecting leaves first and encrypting them all in one encrypt_many call.
+        """
+        leaves = []
+        slots = []
+
+        root = [None]
+        stack = [(ob, root, 0, False)]
+
+        while stack:
+            value, parent, key, is_dict_value = stack.pop()
+
+            if is_dict_value and isinstance(value, (str, int, Decimal)):
+                slots.append((parent, key))
+                leaves.append(str(value))
+            elif isinstance(value, dict):
+                copy = {}
+                parent[key] = copy
+
+                for k, v in value.items():
+                    copy[k] = None
+                    stack.append((v, copy, k, True))
+            elif isinstance(value, (list, QuerySet)):
+                copy = [None] * len(value)
+                parent[key] = copy
+
+                for index, v in enumerate(value):
+                    stack.append((v, copy, index, False))
+            else:
+                slots.append((parent, key))
+                leaves.append(str(value))
+
+        for (parent, key), encrypted in zip(slots, self.encrypt_many(leaves)):
+            parent[key] = encrypted
+
+        return root[0]
 
     def decrypt_nested(self, ob):
         if isinstance(ob, dict):
@@ -64,13 +150,131 @@ class AESCipher:
             ob = self.decrypt(str(ob))
         return ob
 
-    def decrypt_body(self, body):
-        try:
-            body_copy = body.copy()
-            return self.decrypt_nested(body_copy)
-        except Exception as e:
-            print("Decrypt Error: ", e)
-            return None
+    def decrypt_many(self, encs):
+        """
+        Same values as [self.decrypt(enc) for enc in encs], with a single ECB call for all of them.
+        Returns (values, failed) where failed holds the positions that could not be decrypted (left as they were).
+        """
+        results = list(encs)
+        failed = set()
+        pending = {}
+
+        for position, enc in enumerate(results):
+            if not (enc == "" or enc is None or enc == "null" or enc == "None"):
+                pending.setdefault(enc, []).append(position)
+
+        block_size = AES.block_size
+        ciphertexts = {}
+
+        for enc, positions in pending.items():
+            try:
+                ciphertext = b64decode(enc)
+            except (binascii.Error, ValueError):
+                ciphertext = b""
+
+            if ciphertext and len(ciphertext) % block_size == 0:
+                ciphertexts[enc] = ciphertext
+            else:
+                failed.update(positions)
+
+        if not ciphertexts:
+            return results, failed
+
+        # CBC decryption has no chaining dependency: every block is decrypted, then xored with the block before it
+        joined = b"".join(ciphertexts.values())
+        previous = b"".join(self.vector + ciphertext[:-block_size] for ciphertext in ciphertexts.values())
+        decrypted = self.block_cipher.decrypt(joined)
+        plaintext = (int.from_bytes(decrypted, "big") ^ int.from_bytes(previous, "big")).to_bytes(len(joined), "big")
+
+        offset = 0
+
+        for enc, ciphertext in ciphertexts.items():
+            chunk = plaintext[offset:offset + len(ciphertext)]
+            offset += len(ciphertext)
+
+            try:
+                value = unpad(chunk, block_size).decode('utf8')
+            except ValueError:
+                failed.update(pending[enc])
+                continue
+
+            for position in pending[enc]:
+                results[position] = value
+
+        return results, failed
+
+    def decrypt_fields(self, data, fields=None):
+        """
+        Decrypts the string values (nested ones included) of the given top-level fields of a request body, every
+        field when fields is None, in one decrypt_many call. Other fields are passed through untouched and only the
+        containers holding decrypted values are copied. Raises DecryptionError naming the fields that failed.
+        """
+        items = data if isinstance(data, list) else [data]
+        decrypted_items = []
+
+        leaves = []
+        slots = []
+
+        for item in items:
+            if not isinstance(item, Mapping):
+                decrypted_items.append(item)
+                continue
+
+            decrypted_item = {key: item[key] for key in item}
+            decrypted_items.append(decrypted_item)
+
+            stack = [(decrypted_item, key, key) for key in decrypted_item if fields is None or key in fields]
+
+            while stack:
+                parent, key, field = stack.pop()
+                value = parent[key]
+
+                if isinstance(value, str):
+                    slots.append((parent, key, field))
+                    leaves.append(value)
+                elif isinstance(value, Mapping):
+                    parent[key] = {k: value[k] for k in value}
+                    stack.extend((parent[key], k, field) for k in value)
+                elif isinstance(value, list):
+                    parent[key] = list(value)
+                    stack.extend((parent[key], index, field) for index in range(len(value)))
+
+        values, failed = self.decrypt_many(leaves)
+
+        if failed:
+            raise DecryptionError(sorted({str(slots[position][2]) for position in failed}))
+
+        for (parent, key, _), value in zip(slots, values):
+            parent[key] = value
+
+        return decrypted_items if isinstance(data, list) else decrypted_items[0]
+
+    def encrypt_envelope(self, data, encoder=None):
+        """
+        Whole-body mode: the JSON of data sealed in one AES-GCM operation, with a fresh nonce for every response.
+        The client decrypts ciphertext with the same key and checks the tag before parsing the JSON.
+        """
+        nonce = os.urandom(12)
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
+        ciphertext, tag = cipher.encrypt_and_digest(json.dumps(data, cls=encoder).encode('utf8'))
+
+        return {
+            "nonce": b64encode(nonce).decode('utf8'),
+            "ciphertext": b64encode(ciphertext).decode('utf8'),
+            "tag": b64encode(tag).decode('utf8')
+        }
+
+    def decrypt_envelope(self, envelope):
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=b64decode(envelope["nonce"]))
+        plaintext = cipher.decrypt_and_verify(b64decode(envelope["ciphertext"]), b64decode(envelope["tag"]))
+
+        return json.loads(plaintext)
+
+
+@lru_cache(maxsize=8)
+def get_cipher(key, vector):
+    """Shared AESCipher per key, so its key schedule is built once per process instead of once per value"""
+    return AESCipher(key, vector)
 
 
 def md5_str(data):
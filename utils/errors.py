@@ -65,3 +65,8 @@ class RateLimitException(CustomError):
 class UnprocessableEntityError(CustomError):
     status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
     message = ErrorMessages.unprocessable_entity
+
+
+class ServiceUnavailableError(CustomError):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    message = ErrorMessages.service_unavailable
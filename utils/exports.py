@@ -0,0 +1,74 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from base.models import ExportFormatChoices
+
+CONTENT_TYPES = {
+    ExportFormatChoices.csv: "text/csv",
+    ExportFormatChoices.ndjson: "application/x-ndjson",
+}
+
+# A leading =, +, -, @ makes spreadsheet apps evaluate the cell as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+class Echo:
+    """File-like object whose write() hands back what it was given, so csv.writer can produce lines to yield"""
+
+    def write(self, value):
+        return value
+
+
+def to_cell(value, encoder):
+    if value is None:
+        return ""
+
+    if isinstance(value, str):
+        return f"'{value}" if value.startswith(FORMULA_PREFIXES) else value
+
+    if isinstance(value, (bool, int, float)):
+        return value
+
+    return encoder.default(value)
+
+
+def iter_csv(rows, fields):
+    writer = csv.writer(Echo())
+    encoder = DjangoJSONEncoder()
+
+    yield writer.writerow(fields)
+
+    for row in rows:
+        yield writer.writerow([to_cell(row[field], encoder) for field in fields])
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+def iter_export(queryset, fields, export_format, chunk_size):
+    """
+    Lines of the export of queryset, a values() queryset of fields. Rows are fetched chunk_size at a time with a
+    server-side cursor where the database has one, so memory stays flat however many rows there are.
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+
+    if export_format == ExportFormatChoices.ndjson:
+        return iter_ndjson(rows)
+
+    return iter_csv(rows, fields)
+
+
+def make_export_response(queryset, fields, export_format, file_name, chunk_size):
+    response = StreamingHttpResponse(
+        iter_export(queryset, fields, export_format, chunk_size), content_type=CONTENT_TYPES[export_format]
+    )
+    response["Content-Disposition"] = f'attachment; filename="{file_name}.{export_format}"'
+    # Stops proxies buffering the whole body before passing it on
+    response["X-Accel-Buffering"] = "no"
+
+    return response
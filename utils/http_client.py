@@ -0,0 +1,198 @@
+import os
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from utils.constants.others import MetricName
+from utils.metrics import AppMetrics
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    def __init__(self, name):
+        super().__init__(f"Circuit open for {name}")
+
+
+class CircuitBreaker:
+    """
+    Process-local breaker for one upstream (base URL). After failure_threshold consecutive failures (connection
+    errors, timeouts, 5xx) calls are refused for reset_timeout seconds, then a single trial call is let through:
+    its success closes the circuit again, its failure opens it for another reset_timeout. A trial that never reports
+    back is replaced by a new one after reset_timeout.
+    """
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.HTTP_CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or settings.HTTP_CIRCUIT_RESET_TIMEOUT
+
+        self.lock = threading.Lock()
+        self.state = self.closed
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started_at = None
+
+    def allow(self):
+        with self.lock:
+            if self.state == self.closed:
+                return True
+
+            now = time.monotonic()
+
+            if self.state == self.open and now - self.opened_at >= self.reset_timeout or \
+                    self.state == self.half_open and now - self.trial_started_at >= self.reset_timeout:
+                self.state = self.half_open
+                self.trial_started_at = now
+                return True
+
+            # Open, or half open with the trial call still in flight
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.closed
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+
+            if self.state == self.half_open or self.failures >= self.failure_threshold:
+                if self.state != self.open:
+                    AppMetrics.increment(f"{MetricName.http_circuit_opened}.{self.name}")
+
+                self.state = self.open
+                self.opened_at = time.monotonic()
+
+
+_lock = threading.Lock()
+_sessions = {}
+_breakers = {}
+_pid = None
+
+
+def _reset_after_fork():
+    # Pooled sockets must not be shared between a parent and its forked workers
+    global _pid
+
+    if _pid != os.getpid():
+        _sessions.clear()
+        _breakers.clear()
+        _pid = os.getpid()
+
+
+def get_session(provider):
+    """Keep-alive session of a provider, its pool holding up to HTTP_POOL_SIZE connections per host"""
+    with _lock:
+        _reset_after_fork()
+        session = _sessions.get(provider)
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.HTTP_POOL_SIZE, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[provider] = session
+
+        return session
+
+
+def get_circuit_breaker(base_url):
+    with _lock:
+        _reset_after_fork()
+        breaker = _breakers.get(base_url)
+
+        if breaker is None:
+            breaker = CircuitBreaker(base_url)
+            _breakers[base_url] = breaker
+
+        return breaker
+
+
+def get_retry_delay(attempt, response=None):
+    """Full jitter: a random wait up to the exponential backoff, or what the upstream asked for in Retry-After"""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), settings.HTTP_RETRY_BACKOFF_MAX)
+
+    return random.uniform(0, min(settings.HTTP_RETRY_BACKOFF_MAX, settings.HTTP_RETRY_BACKOFF * (2 ** attempt)))
+
+
+def should_retry(idempotent, never_sent, error, status_code):
+    """never_sent: the call failed before reaching the upstream (connect timeout), safe to repeat for any method"""
+    return never_sent or (idempotent and (error is not None or status_code in RETRY_STATUS_CODES))
+
+
+def send_request(provider, method, url, metric_name=None, idempotent=None, timeout=None, breaker=None, **kwargs):
+    """
+    Sends a request through the provider's pooled session and returns the response.
+
+    Connect timeouts are retried for every method, since the request never reached the upstream. Other connection
+    errors, read timeouts and 429/502/503/504 responses are only retried for idempotent calls (idempotent defaults
+    to the method being GET, HEAD, OPTIONS, PUT or DELETE). Each attempt's latency goes into the
+    http.request_ms.<provider>.<metric_name> histogram.
+    """
+    method = method.upper()
+    idempotent = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+    timeout = timeout or (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT)
+    histogram = f"{MetricName.http_request}.{provider}.{metric_name or method}"
+
+    if breaker is not None and not breaker.allow():
+        AppMetrics.increment(f"{MetricName.http_circuit_rejected}.{provider}")
+        raise CircuitOpenError(breaker.name)
+
+    session = get_session(provider)
+    attempt = 0
+
+    while True:
+        start = time.perf_counter()
+        response = None
+
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+            error = None
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        except BaseException:
+            # Not retried, but still the outcome of the call: a half open circuit must not wait for it forever
+            if breaker is not None:
+                breaker.record_failure()
+
+            raise
+
+        AppMetrics.observe(histogram, (time.perf_counter() - start) * 1000)
+
+        failed = error is not None or response.status_code >= 500
+
+        if breaker is not None:
+            if failed:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+        # A connect timeout means nothing was sent, anything else may have reached the upstream
+        retryable = should_retry(
+            idempotent, isinstance(error, requests.ConnectTimeout), error,
+            response.status_code if response is not None else None
+        )
+
+        if not retryable or attempt >= settings.HTTP_MAX_RETRIES or (breaker is not None and not breaker.allow()):
+            if error is not None:
+                raise error
+
+            return response
+
+        AppMetrics.increment(f"{MetricName.http_retries}.{provider}")
+        time.sleep(get_retry_delay(attempt, response))
+        attempt += 1
@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+# Encoder options per format, traded for encode time
+SAVE_OPTIONS = {
+    "webp": {"method": 4},
+    "avif": {"speed": 6},
+    "jpeg": {"optimize": True, "progressive": True},
+}
+
+# EXIF orientations that turn the image a quarter, swapping its width and height
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_display_size(source_path):
+    """(width, height) of the image as displayed, read from its header only"""
+    with Image.open(source_path) as image:
+        width, height = image.size
+
+        if image.getexif().get(0x0112) in ROTATED_ORIENTATIONS:
+            return height, width
+
+        return width, height
+
+
+def render_variant(source_path, output_path, width, image_format, quality):
+    """
+    Writes the image at source_path resized to width (never enlarged) and encoded as image_format to output_path.
+    Returns (width, height, size in bytes). Runs in the process pool, so it only touches files.
+    """
+    with Image.open(source_path) as image:
+        # JPEGs are decoded straight at a reduced scale when the target is much smaller
+        image.draft("RGB", (width, width))
+        image = ImageOps.exif_transpose(image)
+
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.mode in ("LA", "P", "PA") else "RGB")
+
+        if image_format == "jpeg" and image.mode == "RGBA":
+            image = image.convert("RGB")
+
+        if width < image.width:
+            image = image.resize(
+                (width, max(1, round(image.height * width / image.width))), Image.Resampling.LANCZOS,
+                reducing_gap=3.0
+            )
+
+        image.save(output_path, format=image_format.upper(), quality=quality, **SAVE_OPTIONS.get(image_format, {}))
+
+        return image.width, image.height, os.path.getsize(output_path)
+
+
+def get_process_pool():
+    """
+    Pool of MEDIA_DERIVATIVE_PROCESSES processes for the image encoding, kept for the life of the worker process.
+    Processes are spawned rather than forked, so they do not inherit the worker's connections and threads.
+    """
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.MEDIA_DERIVATIVE_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool_pid = os.getpid()
+
+        return _pool
+
+
+def discard_process_pool():
+    """Drops the pool after one of its processes died (BrokenProcessPool), the next call starts a new one"""
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,70 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+
+class AppMetrics:
+    """
+    Process-local counters and timing histograms.
+    Every gunicorn/celery worker keeps its own numbers, so read them per worker (e.g. through the metrics endpoint).
+    """
+    TIMING_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+    _lock = threading.Lock()
+    _counters = defaultdict(int)
+    _timings = {}
+
+    @classmethod
+    def increment(cls, name, value=1):
+        with cls._lock:
+            cls._counters[str(name)] += value
+
+    @classmethod
+    def get(cls, name):
+        return cls._counters.get(str(name), 0)
+
+    @classmethod
+    def observe(cls, name, duration_ms):
+        """Record a duration (in milliseconds) into the histogram called name"""
+        name = str(name)
+
+        with cls._lock:
+            timing = cls._timings.get(name)
+
+            if timing is None:
+                timing = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * (len(cls.TIMING_BUCKETS_MS) + 1)}
+                cls._timings[name] = timing
+
+            timing["count"] += 1
+            timing["sum"] += duration_ms
+            timing["max"] = max(timing["max"], duration_ms)
+            timing["buckets"][bisect_left(cls.TIMING_BUCKETS_MS, duration_ms)] += 1
+
+    @classmethod
+    def snapshot(cls, prefix=None):
+        with cls._lock:
+            counters = {k: v for k, v in cls._counters.items() if not prefix or k.startswith(prefix)}
+            timings = {}
+
+            for name, timing in cls._timings.items():
+                if prefix and not name.startswith(prefix):
+                    continue
+
+                bucket_labels = [f"le_{b}" for b in cls.TIMING_BUCKETS_MS] + ["inf"]
+                timings[name] = {
+                    "count": timing["count"],
+                    "avg_ms": round(timing["sum"] / timing["count"], 3) if timing["count"] else 0,
+                    "max_ms": round(timing["max"], 3),
+                    "buckets": dict(zip(bucket_labels, timing["buckets"]))
+                }
+
+        return {
+            "counters": dict(sorted(counters.items())),
+            "timings": dict(sorted(timings.items()))
+        }
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._counters.clear()
+            cls._timings.clear()
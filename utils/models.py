@@ -1,6 +1,5 @@
 from .errors import ServerError
 from utils.util import CustomApiRequest
-from django.core.cache import cache
 
 
 class ModelService(CustomApiRequest):
@@ -40,9 +39,12 @@ class ModelService(CustomApiRequest):
         except Exception as e:
             raise ServerError(error=e, error_position="ModelService.create_model_instance")
 
-    def update_model_instance(self, model_instance=None, cache_keys=None, **kwargs):
+    def update_model_instance(self, model_instance=None, **kwargs):
+        """
+        Updates the model instance with kwargs. Cached lookups of the model are invalidated by the generation bump
+        that follows the save (see utils.cache.CachedQuery)
+        """
         try:
-            cache_util = CustomApiRequest(request=None)
             if model_instance is None:
                 error = "Invalid model instance"
                 raise ServerError(error, error_position="ModelService.update_model_instance")
@@ -64,21 +66,6 @@ class ModelService(CustomApiRequest):
 
             model_instance.save(update_fields=update_fields)
 
-            # Update cache value
-            if cache_keys is None:
-                cache_keys = []
-
-            if not isinstance(cache_keys, list):
-                cache_keys = [cache_keys]
-
-            cache_keys.append("id")
-
-            for cache_key in cache_keys:
-                cache_key_value = getattr(model_instance, cache_key, None)
-                if cache_key_value:
-                    cache_key = cache_util.generate_cache_key(model_instance.model_name(), cache_key_value)
-                    cache.delete(cache_key, model_instance)
-
             return model_instance
 
         except Exception as e:
@@ -0,0 +1,66 @@
+import json
+import random
+from collections.abc import Mapping
+
+from django.conf import settings
+
+from base.tasks import save_api_request_logs
+from utils.buffers import BatchBuffer
+
+MASK = "****"
+
+
+def mask_sensitive_data(data, sensitive_keys=None):
+    """Copy of data with the value of every SENSITIVE_KEYS key masked, at any depth"""
+    if sensitive_keys is None:
+        sensitive_keys = {str(key).lower() for key in settings.SENSITIVE_KEYS}
+
+    if isinstance(data, Mapping):
+        return {
+            key: MASK if str(key).lower() in sensitive_keys else mask_sensitive_data(value, sensitive_keys)
+            for key, value in data.items()
+        }
+
+    if isinstance(data, (list, tuple)):
+        return [mask_sensitive_data(value, sensitive_keys) for value in data]
+
+    return data
+
+
+def capture_body(data):
+    """Masked body encoded as JSON text, cut down to API_REQUEST_LOGGING_MAX_BODY_SIZE characters"""
+    text = json.dumps(mask_sensitive_data(data), default=str)
+    max_size = settings.API_REQUEST_LOGGING_MAX_BODY_SIZE
+
+    if len(text) > max_size:
+        text = json.dumps({"truncated": True, "size": len(text), "preview": text[:max_size]})
+
+    return text
+
+
+def should_log_request():
+    return random.random() < settings.API_REQUEST_LOGGING_SAMPLE_RATE
+
+
+def start_request_log(request, ref_id, excluded_headers):
+    user = getattr(request, "user", None)
+
+    return {
+        "user_id": user.id if user is not None and user.is_authenticated else None,
+        "path": request.get_full_path()[:255],
+        "ref_id": ref_id,
+        "headers": mask_sensitive_data({k: v for k, v in request.headers.items() if k not in excluded_headers}),
+        "request_data": capture_body(request.data),
+    }
+
+
+def finish_request_log(request_log, response_status, response_body):
+    request_log_buffer.add({**request_log, "status": response_status, "response_body": capture_body(response_body)})
+
+
+request_log_buffer = BatchBuffer(
+    "api_request_logs",
+    flush=lambda records: save_api_request_logs.delay(records),
+    batch_size=settings.API_REQUEST_LOGGING_BATCH_SIZE,
+    flush_interval=settings.API_REQUEST_LOGGING_FLUSH_INTERVAL
+)
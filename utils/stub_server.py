@@ -0,0 +1,123 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Clients that timed out on a delayed route have gone away before the response, which is the point
+        pass
+
+
+class StubHTTPServer:
+    """
+    Local HTTP server standing in for an upstream API, to exercise the API clients without the network, e.g.
+
+        with StubHTTPServer() as stub:
+            stub.add_route("GET", "/bank", body={"status": True, "data": []})
+            stub.add_route("POST", "/transfer", status=503, times=2)  # fails twice, then falls through
+
+            with override_settings(PAYSTACK_BASE_URL=stub.url):
+                PaystackAPIService().fetch_bank_list()
+
+    Routes match on method and path (query string ignored). A route added with times is used that many times, after
+    which the next route for the same method and path applies. Unknown routes answer 404. Requests are recorded in
+    stub.requests as (method, path, body).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.routes = defaultdict(list)
+        self.requests = []
+        self.lock = threading.Lock()
+        self.server = QuietHTTPServer((host, port), self.make_handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_route(self, method, path, status=200, body=None, delay=0, times=None, headers=None):
+        with self.lock:
+            self.routes[(method.upper(), path)].append({
+                "status": status, "body": body if body is not None else {}, "delay": delay, "times": times,
+                "headers": headers or {}
+            })
+
+    def get_route(self, method, path):
+        with self.lock:
+            routes = self.routes.get((method, path))
+
+            if not routes:
+                return None
+
+            route = routes[0]
+
+            if route["times"] is not None:
+                route["times"] -= 1
+
+                if route["times"] <= 0 and len(routes) > 1:
+                    routes.pop(0)
+
+            return route
+
+    def count(self, method, path):
+        return sum(1 for request in self.requests if request[0] == method.upper() and request[1] == path)
+
+    def make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes, Nagle would hold the body back on kept-alive connections
+            disable_nagle_algorithm = True
+
+            def handle_request(self):
+                path = self.path.split("?")[0]
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+
+                stub.requests.append((self.command, path, body))
+                route = stub.get_route(self.command, path) or {"status": 404, "body": {}, "delay": 0, "headers": {}}
+
+                if route["delay"]:
+                    time.sleep(route["delay"])
+
+                content = json.dumps(route["body"]).encode("utf-8")
+
+                self.send_response(route["status"])
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+
+                for key, value in route["headers"].items():
+                    self.send_header(key, value)
+
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = handle_request
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="stub-http-server", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
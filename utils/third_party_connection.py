@@ -1,10 +1,9 @@
 from abc import abstractmethod, ABC
-import requests
-import json
 
 from django.conf import settings
 from django.db.models import TextChoices
-from utils.errors import ServerError
+from utils.errors import ServerError, ServiceUnavailableError
+from utils.http_client import CircuitOpenError, get_circuit_breaker, send_request
 from utils.util import AppLogger
 
 
@@ -17,52 +16,54 @@ class HTTPMethods(TextChoices):
     delete = "DELETE"
 
 
-def make_http_request(method, url, headers=None, data=None, json_data=None, params=None):
-    methods_dict = {
-        HTTPMethods.get: requests.get,
-        HTTPMethods.post: requests.post,
-        HTTPMethods.put: requests.put,
-        HTTPMethods.patch: requests.patch,
-        HTTPMethods.options: requests.options,
-        HTTPMethods.delete: requests.delete,
-    }
+def make_http_request(method, url, headers=None, data=None, json_data=None, params=None, provider="default", **kwargs):
+    """Sends the request through the provider's pooled, retrying session (see utils.http_client.send_request)"""
+    if method.upper() not in HTTPMethods.values:
+        AppLogger.report(f"Unsupported method: {method}", "make_http_request")
+        raise ServerError(error_position="make_http_request")
 
     try:
-        request_method = methods_dict.get(method.upper())
-        if not request_method:
-            AppLogger.report(f"Unsupported method: {method}", "make_http_request")
-            raise ServerError(error_position="make_http_request")
-
-        if json_data is not None:
-            response = request_method(url, headers=headers, json=json_data)
-        elif data is not None:
-            response = request_method(url, headers=headers, data=data)
-        elif params is not None:
-            data = json.dumps(data)
-            response = request_method(url, headers=headers, params=params)
-        else:
-            response = request_method(url, headers=headers)
+        return send_request(
+            provider, method, url, headers=headers, data=data, json=json_data, params=params, **kwargs
+        )
 
-        return response
+    except CircuitOpenError as e:
+        AppLogger.report(e, "make_http_request")
+        raise ServiceUnavailableError()
 
     except Exception as e:
         raise ServerError(error=e, error_position="make_http_request")
 
 
 class APIService(ABC):
+    """
+    Base of the upstream API clients. Requests of a provider share one keep-alive connection pool, time out after
+    HTTP_CONNECT_TIMEOUT/HTTP_READ_TIMEOUT seconds, are retried with jittered backoff when that is safe, and go
+    through a circuit breaker per base URL so a failing upstream is not waited on by every worker.
+    """
+    provider = "default"
+
     def __init__(self, api_key="", base_url=""):
         self.api_key = api_key
         self.base_url = base_url
         self.headers = self.get_headers()
 
-    def make_request(self, endpoint, method, data=None, json_data=None, params=None, save_data=True):
+    def make_request(self, endpoint, method, data=None, json_data=None, params=None, save_data=True, name=None,
+                     idempotent=None, timeout=None):
+        """
+        (ok, response) of the call. name is the endpoint as reported in the latency histogram, set it when the
+        endpoint contains ids; idempotent allows retrying a POST the upstream deduplicates; timeout overrides the
+        (connect, read) timeouts for calls a user is waiting on.
+        """
         if self.base_url is None:
             return False
 
         url = self.base_url + f"{endpoint}"
 
         response = make_http_request(
-            url=url, method=method, headers=self.headers, data=data, json_data=json_data, params=params
+            url=url, method=method, headers=self.headers, data=data, json_data=json_data, params=params,
+            provider=self.provider, metric_name=name or endpoint.split("?")[0], idempotent=idempotent,
+            breaker=get_circuit_breaker(self.base_url), timeout=timeout
         )
 
         if response.ok:
@@ -76,8 +77,10 @@ class APIService(ABC):
 
 
 class PremblyAPIService(APIService):
+    provider = "prembly"
+
     def __init__(self, api_key=settings.PREMBLY_API_KEY):
-        base_url = "https://api.prembly.com/verification"
+        base_url = settings.PREMBLY_BASE_URL
         super().__init__(api_key=api_key, base_url=base_url)
 
     def get_headers(self):
@@ -98,8 +101,10 @@ class PremblyAPIService(APIService):
             data=data
         )
 
-        response_data = response.json()
+        return self.parse_nin_response(response.json())
 
+    @staticmethod
+    def parse_nin_response(response_data):
         response_code = response_data.get("response_code")
 
         if response_code == "00":
@@ -137,8 +142,10 @@ class PremblyAPIService(APIService):
             data=data
         )
 
-        response_data = response.json()
+        return self.parse_bvn_response(response.json())
 
+    @staticmethod
+    def parse_bvn_response(response_data):
         response_code = response_data.get("response_code")
 
         if response_code == "00":
@@ -166,27 +173,40 @@ class PremblyAPIService(APIService):
 
 
 class PaystackAPIService(APIService):
+    provider = "paystack"
+
     def __init__(self):
         self.api_key = settings.PAYSTACK_SECRET_KEY
-        super().__init__(api_key=self.api_key)
-        self.base_url = "https://api.paystack.co"
+        super().__init__(api_key=self.api_key, base_url=settings.PAYSTACK_BASE_URL)
 
     def get_headers(self):
         return {
             "Authorization": f"Bearer {self.api_key}"
         }
 
+    def request_json(self, endpoint, method, **kwargs):
+        """Paystack's JSON body, error responses included (their status is false)"""
+        status, response = self.make_request(endpoint=endpoint, method=method, **kwargs)
+
+        return self.parse_json(response)
+
+    @staticmethod
+    def parse_json(response):
+        try:
+            return response.json()
+        except ValueError:
+            return {"status": False, "message": response.text, "http_status": response.status_code}
+
     def verify_transaction(self, reference):
         endpoint = f"/transaction/verify/{reference}"
 
-        response = self.make_request(method=HTTPMethods.get, endpoint=endpoint)
+        response = self.request_json(method=HTTPMethods.get, endpoint=endpoint, name="/transaction/verify")
 
         return response
 
-    def create_transfer_recipient(self, payload):
-        endpoint = f"/transferrecipient"
-
-        data = {
+    @staticmethod
+    def make_recipient_data(payload):
+        return {
             "type": "nuban",
             "name": payload.get("name"),
             "account_number": payload.get("account_number"),
@@ -194,16 +214,20 @@ class PaystackAPIService(APIService):
             "currency": "NGN"
         }
 
-        response = self.make_request(method=HTTPMethods.post, endpoint=endpoint, data=data)
+    def create_transfer_recipient(self, payload):
+        endpoint = f"/transferrecipient"
 
-        return response
+        data = self.make_recipient_data(payload)
 
-    def initiate_transfer(self, recipient, amount, reference, **kwargs):
-        endpoint = "/transfer"
+        response = self.request_json(method=HTTPMethods.post, endpoint=endpoint, data=data)
+
+        return response
 
+    @staticmethod
+    def make_transfer_data(recipient, amount, reference, **kwargs):
         amount = float(amount * 100)
 
-        data = {
+        return {
             "source": "balance",
             "amount": amount,
             "recipient": recipient,
@@ -211,20 +235,52 @@ class PaystackAPIService(APIService):
             "reason": kwargs.get("reason", "")
         }
 
-        response = self.make_request(method=HTTPMethods.post, endpoint=endpoint, data=data)
+    def initiate_transfer(self, recipient, amount, reference, **kwargs):
+        endpoint = "/transfer"
+
+        data = self.make_transfer_data(recipient, amount, reference, **kwargs)
+
+        # Paystack rejects a second transfer with the same reference, so this POST is safe to retry
+        response = self.request_json(method=HTTPMethods.post, endpoint=endpoint, data=data, idempotent=True)
+
+        return response
+
+    @staticmethod
+    def make_bulk_transfer_data(transfers):
+        """transfers: dicts with recipient, amount, reference and reason"""
+        return {
+            "currency": "NGN",
+            "source": "balance",
+            "transfers": [
+                {
+                    "amount": float(transfer["amount"] * 100),
+                    "recipient": transfer["recipient"],
+                    "reference": transfer["reference"],
+                    "reason": transfer.get("reason", "")
+                }
+                for transfer in transfers
+            ]
+        }
+
+    def initiate_bulk_transfer(self, transfers):
+        endpoint = "/transfer/bulk"
+
+        # Sent as JSON, the transfers are a list; retrying is safe as every transfer carries its reference
+        response = self.request_json(method=HTTPMethods.post, endpoint=endpoint,
+                                     json_data=self.make_bulk_transfer_data(transfers), idempotent=True)
 
         return response
 
-    def fetch_bank_list(self):
+    def fetch_bank_list(self, timeout=None):
         endpoint = f"/bank"
 
-        response = self.make_request(method=HTTPMethods.get, endpoint=endpoint)
+        response = self.request_json(method=HTTPMethods.get, endpoint=endpoint, timeout=timeout)
 
         return response
 
-    def verify_account_number(self, account_number, bank_code):
+    def verify_account_number(self, account_number, bank_code, timeout=None):
         endpoint = f"/bank/resolve?account_number={account_number}&bank_code={bank_code}"
 
-        response = self.make_request(method=HTTPMethods.get, endpoint=endpoint)
+        response = self.request_json(method=HTTPMethods.get, endpoint=endpoint, timeout=timeout)
 
         return response
@@ -1,14 +1,58 @@
 import abc
+import io
+import os
 import re
+import shutil
 from abc import ABC
+from functools import lru_cache
 
+import boto3
 import cloudinary
 import cloudinary.uploader
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.core.files.storage import default_storage
+from django.utils._os import safe_join
+
+from utils.http_client import send_request
+
+# Storage backends by name, the values Media.storage_backend and MEDIA_STORAGE_BACKEND take
+UPLOADERS = {}
+
+
+def register_uploader(name):
+    """Class decorator adding an Uploader to UPLOADERS under name"""
+    def decorator(uploader_class):
+        uploader_class.name = name
+        UPLOADERS[name] = uploader_class
+        return uploader_class
+
+    return decorator
+
+
+def get_uploader_class(name=None):
+    """The Uploader registered as name, MEDIA_STORAGE_BACKEND's when no name is given"""
+    name = name or settings.MEDIA_STORAGE_BACKEND
+
+    try:
+        return UPLOADERS[name]
+    except KeyError:
+        raise ImproperlyConfigured(f"No storage backend named {name}, choose one of {', '.join(UPLOADERS)}")
+
+
+def get_uploader_class_for_url(url):
+    """The Uploader of the backend url was stored in, Cloudinary for anything the others do not recognise"""
+    for uploader_class in UPLOADERS.values():
+        if uploader_class.owns_url(url):
+            return uploader_class
+
+    return CloudinaryUploader
 
 
 class Uploader:
+    name = None
     video_extensions = ["mp4", "mov", "avi"]
     image_extensions = ["jpg", "jpeg", "png", "gif"]
     audio_extensions = ["mp3", "wav", "aac", "ogg", "flac"]
@@ -27,7 +71,26 @@ class Uploader:
     def delete(self):
         pass
 
+    @classmethod
+    def owns_url(cls, url):
+        return False
+
+    @classmethod
+    def get_stem(cls, url):
+        """Path of the file at url without its extension, for storing files next to it"""
+        raise NotImplementedError
+
+    def download(self, path):
+        """Writes the file at the url in file_path to path"""
+        response = send_request("media", "GET", self.file_path, metric_name="download", stream=True)
+        response.raise_for_status()
 
+        with response, open(path, "wb") as file:
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                file.write(chunk)
+
+
+@register_uploader("cloudinary")
 class CloudinaryUploader(Uploader, ABC):
     def __init__(self, file_path=None, file_content=None, file_extension=None):
         super().__init__(file_path, file_content, file_extension)
@@ -49,24 +112,37 @@ class CloudinaryUploader(Uploader, ABC):
         elif self.file_extension in self.audio_extensions:
             resource_type = "raw"
 
-        # Upload a file
-        upload_result = cloudinary.uploader.upload(
+        # Upload a file, sent in chunks read one at a time from file_content (a path or a file object)
+        upload_result = cloudinary.uploader.upload_large(
             self.file_content,
             public_id=self.file_path,
             resource_type=resource_type,
-            format=self.file_extension
+            format=self.file_extension,
+            chunk_size=settings.MEDIA_UPLOAD_CHUNK_SIZE
         )
 
         url = upload_result.get("secure_url")
 
         return url
 
-    def delete(self):
-        match = re.search(r'upload/.*?/(.+?)(\.[^.]+)?$', self.file_path)
+    @staticmethod
+    def get_public_id(url):
+        match = re.search(r'upload/.*?/(.+?)(\.[^.]+)?$', url)
         if not match:
-            raise ValueError(f"Could not extract public ID from URL: {self.file_path}")
+            raise ValueError(f"Could not extract public ID from URL: {url}")
+
+        return match.group(1)
 
-        public_id = match.group(1)
+    @classmethod
+    def owns_url(cls, url):
+        return "res.cloudinary.com/" in url
+
+    @classmethod
+    def get_stem(cls, url):
+        return cls.get_public_id(url)
+
+    def delete(self):
+        public_id = self.get_public_id(self.file_path)
 
         # Delete the file
         result = cloudinary.uploader.destroy(public_id)
@@ -74,7 +150,10 @@ class CloudinaryUploader(Uploader, ABC):
         return True
 
 
+@register_uploader("amazon")
 class AmazonUploader(Uploader, ABC):
+    """Files in default_storage (the S3 bucket when USES_S3_BUCKET), served under MEDIA_URL"""
+
     def __init__(self, file_path=None, file_content=None, file_extension=None):
         super().__init__(file_path, file_content, file_extension)
 
@@ -86,7 +165,156 @@ class AmazonUploader(Uploader, ABC):
 
         return url
 
+    @classmethod
+    def owns_url(cls, url):
+        return url.startswith(settings.MEDIA_URL)
+
+    @classmethod
+    def get_stem(cls, url):
+        return url[len(settings.MEDIA_URL):].rsplit(".", 1)[0]
+
+    def delete(self):
+        # file_path is the url upload returned, default_storage knows the file by the path after MEDIA_URL
+        return default_storage.delete(self.file_path.removeprefix(settings.MEDIA_URL))
+
+
+def copy_file(source, destination):
+    """
+    Copies the file object source into destination, which must be a real file. When source is one too (Django's
+    temporary upload file, an open file), the kernel copies it with os.sendfile and the data never enters Python.
+    Returns the number of bytes copied.
+    """
+    source = getattr(source, "file", source)
+
+    try:
+        source_fd = source.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        source_fd = None
+
+    if source_fd is not None and hasattr(os, "sendfile"):
+        if hasattr(source, "flush"):
+            source.flush()
+
+        size = os.fstat(source_fd).st_size
+        offset = 0
+
+        try:
+            while offset < size:
+                sent = os.sendfile(destination.fileno(), source_fd, offset, size - offset)
+
+                if not sent:
+                    break
+
+                offset += sent
+
+            return offset
+        except OSError:
+            # Platforms only sending to sockets, fall back to copying from the start
+            destination.seek(0)
+            destination.truncate()
+
+    source.seek(0)
+    shutil.copyfileobj(source, destination, settings.MEDIA_UPLOAD_CHUNK_SIZE)
+
+    return destination.tell()
+
+
+@register_uploader("local")
+class LocalUploader(Uploader, ABC):
+    """
+    Files on this machine's disk under LOCAL_STORAGE_ROOT, served under LOCAL_STORAGE_URL. Made for development,
+    tests and benchmarks, which then need no network nor credentials; a deployment with several servers needs a
+    shared disk for it.
+    """
+
+    def __init__(self, file_path=None, file_content=None, file_extension=None):
+        super().__init__(file_path, file_content, file_extension)
+
+    @staticmethod
+    def get_path(name):
+        # safe_join refuses names leading outside LOCAL_STORAGE_ROOT
+        return safe_join(settings.LOCAL_STORAGE_ROOT, name)
+
+    def upload(self):
+        file_name = f"{self.file_path}.{self.file_extension}"
+        path = self.get_path(file_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # "x" fails instead of overwriting a file stored under the same name
+        with open(path, "xb") as destination:
+            copy_file(self.file_content, destination)
+
+        return settings.LOCAL_STORAGE_URL + file_name
+
+    @classmethod
+    def owns_url(cls, url):
+        return url.startswith(settings.LOCAL_STORAGE_URL)
+
+    @classmethod
+    def get_stem(cls, url):
+        return url[len(settings.LOCAL_STORAGE_URL):].rsplit(".", 1)[0]
+
+    def download(self, path):
+        with open(self.get_path(self.file_path.removeprefix(settings.LOCAL_STORAGE_URL)), "rb") as source, \
+                open(path, "wb") as destination:
+            copy_file(source, destination)
+
+    def delete(self):
+        try:
+            os.remove(self.get_path(self.file_path.removeprefix(settings.LOCAL_STORAGE_URL)))
+        except FileNotFoundError:
+            return False
+
+        return True
+
+
+@lru_cache(maxsize=1)
+def get_s3_client():
+    return boto3.client(
+        "s3",
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_S3_REGION_NAME or None,
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+        config=Config(signature_version=settings.AWS_S3_SIGNATURE_VERSION)
+    )
+
+
+class AmazonDirectUploader:
+    """
+    Uploads that go from the client straight to the bucket (or the S3-compatible store at AWS_S3_ENDPOINT_URL): the
+    app signs a POST policy for one key, content type and size range, and checks the object once it is there.
+    """
+
+    def __init__(self, file_path, content_type=None):
+        self.file_path = file_path
+        self.content_type = content_type
+        # Same place AmazonUploader puts files through default_storage
+        self.key = f"{settings.AWS_LOCATION}/{file_path}" if settings.AWS_LOCATION else file_path
+
+    @property
+    def url(self):
+        return settings.MEDIA_URL + self.file_path
+
+    def create_target(self, max_size, expires_in):
+        """{"url", "fields"}: the form the client posts the file to, as the last field, before expires_in seconds"""
+        return get_s3_client().generate_presigned_post(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+            Key=self.key,
+            Fields={"Content-Type": self.content_type},
+            Conditions=[{"Content-Type": self.content_type}, ["content-length-range", 1, max_size]],
+            ExpiresIn=expires_in
+        )
+
+    def fetch_size(self):
+        """Size of the uploaded object, None when nothing was uploaded"""
+        try:
+            return get_s3_client().head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=self.key)["ContentLength"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+
+            raise
+
     def delete(self):
-        # Confirm this before usage.
-        storage = default_storage
-        return storage.delete(self.file_path)
+        return get_s3_client().delete_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=self.key)
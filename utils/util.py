@@ -1,31 +1,47 @@
+import base64
+import hashlib
+import json
 import logging
 import random
 import secrets
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
+from functools import lru_cache
 from math import ceil
 
 import phonenumbers
+from django.http import HttpResponse, HttpResponseNotModified
+from django.http.response import HttpResponseBase
 from django.shortcuts import render
 from django.contrib.auth.models import AnonymousUser
-from django.core.files.base import ContentFile
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction as db_transaction
+from django.db.models import Q
 from django.utils.text import slugify
 from django.utils import timezone
 from django.conf import settings
 from django.utils.crypto import get_random_string
+from django.utils.http import parse_etags
 from django.utils.timezone import is_aware, make_aware
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from typing import TypeVar
 from rest_framework import status
 from django.contrib.auth.hashers import make_password
-from base.tasks import make_api_request_log, update_api_request_log, report_activity
+from base.activity import record_activity
 from media.models import UploadedMedia, UploadToChoices
 from utils.constants.messages import ResponseMessages
 from utils.decorators import CustomApiPermissionRequired
-from utils.errors import UserError, PermissionDeniedError
-from utils.uploaders import CloudinaryUploader
-from utils.encryption_util import AESCipher
+from utils.errors import UserError, PermissionDeniedError, ServerError
+from utils.constants.others import MetricName
+from utils.metrics import AppMetrics
+from utils.cache import CacheGeneration
+from utils.uploaders import get_uploader_class, get_uploader_class_for_url
+from utils.encryption_util import ENVELOPE_MODE, DecryptionError, get_cipher
+from utils.request_log import finish_request_log, should_log_request, start_request_log
 
 T = TypeVar("T")
 
@@ -64,11 +80,38 @@ class CustomApiResponse:
         if self.response_message_on_success:
             data["message"] = self.response_message_on_success
 
+        headers = None
+
         if settings.APP_ENC_ENABLED and self.response_payload_requires_encryption:
-            cipher = AESCipher(settings.APP_ENC_KEY, settings.APP_ENC_VEC)
-            data = cipher.encrypt_nested(data)
+            cipher = get_cipher(settings.APP_ENC_KEY, settings.APP_ENC_VEC)
+            request = getattr(self, "request", None)
+
+            # Clients opt into one AEAD operation over the whole body instead of per-value encryption
+            if request is not None and request.headers.get(settings.APP_ENC_MODE_HEADER) == ENVELOPE_MODE:
+                data = cipher.encrypt_envelope(data, encoder=JSONEncoder)
+                headers = {settings.APP_ENC_MODE_HEADER: ENVELOPE_MODE, "Vary": settings.APP_ENC_MODE_HEADER}
+            else:
+                data = cipher.encrypt_nested(data)
+                headers = {"Vary": settings.APP_ENC_MODE_HEADER}
+
+        return Response(data, status=status_code, headers=headers)
+
+    def cached_json_response(self, request, etag, fetch_payload):
+        """
+        Serves a JSON body that was serialized ahead of time.
+        etag: the current ETag of the payload, answered with a 304 when the client already holds it
+        fetch_payload: returns (etag, body bytes)
+        """
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+        else:
+            etag, body = fetch_payload()
+            response = HttpResponse(body, content_type="application/json", status=status.HTTP_200_OK)
+
+        response["ETag"] = etag
+        response["Cache-Control"] = "no-cache"
 
-        return Response(data, status=status_code)
+        return response
 
     def error_response(self, e):
         from utils.errors import ServerError
@@ -110,6 +153,16 @@ class CustomApiRequest(CustomApiPermissionRequired, CustomApiResponse, DefaultPa
     template_name = None
     payload = {}
     ref_id = None
+    request_log = None
+    decrypt_duration_ms = None
+    # Services that set cursor_pagination_enabled serve keyset pages when the request passes ?pagination=cursor or a
+    # ?cursor=, ordered by cursor_ordering (an indexed, unique combination of fields)
+    cursor_pagination_enabled = False
+    cursor_ordering = ("-created_at", "-id")
+    # A utils.counts.CountStrategy to cache or estimate list totals, exact COUNT(*) when None
+    count_strategy = None
+    # Columns of the rows fetch_export_queryset returns, for the services whose lists can be exported
+    export_fields = None
     AUTHORIZATION_KEYS = ["X-API-KEY", "HTTP_AUTHORIZATION", "X-Api-Key", "Authorization"]
 
     def __init__(self, request=None):
@@ -130,7 +183,7 @@ class CustomApiRequest(CustomApiPermissionRequired, CustomApiResponse, DefaultPa
         if not description:
             description = str(activity_type) + " records related to " + str(data)
 
-        report_activity.delay(self.auth_user, activity_type, description)
+        record_activity(self.auth_user.id if self.auth_user else None, activity_type, description)
 
     def digify_number(self, digit, name):
         try:
@@ -169,19 +222,14 @@ class CustomApiRequest(CustomApiPermissionRequired, CustomApiResponse, DefaultPa
             self.encrypt_response = self.response_payload_requires_encryption
 
             if self.request_payload_requires_decryption and settings.APP_ENC_ENABLED:
-                encryption_util = AESCipher(settings.APP_ENC_KEY, settings.APP_ENC_VEC)
-                request_data = encryption_util.decrypt_body(request.data)
+                request_data = self.decrypt_request_data(request.data)
             else:
                 request_data = request.data
 
-            if self.logging_enabled:
+            if self.logging_enabled and should_log_request():
                 self.ref_id = get_unique_id(length=18)
                 try:
-                    make_api_request_log(
-                        request.user.id if request.user else "",
-                        request.data, request.get_full_path(), self.ref_id,
-                        headers={k: v for k, v in request.headers.items() if k not in self.AUTHORIZATION_KEYS}
-                    )
+                    self.request_log = start_request_log(request, self.ref_id, self.AUTHORIZATION_KEYS)
                 except Exception as e:
                     AppLogger.report(e, "CustomApiRequest.process_request.self.logging_enable")
 
@@ -211,27 +259,59 @@ class CustomApiRequest(CustomApiPermissionRequired, CustomApiResponse, DefaultPa
                 else:
                     response_raw_data = target_function(**extra_args)
 
-            return self.__handle_request_response(response_raw_data)
+            response = self.__handle_request_response(response_raw_data)
+
+            if self.decrypt_duration_ms is not None:
+                response["Server-Timing"] = f"decrypt;dur={self.decrypt_duration_ms:.3f}"
+
+            return response
 
         except Exception as e:
             AppLogger.report(e)
 
             response_data = {"error": str(e), "message": "Server error"}
 
-            if self.ref_id:
-                try:
-                    update_api_request_log.delay(self.ref_id, response_status="Error", response_body=response_data)
-                except Exception as e:
-                    AppLogger.report(e)
+            self.__finish_request_log("Error", response_data)
 
             if not settings.DEBUG:
                 return self.error_response(e)
             else:
                 raise e
 
+    def get_encrypted_fields(self):
+        """Fields of the body to decrypt: the serializer's encrypted_fields, else all its fields, else every field"""
+        if self.serializer_class is None:
+            return None
+
+        encrypted_fields = getattr(self.serializer_class, "encrypted_fields", None)
+
+        if encrypted_fields is not None:
+            return set(encrypted_fields)
+
+        return get_serializer_field_names(self.serializer_class)
+
+    def decrypt_request_data(self, data):
+        started_at = time.perf_counter()
+
+        try:
+            cipher = get_cipher(settings.APP_ENC_KEY, settings.APP_ENC_VEC)
+            return cipher.decrypt_fields(data, fields=self.get_encrypted_fields())
+
+        except DecryptionError as e:
+            raise UserError(ResponseMessages.payload_decryption_failed.format(", ".join(e.fields)))
+
+        finally:
+            self.decrypt_duration_ms = (time.perf_counter() - started_at) * 1000
+            AppMetrics.observe(MetricName.request_decrypt, self.decrypt_duration_ms)
+
     def __handle_request_response(self, response_raw_data):
         response_data = response_raw_data
 
+        # Responses built by the service itself (file downloads, streamed exports) go out as they are
+        if isinstance(response_data, HttpResponseBase):
+            self.__finish_request_log("Success", {})
+            return response_data
+
         if isinstance(response_data, str):
             self.response_message_on_success = response_data
             response_data = {}
@@ -250,14 +330,22 @@ class CustomApiRequest(CustomApiPermissionRequired, CustomApiResponse, DefaultPa
         if self.wrap_response_in_data_object:
             response_data = {"data": response_data}
 
-        if self.ref_id:
-            try:
-                update_api_request_log.delay(self.ref_id, response_status="Success", response_body=response_data)
-            except Exception as e:
-                AppLogger.report(e)
+        self.__finish_request_log("Success", response_data)
 
         return self.response_with_json(response_data, self.status_code_on_success)
 
+    def __finish_request_log(self, response_status, response_body):
+        """Buffers the request log, it is written later with others in one bulk insert"""
+        if self.request_log is None:
+            return
+
+        try:
+            finish_request_log(self.request_log, response_status, response_body)
+        except Exception as e:
+            AppLogger.report(e)
+
+        self.request_log = None
+
     def generate_cache_key(self, *args, **kwargs):
         model = kwargs.get("model") or None
         list_args = list(args)
@@ -317,27 +405,117 @@ class CustomApiRequest(CustomApiPermissionRequired, CustomApiResponse, DefaultPa
 
         return data
 
-    def get_paginated_list_response(self, data, count_all):
-        return self.__make_pages(self.__get_pagination_data(count_all, data))
+    def get_paginated_list_response(self, data, count_all, total_is_estimate=False):
+        return {
+            **self.__make_pages(self.__get_pagination_data(count_all, data)),
+            "total_is_estimate": total_is_estimate
+        }
 
     def fetch_list(self, filter_params, **extra_args):
         raise Exception("Not implemented")
 
+    def fetch_export_queryset(self, filter_params):
+        """fetch_list narrowed to the export_fields of the service, as dicts (see base.services.ExportService)"""
+        return self.fetch_list(filter_params).prefetch_related(None).values(*self.export_fields)
+
     def fetch_paginated_list(self, **extra_args):
         queryset = self.fetch_list(**extra_args)
-        page = self.paginate_queryset(queryset, request=self.request)
+
+        if self.cursor_pagination_requested():
+            return self.fetch_cursor_page(queryset)
+
+        # Counted once, by the service's count strategy when it has one, instead of by both the paginator and here
+        if self.count_strategy is not None:
+            total, total_is_estimate = self.count_strategy.count(queryset)
+        else:
+            total, total_is_estimate = queryset.count(), False
+
+        self.__read_page_params()
+        offset = (self.current_page - 1) * self.page_size
+        page = queryset[offset:offset + self.page_size]
+
         data = self.serializer_class(page, many=True, context={"request": self.request}).data
 
-        return self.get_paginated_list_response(data, queryset.count())
+        return self.get_paginated_list_response(data, total, total_is_estimate=total_is_estimate)
 
-    def __get_pagination_data(self, total, data):
+    def cursor_pagination_requested(self):
         query_params = self.request.query_params
+        return self.cursor_pagination_enabled and (
+                query_params.get("pagination") == "cursor" or bool(query_params.get("cursor"))
+        )
 
+    def fetch_cursor_page(self, queryset):
+        """
+        Keyset pagination: rows after (or before) the cursor are found through the index on cursor_ordering, so every
+        page costs the same whatever its depth. No COUNT(*) is run unless ?count=exact, and ?count=estimate returns the
+        planner's row estimate of the whole table.
+        """
+        query_params = self.request.query_params
+        cursor = query_params.get("cursor")
+
+        self.page_size = min(self.__read_positive_int("page_size", self.page_size), self.max_page_size)
+
+        # The direction, then the value of each cursor_ordering field
+        fields = [None] + [queryset.model._meta.get_field(field.lstrip("-")) for field in self.cursor_ordering]
+        direction, *last_values = decode_cursor(cursor, fields) if cursor else ["next"]
+        is_backwards = direction == "prev"
+
+        if direction not in ["next", "prev"]:
+            raise UserError(ResponseMessages.invalid_cursor)
+
+        # Walking backwards is the same walk with every ordering flipped, its rows are reversed afterwards
+        ordering = [flip_ordering(field) if is_backwards else field for field in self.cursor_ordering]
+        page_queryset = queryset.order_by(*ordering)
+
+        if last_values:
+            page_queryset = page_queryset.filter(get_keyset_filter(ordering, last_values))
+
+        rows = list(page_queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if is_backwards:
+            rows.reverse()
+
+        has_next_page = bool(rows) and (True if is_backwards else has_more)
+        has_prev_page = bool(rows) and (has_more if is_backwards else bool(cursor))
+
+        next_cursor = self.__make_cursor("next", rows[-1]) if has_next_page else None
+        prev_cursor = self.__make_cursor("prev", rows[0]) if has_prev_page else None
+
+        count = query_params.get("count")
+
+        if count == "exact":
+            total = queryset.count()
+        elif count == "estimate":
+            total = estimate_table_count(queryset.model)
+        else:
+            total = None
+
+        total_is_estimate = count == "estimate" and total is not None
+
+        data = self.serializer_class(rows, many=True, context={"request": self.request}).data
+
+        return self.__make_cursor_pages(data, next_cursor, prev_cursor, total, total_is_estimate)
+
+    def __make_cursor(self, direction, row):
+        return encode_cursor(direction, *[get_ordering_value(row, field) for field in self.cursor_ordering])
+
+    def __read_page_params(self):
+        # Like DRF's paginator: values that are not positive integers are ignored
+        self.current_page = self.__read_positive_int("page", self.current_page)
+        self.page_size = min(self.__read_positive_int("page_size", self.page_size), self.max_page_size)
+
+    def __read_positive_int(self, name, default):
         try:
-            self.current_page = int(query_params.get("page", self.current_page)) or self.current_page
-            self.page_size = int(query_params.get("page_size", self.page_size)) or self.page_size
-        except Exception:
-            print("Incorrect page number")
+            value = int(self.request.query_params.get(name) or default)
+        except (TypeError, ValueError):
+            return default
+
+        return value if value > 0 else default
+
+    def __get_pagination_data(self, total, data):
+        self.__read_page_params()
 
         prev_page_no = int(self.current_page) - 1
         last_page = ceil(total / self.page_size) if self.page_size > 0 else 0
@@ -346,6 +524,27 @@ class CustomApiRequest(CustomApiPermissionRequired, CustomApiResponse, DefaultPa
 
         return prev_page_no, data, total, last_page, has_next_page, has_previous_page
 
+    def __make_cursor_pages(self, data, next_cursor, prev_cursor, total, total_is_estimate):
+        """Same envelope as __make_pages, page numbers are replaced by the cursors"""
+        return {
+            "page_size": self.page_size,
+            "current_page": None,
+            "last_page": None,
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+            "next_page_url": self.__make_page_url("cursor", next_cursor) if next_cursor else None,
+            "prev_page_url": self.__make_page_url("cursor", prev_cursor) if prev_cursor else None,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+            "data": data
+        }
+
+    def __make_page_url(self, param, value):
+        query_params = self.request.query_params.copy()
+        query_params[param] = value
+
+        return f"{self.request.path}?{query_params.urlencode()}"
+
     def __make_pages(self, pagination_data):
         prev_page_no, data, total, last_page, has_next_page, has_prev_page = pagination_data
 
@@ -404,6 +603,78 @@ def get_unique_id(prefix="", suffix="", length=None):
     return generated_id
 
 
+@lru_cache(maxsize=None)
+def get_serializer_field_names(serializer_class):
+    return frozenset(serializer_class().fields.keys())
+
+
+def flip_ordering(field):
+    return field[1:] if field.startswith("-") else f"-{field}"
+
+
+def get_ordering_value(instance, field):
+    return getattr(instance, field.lstrip("-"))
+
+
+def get_keyset_filter(ordering, last_values):
+    """
+    Rows strictly after last_values in ordering, e.g. for ("-created_at", "-id"):
+    created_at < last_created_at OR (created_at = last_created_at AND id < last_id)
+    """
+    keyset_filter = Q()
+
+    for position, field in enumerate(ordering):
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition = Q(**{f"{field.lstrip('-')}__{lookup}": last_values[position]})
+
+        for previous_field, previous_value in zip(ordering[:position], last_values[:position]):
+            condition &= Q(**{previous_field.lstrip("-"): previous_value})
+
+        keyset_filter |= condition
+
+    return keyset_filter
+
+
+def estimate_table_count(model):
+    """The planner's row estimate of the whole table, None when the database does not keep one (e.g. sqlite)"""
+    if connection.vendor != "postgresql":
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table])
+        row = cursor.fetchone()
+
+    # reltuples is -1 for a table never analyzed
+    return max(row[0], 0) if row else None
+
+
+def encode_cursor(*values):
+    """Opaque, url safe pagination cursor holding the sort key values of the last row of a page"""
+    # isoformat keeps microseconds, which DjangoJSONEncoder would round away and make the keyset skip rows
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(values, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, fields=None):
+    """
+    The values of a cursor made by encode_cursor. With fields (model fields, None to keep a value as is) there must
+    be one value per field, each converted by its field; anything else is an invalid cursor.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+
+        if not isinstance(values, list) or (fields is not None and len(values) != len(fields)):
+            raise ValueError(cursor)
+
+        if fields is None:
+            return values
+
+        return [value if field is None else field.to_python(value) for field, value in zip(fields, values)]
+    except (ValueError, TypeError, ValidationError):
+        raise UserError(ResponseMessages.invalid_cursor)
+
+
 def generate_password():
     if settings.DEBUG:
         password = settings.DEFAULT_PASSWORD
@@ -442,6 +713,70 @@ def generate_random_username():
     return username
 
 
+def iter_json_array(file, chunk_size=64 * 1024):
+    """
+    Yields the items of a top-level JSON array one at a time, reading the file in chunks instead of loading it whole.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    exhausted = False
+
+    while True:
+        # Skip whitespace and separators up to the next item
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+
+            if position < len(buffer) or exhausted:
+                break
+
+            chunk = file.read(chunk_size)
+            exhausted = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+
+        if position >= len(buffer):
+            if started:
+                raise ValueError("Unexpected end of JSON array")
+            return
+
+        if not started:
+            if buffer[position] != "[":
+                raise ValueError("Expected a JSON array")
+            started = True
+            position += 1
+            continue
+
+        if buffer[position] == "]":
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+
+            # A number or literal cut by the end of the buffer can decode early (e.g. "1.5" out of "1.5e10"), so a
+            # scalar only counts once it is followed by a separator
+            is_complete = isinstance(item, (dict, list, str)) or (end < len(buffer) and buffer[end] in " \t\r\n,]")
+
+            if not is_complete and exhausted:
+                raise ValueError("Invalid value in JSON array")
+        except json.JSONDecodeError:
+            if exhausted:
+                raise
+
+            is_complete = False
+
+        if not is_complete:
+            # The item is cut off by the end of the buffer, read some more
+            chunk = file.read(chunk_size)
+            exhausted = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+
+        yield item
+        position = end
+
+
 def check_time_expired(time_to_check, duration=10) -> bool:
     """
     Returns True if the otp has expired and False if the otp is still valid.
@@ -484,15 +819,138 @@ class FileUploader(CustomApiRequest):
         self.upload_to = UploadToChoices.general
 
     def upload(self, file, description_payload):
-        original_file_name = file.name.lower()
-        file_extension = original_file_name.split('.')[-1].lower()
-        file_size = self.get_file_size(file)
-
+        return self.upload_many([file], description_payload)[0]
+
+    def upload_many(self, files, description_payload):
+        """
+        Sends the files to the storage backend, MEDIA_UPLOAD_CONCURRENCY at a time, then saves their UploadedMedia
+        rows in one insert. Every file is checked before any is sent. Files are streamed from Django's upload (a
+        temporary file above FILE_UPLOAD_MAX_MEMORY_SIZE) in MEDIA_UPLOAD_CHUNK_SIZE chunks, never read whole.
+
+        Content already stored (same SHA-256 and size) in the media type's backend is not sent again, the new row
+        points at the stored object. MediaService.delete_media removes an object from storage with the last row
+        pointing at it.
+        """
         media_type = description_payload.get("media_type")
 
         if not media_type:
             raise UserError(ResponseMessages.media_type_not_found)
 
+        self.upload_to = media_type.upload_to
+        uploads = [self.prepare_upload(file, media_type) for file in files]
+        stored = self.find_stored_urls(uploads)
+        sent = self.send_uploads(uploads, skip=stored)
+
+        with db_transaction.atomic():
+            # Locks the rows of the reused objects. One whose last row was deleted since the lookup is sent again.
+            still_stored = set(
+                UploadedMedia.objects.select_for_update().filter(
+                    content_hash__in=[content_hash for content_hash, _ in stored], url__in=set(stored.values())
+                ).values_list("url", flat=True)
+            )
+            stored = {key: url for key, url in stored.items() if url in still_stored}
+            sent.update(self.send_uploads(uploads, skip={**stored, **sent}))
+            urls = {**stored, **sent}
+
+            uploaded_files = UploadedMedia.objects.bulk_create([
+                UploadedMedia(
+                    media=media_type,
+                    user=self.auth_user,
+                    url=urls[(upload["content_hash"], upload["size"])],
+                    name=upload["name"],
+                    size=upload["size"],
+                    file_type=self.get_content_type_from_extension(upload["file_extension"]),
+                    content_hash=upload["content_hash"]
+                )
+                for upload in uploads
+            ])
+            CacheGeneration.bump_on_commit(UploadedMedia)
+
+            from media.services import MediaDerivativeService
+            MediaDerivativeService.queue(uploaded_files)
+
+        return uploaded_files
+
+    @staticmethod
+    def find_stored_urls(uploads):
+        """{(content_hash, size): url} of the uploads whose content is already stored, in the backend they go to"""
+        uploader_classes = {
+            (upload["content_hash"], upload["size"]): get_uploader_class(upload.get("storage_backend"))
+            for upload in uploads
+        }
+        stored = {}
+        rows = UploadedMedia.objects.filter(
+            content_hash__in=[content_hash for content_hash, _ in uploader_classes]
+        ).order_by("id").values_list("content_hash", "size", "url")
+
+        for content_hash, size, url in rows:
+            uploader_class = uploader_classes.get((content_hash, size))
+
+            if uploader_class is not None and uploader_class.owns_url(url):
+                stored.setdefault((content_hash, size), url)
+
+        return stored
+
+    def send_uploads(self, uploads, skip):
+        """{(content_hash, size): url} of the uploads sent, each content once, except the keys in skip"""
+        pending = {}
+
+        for upload in uploads:
+            key = (upload["content_hash"], upload["size"])
+
+            if key not in skip:
+                pending.setdefault(key, upload)
+
+        if not pending:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=min(len(pending), settings.MEDIA_UPLOAD_CONCURRENCY)) as executor:
+            futures = {key: executor.submit(self.send_upload, upload) for key, upload in pending.items()}
+            wait(futures.values())
+
+        errors = [future.exception() for future in futures.values() if future.exception() is not None]
+
+        if errors:
+            # The request fails as a whole, files that did make it are not kept
+            for future in futures.values():
+                if future.exception() is None:
+                    self.delete_quietly(future.result())
+
+            raise ServerError(error=errors[0], error_position="FileUploader.send_uploads")
+
+        return {key: future.result() for key, future in futures.items()}
+
+    def prepare_upload(self, file, media_type):
+        original_file_name = file.name.lower()
+        file_size = self.get_file_size(file)
+        file_extension = self.validate_file(original_file_name, file_size, media_type)
+
+        return {
+            "content_hash": self.get_content_hash(file),
+            "file": file,
+            "file_path": f"{self.upload_to}/{self.generate_file_name(file_extension)}",
+            "file_extension": file_extension,
+            "name": original_file_name.removesuffix(f".{file_extension}"),
+            "size": file_size,
+            "storage_backend": media_type.storage_backend,
+        }
+
+    @staticmethod
+    def get_content_hash(file):
+        """SHA-256 hex digest of the file, read a chunk at a time"""
+        digest = hashlib.sha256()
+
+        for chunk in file.chunks():
+            digest.update(chunk)
+
+        file.seek(0)
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def validate_file(file_name, file_size, media_type):
+        """Extension of the file, when the media type allows it and its size"""
+        file_extension = file_name.split('.')[-1].lower()
         allowed_file_types = [aft.strip(".") for aft in media_type.allowed_file_types]
 
         if file_extension not in allowed_file_types:
@@ -501,32 +959,30 @@ class FileUploader(CustomApiRequest):
         if file_size > (media_type.max_file_size_in_kb * 1024):
             raise UserError(ResponseMessages.file_too_large)
 
-        self.upload_to = media_type.upload_to
-
-        file_path = f"{self.upload_to}/{self.generate_file_name(file_extension)}"
-        file_content = ContentFile(file.read())
-
-        uploader = CloudinaryUploader(file_path, file_content, file_extension)
+        return file_extension
 
-        full_url = uploader.upload()
+    @staticmethod
+    def send_upload(upload):
+        """URL of the file once uploaded, the file object itself is handed over so the uploader reads it in chunks"""
+        upload["file"].seek(0)
+        uploader_class = get_uploader_class(upload.get("storage_backend"))
+        uploader = uploader_class(upload["file_path"], upload["file"], upload["file_extension"])
 
-        uploaded_file = UploadedMedia.objects.create(
-            media=media_type,
-            user=self.auth_user,
-            url=full_url,
-            name=original_file_name.strip(f".{file_extension}"),
-            size=file_size,
-            file_type=self.get_content_type_from_extension(file_extension)
-        )
+        return uploader.upload()
 
-        return uploaded_file
+    def delete_quietly(self, file_path):
+        try:
+            self.delete(file_path)
+        except Exception as e:
+            AppLogger.report(e, "FileUploader.delete_quietly")
 
     def generate_file_name(self, ext):
-        file_name = f"{str(time.time()).replace('.', '')}{str(time.time()).replace('.', '')}"
+        # The random part keeps names apart when several files of a request are named in the same instant
+        file_name = f"{str(time.time()).replace('.', '')}{get_random_string(8).lower()}"
         return file_name
 
     def delete(self, file_path):
-        uploader = CloudinaryUploader(file_path)
+        uploader = get_uploader_class_for_url(file_path)(file_path)
         return uploader.delete()
 
     def get_file_size(self, file):